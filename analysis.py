@@ -0,0 +1,185 @@
+# analysis.py
+
+from __future__ import division
+
+__doc__ = """Compute the data behind the Analysis plots.
+
+The functions here work on an activity snapshot from :func:`activity_data`.
+The snapshot copies the fields of the activity's entries into arrays.  It is
+taken in the main thread, and the functions that use it may then run in a
+worker thread while the Log keeps changing.
+
+"""
+
+import datetime
+import os
+
+import matplotlib as mpl
+import matplotlib.dates
+import numpy as np
+
+import histlite
+import manateelog
+from vars_class import Vars
+
+
+hist_cache = histlite.HistCache (
+        os.path.expanduser (os.path.join ('~', '.config', 'manatee', 'cache')))
+
+# per-activity analysis results, keyed by the activity's log version
+analysis_memo = histlite.LRUCache (256)
+
+# above this many blocks, draw a timing activity as a day x minute image
+block_raster_threshold = 20000
+
+def data_memo_key (data, *args):
+    return (data.activity, data.version) + args
+
+def hist_cache_key (data, unit, n, ti, tf):
+    return (data.name, data.fingerprint, unit, n, ti, tf)
+
+def activity_data_key (activity, version, entries):
+    return (activity, version)
+
+@histlite.cached (analysis_memo, activity_data_key)
+def activity_data (activity, version, entries):
+    """Copy what the analysis needs from an activity's sorted entries.
+
+    Call this from the main thread, with version from
+    :meth:`manateelog.Log.version`.
+
+    :return: A :class:`Vars` with activity, version, kind, name, unit,
+        n_entries, the (ti, tf) datetime range (None if there are no
+        entries), the data's
+        :func:`manateelog.fingerprint`, and either dates, ns and errors
+        (counting) or starts and ends (timing) arrays.
+    """
+    out = Vars ()
+    out.activity, out.version = activity, version
+    out.kind, out.name = activity.kind, activity.name
+    out.n_entries = len (entries)
+    out.fingerprint = manateelog.fingerprint (activity, entries)
+    out.ti = out.tf = None
+    if activity.kind == 'counting':
+        out.unit = activity.unit
+        out.dates = np.array ([entry.date for entry in entries],
+                dtype='M8[D]')
+        out.ns = np.array ([entry.n for entry in entries], dtype=float)
+        out.errors = np.array ([entry.error for entry in entries],
+                dtype=float)
+        if len (entries):
+            di, df = entries[0].date, entries[-1].date
+            out.ti = datetime.datetime (di.year, di.month, di.day)
+            out.tf = datetime.datetime (df.year, df.month, df.day, 23, 59, 59)
+    else:
+        out.unit = 'hours'
+        out.starts = np.array ([entry.start_time for entry in entries],
+                dtype='M8[us]')
+        out.ends = np.array ([entry.end_time for entry in entries],
+                dtype='M8[us]')
+        if len (entries):
+            out.ti = entries[0].start_time
+            out.tf = entries[-1].end_time
+    return out
+
+@histlite.cached (hist_cache, hist_cache_key)
+def counting_hist (data, unit, n, ti, tf):
+    """Get the amount per day of a counting activity as a Hist."""
+    binner = histlite.CalendarBinner (unit, n, range=(ti, tf))
+    edges = binner.edges ()
+    # entries count at noon on their date
+    times = data.dates + np.timedelta64 (12, 'h')
+    ns, errors = data.ns, data.errors
+    order = np.argsort (times, kind='mergesort')
+    times, ns, errors = times[order], ns[order], errors[order]
+    # bin i holds the entries in [idx[i], idx[i+1])
+    idx = np.searchsorted (times, edges)
+    empty = idx[:-1] == idx[1:]
+    def bin_sums (w):
+        # pad so that idx == len (w) is a valid index
+        sums = np.add.reduceat (np.r_[w, 0], idx)[:-1]
+        sums[empty] = 0
+        return sums
+    n_days = (np.diff (edges) // np.timedelta64 (1, 'D')).astype (float)
+    y = bin_sums (ns) / n_days
+    err = np.sqrt (bin_sums (errors**2) / n_days)
+    return histlite.Hist (edges.astype (object), y, err)
+
+@histlite.cached (hist_cache, hist_cache_key)
+def timing_hist (data, unit, n, ti, tf):
+    """Get the hours per day of a timing activity as a Hist."""
+    binner = histlite.CalendarBinner (unit, n, range=(ti, tf))
+    edges = binner.edges ()
+    hours = histlite.interval_overlap (data.starts, data.ends, edges)
+    n_days = (np.diff (edges) // np.timedelta64 (1, 'D')).astype (float)
+    return histlite.Hist (edges.astype (object), hours / n_days)
+
+@histlite.cached (analysis_memo, data_memo_key)
+def activity_hist (data, unit, n, ti, tf):
+    """Get the per-day Hist of an activity (see counting_hist and
+    timing_hist)."""
+    if data.kind == 'counting':
+        return counting_hist (data, unit, n, ti, tf)
+    else:
+        return timing_hist (data, unit, n, ti, tf)
+
+@histlite.cached (analysis_memo, data_memo_key)
+def counting_block_data (data):
+    """Get the day numbers and alphas of a counting activity's blocks."""
+    out = Vars ()
+    out.ti, out.tf = data.ti, data.tf
+    date_epoch = mpl.dates.date2num (datetime.datetime (1970, 1, 1))
+    out.days = date_epoch + data.dates.astype (float)
+    ns = data.ns
+    ns_max = ns.max () if len (ns) else 1
+    # quantize alpha to twentieths
+    out.alphas = np.clip (np.floor (20 * ns / ns_max) / 20, 0, 1)
+    return out
+
+@histlite.cached (analysis_memo, data_memo_key)
+def timing_block_data (data):
+    """Get the block vertices (or, above block_raster_threshold blocks, a
+    day x minute image) of a timing activity."""
+    out = Vars ()
+    out.ti, out.tf = data.ti, data.tf
+    date_epoch = mpl.dates.date2num (datetime.datetime (1970, 1, 1))
+    starts = data.starts.astype ('M8[m]')
+    ends = data.ends.astype ('M8[m]')
+    # an entry edited to end before it starts covers no time
+    keep = ends >= starts
+    starts, ends = starts[keep], ends[keep]
+
+    # split entries into pieces within single days
+    days1 = starts.astype ('M8[D]')
+    n_pieces = (ends.astype ('M8[D]') - days1).astype (int) + 1
+    if n_pieces.sum () > block_raster_threshold:
+        # day x minute raster, 1 where any entry covers the minute
+        first = days1.min ()
+        n_days = (ends.max ().astype ('M8[D]') - first).astype (int) + 1
+        n_minutes = 1440 * n_days
+        first = first.astype ('M8[m]')
+        diff = np.bincount ((starts - first).astype (int),
+                minlength=n_minutes + 1)
+        diff -= np.bincount ((ends - first).astype (int),
+                minlength=n_minutes + 1)
+        covered = (np.cumsum (diff)[:n_minutes] > 0).astype (np.uint8)
+        x1 = date_epoch + first.astype ('M8[D]').astype (float)
+        out.image = covered.reshape (n_days, 1440).T
+        out.extent = (x1, x1 + n_days, 0, 24)
+        return out
+    entry_idx = np.repeat (np.arange (len (starts)), n_pieces)
+    offsets = np.arange (n_pieces.sum ()) \
+            - np.repeat (np.cumsum (n_pieces) - n_pieces, n_pieces)
+    piece_days = days1[entry_idx] + offsets
+    day_start = piece_days.astype ('M8[m]')
+    one_hour = np.timedelta64 (1, 'h')
+    hours1 = np.maximum (starts[entry_idx] - day_start,
+            np.timedelta64 (0, 'm')) / one_hour
+    hours2 = np.minimum (ends[entry_idx] - day_start,
+            np.timedelta64 (24, 'h')) / one_hour
+    days = date_epoch + piece_days.astype (float)
+    out.verts = verts = np.empty ((len (days), 4, 2))
+    verts[:,:,0] = days[:,np.newaxis] + [0, 0, 1, 1]
+    verts[:,0,1] = verts[:,3,1] = hours1
+    verts[:,1,1] = verts[:,2,1] = hours2
+    return out
@@ -10,9 +10,19 @@ needed to add this useful functionality to a matplotlib environment.
 
 """
 
+import collections
 import copy
 import datetime
+import errno
+import functools
+import hashlib
 from itertools import izip
+import logging
+import multiprocessing
+import multiprocessing.pool
+import os
+import tempfile
+import threading
 import numpy as np
 
 def timedelta_to_seconds (dt):
@@ -20,10 +30,44 @@ def timedelta_to_seconds (dt):
     return dt.seconds + dt.microseconds / 1E6 + dt.days * 86400
 
 
+def readonly (array):
+    """Return a read-only view of array."""
+    view = array.view ()
+    view.flags.writeable = False
+    return view
+
+
+def valid (array):
+    """Get a mask of the finite (or, for datetime64, non-NaT) elements."""
+    if array.dtype.kind == 'M':
+        return ~np.isnat (array)
+    else:
+        return np.isfinite (array)
+
+def finite (array, weights=None):
+    """Return array and weights, keeping only elements where both are
+    finite."""
+    array = np.asarray (array)
+    idx = valid (array)
+    if weights is not None:
+        weights = np.asarray (weights)
+        idx &= np.isfinite (weights)
+        weights = weights[idx]
+    return array[idx], weights
+
+def _partial_sums (args):
+    # module level so that it can be used with multiprocessing
+    binner, array, weights, edges = args
+    array, weights = finite (binner.asarray (array), weights)
+    return binner.sums (array, weights, edges)
+
+
 class Binner (object):
 
     """Tool to generate :class:`Hist` instances."""
 
+    min_parallel_size = 1000000
+
     def __init__ (self, bins=50, range=None):
         """Initialize a Binner.
         
@@ -52,35 +96,404 @@ class Binner (object):
         """The numpy.histogram() keyword arguments."""
         return dict (bins=self.bins, range=self.range)
 
-    def hist (self, array, weights=None):
-        """Create a :class:`Hist`."""
+    @property
+    def uniform (self):
+        """Whether the bins are given as a count of equal-width bins."""
+        return np.ndim (self.bins) == 0
+
+    @property
+    def fixed (self):
+        """Whether the bin edges are known without looking at the data."""
+        return not self.uniform or self.range is not None
+
+    def asarray (self, array):
+        """Convert array to a numpy.ndarray of the type to be binned."""
+        return np.asarray (array)
+
+    def edges (self, array=None):
+        """Get the bin edges.
+
+        :type   array: numpy.ndarray
+        :param  array: The (finite) data, used to find the range if none was
+            given.
+
+        """
+        if not self.uniform:
+            return np.asarray (self.bins, dtype=float)
+        if self.range is not None:
+            lo, hi = self.range
+        elif array is not None and len (array):
+            lo, hi = array.min (), array.max ()
+        else:
+            lo, hi = 0, 1
+        if lo == hi:
+            lo, hi = lo - .5, hi + .5
+        return np.linspace (lo, hi, int (self.bins) + 1)
+
+    def bin_index (self, array, edges):
+        """Get the bin index for each element of array, or -1 if out of range.
+
+        :type   array: numpy.ndarray
+        :param  array: The (finite) data.
+
+        :type   edges: numpy.ndarray
+        :param  edges: The bin edges, as from :meth:`edges`.
+
+        """
+        n_bins = len (edges) - 1
+        if self.uniform:
+            lo, hi = edges[0], edges[-1]
+            keep = (lo <= array) & (array <= hi)
+            x = array[keep]
+            idx = ((x - lo) * (n_bins / (hi - lo))).astype (np.intp)
+            idx[idx == n_bins] -= 1
+            # correct for rounding at the edges, as numpy.histogram does
+            idx[x < edges[idx]] -= 1
+            idx[(x >= edges[idx + 1]) & (idx != n_bins - 1)] += 1
+            out = np.empty (len (array), dtype=np.intp)
+            out.fill (-1)
+            out[keep] = idx
+        else:
+            out = np.searchsorted (edges, array, side='right') - 1
+            out[array == edges[-1]] = n_bins - 1
+            out[out >= n_bins] = -1
+        return out
+
+    def sums (self, array, weights, edges):
+        """Get the per-bin sums of weights and of squared weights.
+
+        :type   array: numpy.ndarray
+        :param  array: The (finite) data.
+
+        :type   weights: numpy.ndarray
+        :param  weights: The (finite) weights, or None for unit weights.
+
+        :type   edges: numpy.ndarray
+        :param  edges: The bin edges, as from :meth:`edges`.
+
+        """
+        n_bins = len (edges) - 1
+        idx = self.bin_index (array, edges)
+        keep = idx >= 0
+        idx = idx[keep]
         if weights is None:
-            weights = np.ones (len (array))
-        idx = np.isfinite (array) * np.isfinite (weights)
+            sum_w = np.bincount (idx, minlength=n_bins).astype (float)
+            return sum_w, sum_w.copy ()
+        weights = weights[keep]
+        sum_w = np.bincount (idx, weights=weights, minlength=n_bins)
+        sum_w2 = np.bincount (idx, weights=weights**2, minlength=n_bins)
+        return sum_w, sum_w2
 
-        range = (self.range,) if self.range else None
+    def hist (self, array, weights=None, workers=1, processes=False):
+        """Create a :class:`Hist`.
+
+        :type   array: numpy.ndarray
+        :param  array: The data.
+
+        :type   weights: numpy.ndarray
+        :param  weights: The per-element weights (default: 1).
 
-        if idx.sum () == 0:
-            ignored, bins = np.histogram ([1], weights=[0], bins=self.bins,
-                    range=self.range)
-            return Hist (
-                    bins, np.zeros (len (bins) - 1), np.zeros (len (bins) - 1))
+        :type   workers: int
+        :param  workers: If greater than 1 and the input has at least
+            min_parallel_size elements, split the input into this many chunks
+            and fill them in parallel.
+
+        :type   processes: bool
+        :param  processes: If True, use a process pool rather than a thread
+            pool.  Chunks are then copied to the worker processes.
+
+        """
+        array = self.asarray (array)
+        if array.ndim > 1:
+            return self._histdd (array, weights)
+        if weights is not None:
+            weights = np.asarray (weights)
+
+        if not self.fixed:
+            array, weights = finite (array, weights)
+            edges = self.edges (array)
+        else:
+            edges = self.edges ()
+
+        if workers > 1 and len (array) >= self.min_parallel_size:
+            bounds = np.linspace (0, len (array), workers + 1).astype (int)
+            tasks = [
+                    (self, array[i:j],
+                        None if weights is None else weights[i:j], edges)
+                    for (i, j) in izip (bounds[:-1], bounds[1:])]
+            if processes:
+                pool = multiprocessing.Pool (workers)
+            else:
+                pool = multiprocessing.pool.ThreadPool (workers)
+            try:
+                results = pool.map (_partial_sums, tasks)
+            finally:
+                pool.close ()
+                pool.join ()
+            sum_w = np.sum ([r[0] for r in results], axis=0)
+            sum_w2 = np.sum ([r[1] for r in results], axis=0)
+        else:
+            sum_w, sum_w2 = _partial_sums ((self, array, weights, edges))
+        return Hist._new (edges, sum_w, np.sqrt (sum_w2))
 
+    def _histdd (self, array, weights=None):
+        if weights is None:
+            weights = np.ones (len (array))
+        idx = np.isfinite (array).all (axis=1) * np.isfinite (weights)
+        range = (self.range,) if self.range else None
         result = np.histogramdd (array[idx], weights=weights[idx],
                 bins=self.bins, range=range)
         values, bins = result[0], result[1][0]
         result = np.histogramdd (array[idx], weights=weights[idx]**2,
                 bins=self.bins, range=range)
         errors = np.sqrt (result[0])
+        return Hist._new (bins, values, errors)
+
+    def accumulator (self):
+        """Get an empty :class:`Accumulator` for these bins."""
+        return Accumulator (self)
+
+
+class CalendarBinner (Binner):
+
+    """Tool to generate :class:`Hist` instances with calendar-aligned bins.
+
+    Bin edges are numpy.datetime64 values at midnight.  Each bin includes its
+    left edge and excludes its right edge.
+
+    """
+
+    units = ('day', 'week', 'month', 'quarter', 'year')
+
+    def __init__ (self, unit='day', n=1, range=None):
+        """Initialize a CalendarBinner.
+
+        :type   unit: str
+        :param  unit: One of 'day', 'week' (starting Mondays), 'month',
+            'quarter' or 'year'.
+
+        :type   n: int
+        :param  n: The number of units per bin.
+
+        :type   range: tuple
+        :param  range: The first and last times to be covered.  Bins start at
+            the beginning of the unit containing the first time, and continue
+            past the last time.
+
+        """
+        if unit not in self.units:
+            raise ValueError ('unit must be one of {0}'.format (self.units))
+        if n < 1:
+            raise ValueError ('n must be at least 1')
+        self._unit = unit
+        self._n = int (n)
+        if range is not None:
+            range = tuple (np.asarray (range, dtype='M8[us]'))
+        Binner.__init__ (self, bins=None, range=range)
+
+    @property
+    def unit (self):
+        """The calendar unit."""
+        return self._unit
+
+    @property
+    def n (self):
+        """The number of units per bin."""
+        return self._n
+
+    @property
+    def uniform (self):
+        return False
+
+    @property
+    def fixed (self):
+        return self.range is not None
+
+    def asarray (self, array):
+        return np.asarray (array, dtype='M8[us]')
+
+    def edges (self, array=None):
+        """Get the bin edges as a numpy.datetime64 array.
+
+        :type   array: numpy.ndarray
+        :param  array: The (valid) times, used to find the range if none was
+            given.
+
+        """
+        if self.range is not None:
+            t0, t1 = self.range
+        elif array is not None and len (array):
+            t0, t1 = array.min (), array.max ()
+        else:
+            raise ValueError ('a range or non-empty data is required')
+        d0 = np.datetime64 (t0, 'D')
+        d1 = np.datetime64 (t1, 'D')
+        if self.unit in ('day', 'week'):
+            step = self.n
+            if self.unit == 'week':
+                step *= 7
+                # 1970-01-01 was a Thursday
+                d0 -= (d0.astype (int) + 3) % 7
+            n_bins = (d1 - d0).astype (int) // step + 1
+            edges = d0 + (step * np.arange (n_bins + 1)).astype ('m8[D]')
+        else:
+            step = self.n * dict (month=1, quarter=3, year=12)[self.unit]
+            m0 = np.datetime64 (d0, 'M')
+            if self.unit != 'month':
+                m0 -= m0.astype (int) % (step // self.n)
+            m1 = np.datetime64 (d1, 'M')
+            n_bins = (m1 - m0).astype (int) // step + 1
+            edges = m0 + (step * np.arange (n_bins + 1)).astype ('m8[M]')
+        return edges.astype ('M8[us]')
+
+    def bin_index (self, array, edges):
+        n_bins = len (edges) - 1
+        out = np.searchsorted (edges, array, side='right') - 1
+        out[out >= n_bins] = -1
+        return out
+
+
+class Accumulator (object):
 
-        return Hist (bins, values, errors)
+    """Accumulate a histogram from data that arrives in chunks."""
+
+    def __init__ (self, binner):
+        """Initialize an Accumulator.
+
+        :type   binner: :class:`Binner`
+        :param  binner: The Binner giving the bins.  Since the bins must be
+            fixed before any data arrives, it must have either explicit bin
+            edges or a range.
+
+        """
+        if not binner.fixed:
+            raise ValueError ('binner must have a range or explicit bins')
+        self._binner = binner
+        self._edges = binner.edges ()
+        self._sum_w = np.zeros (len (self._edges) - 1)
+        self._sum_w2 = np.zeros (len (self._edges) - 1)
+
+    @property
+    def binner (self):
+        """The :class:`Binner`."""
+        return self._binner
+
+    @property
+    def edges (self):
+        """The bin edges."""
+        return readonly (self._edges)
+
+    def fill (self, array, weights=None):
+        """Add a chunk of data.
+
+        :type   array: numpy.ndarray
+        :param  array: The data.
+
+        :type   weights: numpy.ndarray
+        :param  weights: The per-element weights (default: 1).
+
+        """
+        sum_w, sum_w2 = _partial_sums (
+                (self._binner, array, weights, self._edges))
+        self._sum_w += sum_w
+        self._sum_w2 += sum_w2
+        return self
+
+    def merge (self, *others):
+        """Add the contents of other Accumulators with the same bins."""
+        for other in others:
+            assert (len (self._edges) == len (other._edges)
+                    and np.array_equal (self._edges, other._edges))
+            self._sum_w += other._sum_w
+            self._sum_w2 += other._sum_w2
+        return self
+
+    def hist (self):
+        """Get a :class:`Hist` of the data so far."""
+        return Hist._new (
+                self._edges, self._sum_w.copy (), np.sqrt (self._sum_w2))
+
+
+class Binner2D (object):
+
+    """Tool to generate :class:`Hist2D` instances."""
+
+    def __init__ (self, xbinner, ybinner):
+        """Initialize a Binner2D.
+
+        :type   xbinner: :class:`Binner`
+        :param  xbinner: The Binner (or :class:`CalendarBinner`) for x.
+
+        :type   ybinner: :class:`Binner`
+        :param  ybinner: The Binner (or :class:`CalendarBinner`) for y.
+
+        """
+        self._xbinner = xbinner
+        self._ybinner = ybinner
+
+    @property
+    def xbinner (self):
+        """The :class:`Binner` for x."""
+        return self._xbinner
+
+    @property
+    def ybinner (self):
+        """The :class:`Binner` for y."""
+        return self._ybinner
+
+    def sums (self, x, y, weights=None):
+        """Get the bin edges and per-bin sums of weights and squared weights.
+
+        :return: (xedges, yedges, sum_w, sum_w2), where the sums have shape
+            (len (xedges) - 1, len (yedges) - 1).
+
+        """
+        xb, yb = self.xbinner, self.ybinner
+        x = xb.asarray (x)
+        y = yb.asarray (y)
+        idx = valid (x) & valid (y)
+        if weights is not None:
+            weights = np.asarray (weights)
+            idx &= np.isfinite (weights)
+            weights = weights[idx]
+        x, y = x[idx], y[idx]
+        xedges = xb.edges () if xb.fixed else xb.edges (x)
+        yedges = yb.edges () if yb.fixed else yb.edges (y)
+        nx, ny = len (xedges) - 1, len (yedges) - 1
+        ix = xb.bin_index (x, xedges)
+        iy = yb.bin_index (y, yedges)
+        keep = (ix >= 0) & (iy >= 0)
+        flat = ix[keep] * ny + iy[keep]
+        if weights is None:
+            sum_w = np.bincount (flat, minlength=nx * ny).astype (float)
+            sum_w2 = sum_w.copy ()
+        else:
+            weights = weights[keep]
+            sum_w = np.bincount (flat, weights=weights, minlength=nx * ny)
+            sum_w2 = np.bincount (flat, weights=weights**2, minlength=nx * ny)
+        return (xedges, yedges,
+                sum_w.reshape (nx, ny), sum_w2.reshape (nx, ny))
+
+    def hist (self, x, y, weights=None):
+        """Create a :class:`Hist2D`."""
+        xedges, yedges, sum_w, sum_w2 = self.sums (x, y, weights)
+        return Hist2D._new (xedges, yedges, sum_w, np.sqrt (sum_w2))
 
 
 class Line (object):
 
-    """Base class for binned lines such as histograms."""
+    """Base class for binned lines such as histograms.
+
+    A Line does not copy the arrays it is given unless asked to; the caller
+    should not modify them afterward.  The bins, values and errors
+    properties are read-only views.  Arrays shared with the caller are copied
+    only when the Line itself needs to modify them.
+
+    """
+
+    __slots__ = ('_bins', '_values', '_errors', '_owned', '_bin_centers')
 
-    def __init__ (self, bins, values, errors=None):
+    def __init__ (self, bins, values, errors=None, copy=False):
         """Initialize a Line.
 
         :type   bins: numpy.ndarray
@@ -91,13 +504,88 @@ class Line (object):
 
         :type   errors: numpy.ndarray
         :param  errors: The per-bin errors.
+
+        :type   copy: bool
+        :param  copy: If True, copy the given arrays rather than sharing them.
         """
-        self.bins = np.asarray (bins)
-        self.values = np.asarray (values)
+        self._owned = set ()
+        self._set ('bins', bins, copy)
+        self._set ('values', values, copy)
         if errors is None:
-            self.errors = np.zeros (len (values))
+            self._adopt ('errors', np.zeros (len (self._values)))
         else:
-            self.errors = np.asarray (errors)
+            self._set ('errors', errors, copy)
+
+    @classmethod
+    def _new (cls, bins, values, errors):
+        """Construct a Line that takes ownership of newly allocated values
+        and errors, sharing bins."""
+        out = cls.__new__ (cls)
+        out._owned = set ()
+        out._set ('bins', bins, False)
+        out._adopt ('values', values)
+        out._adopt ('errors', errors)
+        return out
+
+    def _set (self, name, array, copy):
+        if copy:
+            self._adopt (name, np.array (array))
+        else:
+            setattr (self, '_' + name, np.asarray (array))
+            self._owned.discard (name)
+        if name == 'bins':
+            self._bin_centers = None
+
+    def _adopt (self, name, array):
+        setattr (self, '_' + name, np.asarray (array))
+        self._owned.add (name)
+
+    def _float_writable (self, name):
+        """Get the named array as floats for in-place modification."""
+        array = getattr (self, '_' + name)
+        if name not in self._owned or array.dtype.kind != 'f':
+            self._adopt (name, np.array (array, dtype=float))
+        return getattr (self, '_' + name)
+
+    def _writable (self, name):
+        """Get the named array for in-place modification, copying it first
+        if it is shared."""
+        if name not in self._owned:
+            self._adopt (name, np.array (getattr (self, '_' + name)))
+        return getattr (self, '_' + name)
+
+    def copy (self):
+        """Get a copy of this Line with its own values and errors."""
+        return self._new (self._bins, self._values.copy (), self._errors.copy ())
+
+    def save (self, file):
+        """Save to a numpy .npz file.
+
+        :type   file: str or file
+        :param  file: The filename or open file.
+
+        Bins given as datetime objects are stored as datetime64 and restored
+        as datetime objects by :meth:`load`.
+        """
+        bins = self._bins
+        object_bins = bins.dtype.kind == 'O'
+        if object_bins:
+            bins = bins.astype ('M8[us]')
+        np.savez (file, bins=bins, values=self._values, errors=self._errors,
+                object_bins=object_bins)
+
+    @classmethod
+    def load (cls, file):
+        """Load from a numpy .npz file written by :meth:`save`.
+
+        :type   file: str or file
+        :param  file: The filename or open file.
+        """
+        with np.load (file) as data:
+            bins = data['bins']
+            if data['object_bins']:
+                bins = bins.astype (object)
+            return cls._new (bins, data['values'], data['errors'])
 
     def bins_match (a, b):
         """Check whether two Lines have matching bins.
@@ -110,35 +598,38 @@ class Line (object):
 
         :return: Whether the bins match (bool).
         """
-        return np.sum ((a.bins - b.bins)**2) == 0
+        if a._bins is b._bins:
+            return True
+        return len (a._bins) == len (b._bins) \
+                and np.array_equal (a._bins, b._bins)
 
     def __add__ (a, b):
         if a.__class__ is b.__class__:
             assert (a.bins_match (b))
-            values = 1.0 * a.values + b.values
-            errors = np.sqrt (a.errors**2 + b.errors**2)
-            return a.__class__ (a.bins, values, errors)
+            values = 1.0 * a._values + b._values
+            errors = np.sqrt (a._errors**2 + b._errors**2)
+            return a._new (a._bins, values, errors)
         else:
-            return a.__class__ (a.bins, values + b, errors)
+            return a._new (a._bins, a._values + b, a._errors.copy ())
 
     def __sub__ (a, b):
         if a.__class__ is b.__class__:
             assert (a.bins_match (b))
-            values = 1.0 * a.values - b.values
-            errors = np.sqrt (a.errors**2 - b.errors**2)
-            return a.__class__ (a.bins, values, errors)
+            values = 1.0 * a._values - b._values
+            errors = np.sqrt (a._errors**2 + b._errors**2)
+            return a._new (a._bins, values, errors)
         else:
-            return a.__class__ (a.bins, values + b, errors)
+            return a._new (a._bins, a._values - b, a._errors.copy ())
 
     def __mul__ (a, b):
         if isinstance (b, Line):
             assert (a.bins_match (b))
-            values = a.values * b.values
+            values = a._values * b._values
             errors = values * np.sqrt (
-                    (a.errors / a.values)**2 + (b.errors / b.values)**2)
-            return Line (a.bins, values, errors)
+                    (a._errors / a._values)**2 + (b._errors / b._values)**2)
+            return Line._new (a._bins, values, errors)
         else:
-            return a.__class__ (a.bins, b * a.values, abs (b) * a.errors)
+            return a._new (a._bins, b * a._values, abs (b) * a._errors)
 
     def __rmul__ (self, scalar):
         return self * scalar
@@ -146,74 +637,169 @@ class Line (object):
     def __div__ (a, b):
         if isinstance (b, Line):
             assert (a.bins_match (b))
-            values = a.values / b.values
+            values = a._values / b._values
             errors = values * np.sqrt (
-                    (a.errors / a.values)**2 + (b.errors / b.values)**2)
-            return Line (a.bins, values, errors)
+                    (a._errors / a._values)**2 + (b._errors / b._values)**2)
+            return Line._new (a._bins, values, errors)
         else:
             b = 1.0 * b
-            return a.__class__ (a.bins, a.values / b, a.errors / b)
+            return a._new (a._bins, a._values / b, a._errors / b)
 
     __truediv__ = __div__
 
+    def __iadd__ (a, b):
+        values = a._float_writable ('values')
+        if a.__class__ is b.__class__:
+            assert (a.bins_match (b))
+            errors = a._float_writable ('errors')
+            # square b's errors first, in case b is a
+            b_errors2 = b._errors**2
+            values += b._values
+            errors **= 2
+            errors += b_errors2
+            np.sqrt (errors, out=errors)
+        else:
+            values += b
+        return a
+
+    def __isub__ (a, b):
+        values = a._float_writable ('values')
+        if a.__class__ is b.__class__:
+            assert (a.bins_match (b))
+            errors = a._float_writable ('errors')
+            # square b's errors first, in case b is a
+            b_errors2 = b._errors**2
+            values -= b._values
+            errors **= 2
+            errors += b_errors2
+            np.sqrt (errors, out=errors)
+        else:
+            values -= b
+        return a
+
+    def __imul__ (a, b):
+        values = a._float_writable ('values')
+        errors = a._float_writable ('errors')
+        if isinstance (b, Line):
+            assert (a.bins_match (b))
+            rel2 = (errors / values)**2 + (b._errors / b._values)**2
+            values *= b._values
+            np.multiply (values, np.sqrt (rel2), out=errors)
+        else:
+            values *= b
+            errors *= abs (b)
+        return a
+
+    def __itruediv__ (a, b):
+        values = a._float_writable ('values')
+        errors = a._float_writable ('errors')
+        if isinstance (b, Line):
+            assert (a.bins_match (b))
+            rel2 = (errors / values)**2 + (b._errors / b._values)**2
+            values /= b._values
+            np.multiply (values, np.sqrt (rel2), out=errors)
+        else:
+            values /= b
+            errors /= b
+        return a
+
+    __idiv__ = __itruediv__
+
     @property
     def bins (self):
         """The bin boundaries."""
-        return self._bins
+        return readonly (self._bins)
     @bins.setter
     def bins (self, bins):
-        self._bins = copy.deepcopy (bins)
+        self._set ('bins', bins, False)
 
     @property
     def values (self):
         """The bin values, or counts."""
-        return self._values
+        return readonly (self._values)
     @values.setter
     def values (self, values):
-        self._values = copy.deepcopy (values)
+        self._set ('values', values, False)
 
     @property
     def errors (self):
         """The bin value errors."""
-        return self._errors
+        return readonly (self._errors)
     @errors.setter
     def errors (self, errors):
-        self._errors = copy.deepcopy (errors)
+        self._set ('errors', errors, False)
 
     @property
     def bin_centers (self):
-        """The bin centers."""
-        bins = self.bins
-        first = bins[0]
-        if isinstance (first, datetime.date):
-            bins = np.array ([
-                datetime.datetime (b.year, b.month, b.day, 0, 0, 0, 0)
-                for b in bins ])
-        first = bins[0]
-        if isinstance (first, datetime.datetime):
-            dts = np.array ([
-                timedelta_to_seconds (b2 - b1)
-                for (b1,b2) in izip (bins[:-1], bins[1:])])
-            centers = np.array ([
-                b + datetime.timedelta (seconds=.5 * dt)
-                for (b,dt) in izip (bins[:-1], dts)])
-        else:
-            centers = bins[:-1] + (bins[1:] - bins[:-1]) / 2
-        return centers
+        """The bin centers.
+
+        For datetime bins, the centers are the midpoints in time.  The result
+        is cached until the bins are changed.
+        """
+        if self._bin_centers is None:
+            self._bin_centers = get_bin_centers (self._bins)
+        return readonly (self._bin_centers)
+
+
+def get_bin_centers (bins):
+    """Get the centers of the bins with edges given by bins."""
+    if bins.dtype.kind == 'O' and len (bins) \
+            and isinstance (bins[0], datetime.date):
+        return get_bin_centers (bins.astype ('M8[us]')).astype (object)
+    if bins.dtype.kind == 'M':
+        bins = bins.astype ('M8[us]')
+        return bins[:-1] + (bins[1:] - bins[:-1]) // 2
+    return bins[:-1] + (bins[1:] - bins[:-1]) / 2
+
+
+def rebin_index (bins, new_bins):
+    """Get the indices of the edges kept when rebinning.
+
+    :type   bins: numpy.ndarray
+    :param  bins: The current bin edges.
+
+    :type   new_bins: int or numpy.ndarray
+    :param  new_bins: As for :meth:`Hist.rebin`.
+
+    :return: An increasing int array of indices into bins.
+
+    """
+    n_edges = len (bins)
+    if np.ndim (new_bins) == 0:
+        factor = int (new_bins)
+        if factor < 1:
+            raise ValueError ('rebin factor must be at least 1')
+        idx = np.arange (0, n_edges, factor)
+        if idx[-1] != n_edges - 1:
+            idx = np.r_[idx, n_edges - 1]
+        return idx
+    dtype = bins.dtype
+    if dtype.kind in 'biu':
+        # don't truncate fractional edges to match integer bins
+        dtype = np.result_type (dtype, np.asarray (new_bins).dtype)
+    edges = np.asarray (new_bins, dtype=dtype)
+    idx = np.searchsorted (bins, edges)
+    if len (idx) < 2 or np.any (idx >= n_edges) \
+            or np.any (bins[np.minimum (idx, n_edges - 1)] != edges) \
+            or np.any (np.diff (idx) <= 0):
+        raise ValueError ('new edges must be an increasing subset of the bins')
+    return idx
 
 
 class Hist (Line):
 
     """A histogram."""
 
-    def __init__ (self, bins, values, errors=None):
+    __slots__ = ()
+
+    def __init__ (self, bins, values, errors=None, copy=False):
         """Initialize a Hist.
 
         All arguments are passed directly to the :class:`Line`
         constructor.
 
         """
-        Line.__init__ (self, bins, values, errors)
+        Line.__init__ (self, bins, values, errors, copy=copy)
 
 
     @property
@@ -240,13 +826,34 @@ class Hist (Line):
     def cumulative_right (self):
         """The cumulative histogram, adding to the right."""
         # TODO: include proper errors
-        return Line (self.bins, self.values.cumsum ())
+        values = self._values.cumsum ()
+        return Line._new (self._bins, values, np.zeros (len (values)))
 
     @property
     def cumulative_left (self):
         """The cumulative histogram, adding to the left."""
         # TODO: include proper errors
-        return Line (self.bins, self.sum - self.values.cumsum ())
+        values = self.sum - self._values.cumsum ()
+        return Line._new (self._bins, values, np.zeros (len (values)))
+
+    def rebin (self, bins):
+        """Get a copy of this Hist with adjacent bins merged.
+
+        :type   bins: int or numpy.ndarray
+        :param  bins: Either the number of adjacent bins to merge (the last
+            new bin may be partial), or the new bin edges, which must be a
+            subset of the current ones.  Bins outside the new edges are
+            dropped.
+
+        Values are summed and errors are added in quadrature.
+
+        """
+        idx = rebin_index (self._bins, bins)
+        starts = idx[:-1]
+        stop = idx[-1]
+        values = np.add.reduceat (self._values[:stop], starts)
+        errors = np.sqrt (np.add.reduceat (self._errors[:stop]**2, starts))
+        return self._new (self._bins[idx], values, errors)
 
     def efficiency (self, base_hist):
         """Get an efficiency plot for this Hist divided by base_hist.
@@ -265,12 +872,513 @@ class Hist (Line):
         eff = keep / orig
         nkeep = keep.values
         nrej = rej.values
-        eff.errors = np.sqrt (
+        eff._adopt ('errors', np.sqrt (
                 (nrej / (nkeep+nrej)**2 * keep.errors)**2
-                + (-nkeep / (nkeep+nrej)**2 * rej.errors)**2 )
+                + (-nkeep / (nkeep+nrej)**2 * rej.errors)**2 ))
         return eff
 
 
+def sum_hists (hists):
+    """Sum many :class:`Line` objects with matching bins.
+
+    :type   hists: iterable
+    :param  hists: The :class:`Line` or :class:`Hist` objects to sum.
+
+    :return: A new object of the same class as the first one, with values
+        summed and errors added in quadrature.
+
+    """
+    hists = list (hists)
+    if not hists:
+        raise ValueError ('at least one Line is required')
+    first = hists[0]
+    for h in hists[1:]:
+        assert (first.bins_match (h))
+    values = np.vstack ([h._values for h in hists])
+    errors = np.vstack ([h._errors for h in hists])
+    return first._new (first._bins,
+            values.sum (axis=0, dtype=float),
+            np.sqrt ((errors**2).sum (axis=0)))
+
+
+def makedirs (directory):
+    """Create directory and its parents, unless directory already exists
+    (even if another process creates it concurrently)."""
+    try:
+        os.makedirs (directory)
+    except OSError as e:
+        if e.errno != errno.EEXIST or not os.path.isdir (directory):
+            raise
+
+
+class HistCache (object):
+
+    """A directory of saved Lines, evicted least recently used first."""
+
+    def __init__ (self, directory, max_bytes=64 * 2**20):
+        """Initialize a HistCache.
+
+        :type   directory: str
+        :param  directory: The cache directory (created when needed).
+
+        :type   max_bytes: int
+        :param  max_bytes: The total file size above which the least recently
+            used entries are removed.
+        """
+        self._directory = directory
+        self._max_bytes = max_bytes
+
+    @property
+    def directory (self):
+        """The cache directory."""
+        return self._directory
+
+    @property
+    def max_bytes (self):
+        """The maximum total size of the cache."""
+        return self._max_bytes
+
+    def key (self, *parts):
+        """Get a key from the repr of each of parts."""
+        h = hashlib.sha1 ()
+        for part in parts:
+            h.update (repr (part))
+            h.update ('\0')
+        return h.hexdigest ()
+
+    def filename (self, key):
+        """Get the filename for key."""
+        return os.path.join (self.directory, key + '.npz')
+
+    def get (self, key, cls=None):
+        """Load the Line stored under key, or return None.
+
+        :type   cls: type
+        :param  cls: The :class:`Line` subclass to load (default:
+            :class:`Hist`).
+        """
+        cls = cls or Hist
+        filename = self.filename (key)
+        try:
+            out = cls.load (filename)
+        except (IOError, OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime (filename, None)
+        except OSError:
+            pass
+        return out
+
+    def put (self, key, line):
+        """Store line under key, then evict old entries if needed.
+
+        The cache only saves time, so a failure to write it (for example, an
+        unwritable directory) is logged rather than raised.
+        """
+        try:
+            self._put (key, line)
+        except (IOError, OSError) as e:
+            logging.warning ('could not write to cache in {0}: {1}'.format (
+                self.directory, e))
+
+    def _put (self, key, line):
+        makedirs (self.directory)
+        fd, tmp = tempfile.mkstemp (suffix='.tmp', dir=self.directory)
+        try:
+            with os.fdopen (fd, 'wb') as f:
+                line.save (f)
+            os.rename (tmp, self.filename (key))
+        except:
+            os.remove (tmp)
+            raise
+        self.evict ()
+
+    def evict (self):
+        """Remove the least recently used entries until the total size is at
+        most max_bytes."""
+        entries = []
+        for name in os.listdir (self.directory):
+            if not name.endswith ('.npz'):
+                continue
+            try:
+                stat = os.stat (os.path.join (self.directory, name))
+            except OSError:
+                continue
+            entries.append ((stat.st_mtime, stat.st_size, name))
+        entries.sort ()
+        total = sum (size for mtime, size, name in entries)
+        for mtime, size, name in entries:
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove (os.path.join (self.directory, name))
+            except OSError:
+                pass
+            total -= size
+
+    def clear (self):
+        """Remove all entries."""
+        if not os.path.isdir (self.directory):
+            return
+        for name in os.listdir (self.directory):
+            if name.endswith ('.npz'):
+                os.remove (os.path.join (self.directory, name))
+
+
+class LRUCache (object):
+
+    """An in-memory cache holding the most recently used max_size values.
+
+    LRUCache has the same get/put interface as :class:`HistCache`, but may
+    store any object, and is safe to use from multiple threads.
+    """
+
+    def __init__ (self, max_size=128):
+        """Initialize an LRUCache.
+
+        :type   max_size: int
+        :param  max_size: The number of values to keep.
+        """
+        self._max_size = max_size
+        self._values = collections.OrderedDict ()
+        self._lock = threading.Lock ()
+
+    @property
+    def max_size (self):
+        """The number of values to keep."""
+        return self._max_size
+
+    def __len__ (self):
+        return len (self._values)
+
+    def key (self, *parts):
+        """Get a key from parts, which must be hashable."""
+        return parts
+
+    def get (self, key):
+        """Get the value stored under key, or return None."""
+        with self._lock:
+            try:
+                value = self._values.pop (key)
+            except KeyError:
+                return None
+            self._values[key] = value
+            return value
+
+    def put (self, key, value):
+        """Store value under key, evicting the least recently used value if
+        needed."""
+        with self._lock:
+            self._values.pop (key, None)
+            self._values[key] = value
+            while len (self._values) > self.max_size:
+                self._values.popitem (last=False)
+
+    def clear (self):
+        """Remove all values."""
+        with self._lock:
+            self._values.clear ()
+
+
+def cached (cache, key):
+    """Decorator storing the values returned by a function in a cache.
+
+    :type   cache: :class:`HistCache` or :class:`LRUCache`
+    :param  cache: The cache, or None to disable caching.
+
+    :type   key: callable
+    :param  key: Called with the function's arguments; returns a tuple of
+        the values (such as the data version, bin spec and range) that
+        determine the result.
+
+    """
+    def wrap (func):
+        @functools.wraps (func)
+        def wrapped (*args, **kwargs):
+            if cache is None:
+                return func (*args, **kwargs)
+            k = cache.key (func.__name__, *key (*args, **kwargs))
+            out = cache.get (k)
+            if out is None:
+                out = func (*args, **kwargs)
+                cache.put (k, out)
+            return out
+        return wrapped
+    return wrap
+
+
+class Hist2D (object):
+
+    """A two-dimensional histogram.
+
+    Like :class:`Line`, a Hist2D shares the arrays it is given unless asked
+    to copy them, and exposes them as read-only views.
+
+    """
+
+    __slots__ = ('_xbins', '_ybins', '_values', '_errors')
+
+    def __init__ (self, xbins, ybins, values, errors=None, copy=False):
+        """Initialize a Hist2D.
+
+        :type   xbins: numpy.ndarray
+        :param  xbins: The x bin edges.
+
+        :type   ybins: numpy.ndarray
+        :param  ybins: The y bin edges.
+
+        :type   values: numpy.ndarray
+        :param  values: The bin values, with shape (len (xbins) - 1,
+            len (ybins) - 1).
+
+        :type   errors: numpy.ndarray
+        :param  errors: The per-bin errors.
+
+        :type   copy: bool
+        :param  copy: If True, copy the given arrays rather than sharing them.
+        """
+        conv = np.array if copy else np.asarray
+        self._xbins = conv (xbins)
+        self._ybins = conv (ybins)
+        self._values = conv (values)
+        if errors is None:
+            self._errors = np.zeros (self._values.shape)
+        else:
+            self._errors = conv (errors)
+
+    @classmethod
+    def _new (cls, xbins, ybins, values, errors):
+        out = cls.__new__ (cls)
+        out._xbins, out._ybins = xbins, ybins
+        out._values, out._errors = values, errors
+        return out
+
+    @property
+    def xbins (self):
+        """The x bin boundaries."""
+        return readonly (self._xbins)
+
+    @property
+    def ybins (self):
+        """The y bin boundaries."""
+        return readonly (self._ybins)
+
+    @property
+    def values (self):
+        """The bin values, indexed as [x, y]."""
+        return readonly (self._values)
+
+    @property
+    def errors (self):
+        """The bin value errors."""
+        return readonly (self._errors)
+
+    @property
+    def sum (self):
+        """The sum of the bin values."""
+        return self._values.sum ()
+
+    def project (self, axis):
+        """Sum the histogram along one axis.
+
+        :type   axis: int
+        :param  axis: 0 to sum over x, giving a :class:`Hist` in y; 1 to sum
+            over y, giving a :class:`Hist` in x.
+
+        Errors are added in quadrature.
+
+        """
+        bins = self._ybins if axis == 0 else self._xbins
+        return Hist._new (bins, self._values.sum (axis=axis),
+                np.sqrt ((self._errors**2).sum (axis=axis)))
+
+    def rebin (self, xbins=1, ybins=1):
+        """Get a copy of this Hist2D with adjacent bins merged.
+
+        :type   xbins: int or numpy.ndarray
+        :param  xbins: The x rebinning, as for :meth:`Hist.rebin`.
+
+        :type   ybins: int or numpy.ndarray
+        :param  ybins: The y rebinning, as for :meth:`Hist.rebin`.
+
+        """
+        ix = rebin_index (self._xbins, xbins)
+        iy = rebin_index (self._ybins, ybins)
+        def merge (array):
+            array = np.add.reduceat (array[:ix[-1]], ix[:-1], axis=0)
+            return np.add.reduceat (array[:,:iy[-1]], iy[:-1], axis=1)
+        return self._new (self._xbins[ix], self._ybins[iy],
+                merge (self._values), np.sqrt (merge (self._errors**2)))
+
+    def bins_match (a, b):
+        """Check whether two Hist2Ds have matching bins."""
+        def match (x, y):
+            return x is y or (len (x) == len (y) and np.array_equal (x, y))
+        return match (a._xbins, b._xbins) and match (a._ybins, b._ybins)
+
+    def __add__ (a, b):
+        assert (a.bins_match (b))
+        return a._new (a._xbins, a._ybins,
+                1.0 * a._values + b._values,
+                np.sqrt (a._errors**2 + b._errors**2))
+
+    def plot (self, axes, imshow=False, **kwargs):
+        """Draw the histogram as a heatmap.
+
+        :type   axes: matplotlib Axes
+        :param  axes: The axes on which to draw.
+
+        :type   imshow: bool
+        :param  imshow: If True, use axes.imshow(), which is faster but
+            assumes uniform bins; otherwise use axes.pcolormesh().
+
+        Other keyword arguments are passed to the matplotlib method.
+
+        :return: The matplotlib artist.
+        """
+        from matplotlib.dates import date2num
+        def numeric (bins):
+            if bins.dtype.kind == 'M':
+                bins = bins.astype ('M8[us]').astype (object)
+            if bins.dtype.kind == 'O':
+                return date2num (bins), True
+            return bins, False
+        xbins, x_is_date = numeric (self._xbins)
+        ybins, y_is_date = numeric (self._ybins)
+        if imshow:
+            kwargs.setdefault ('aspect', 'auto')
+            kwargs.setdefault ('interpolation', 'nearest')
+            out = axes.imshow (self._values.T, origin='lower',
+                    extent=(xbins[0], xbins[-1], ybins[0], ybins[-1]),
+                    **kwargs)
+        else:
+            out = axes.pcolormesh (xbins, ybins, self._values.T, **kwargs)
+        if x_is_date:
+            axes.xaxis_date ()
+        if y_is_date:
+            axes.yaxis_date ()
+        return out
+
+
+def interval_overlap (starts, ends, edges, unit='h'):
+    """Get the total overlap of a set of intervals with each bin.
+
+    :type   starts: numpy.ndarray
+    :param  starts: The interval start points (numbers or times).
+
+    :type   ends: numpy.ndarray
+    :param  ends: The interval end points.
+
+    :type   edges: numpy.ndarray
+    :param  edges: The increasing bin edges.
+
+    :type   unit: str
+    :param  unit: For times, the numpy timedelta unit in which to return the
+        overlap (default: hours).
+
+    :return: A float array of length len (edges) - 1.
+
+    Each interval contributes its full width to the bins it spans and is
+    clipped only in its first and last bins, so the cost is linear in the
+    number of intervals and bins apart from the searchsorted lookups.
+    """
+    def numeric (array):
+        array = np.asarray (array)
+        if array.dtype.kind in 'MO':
+            return np.asarray (array, dtype='M8[us]').astype (np.int64), True
+        return array.astype (float), False
+    edges, is_time = numeric (edges)
+    starts = np.clip (numeric (starts)[0], edges[0], edges[-1])
+    ends = np.clip (numeric (ends)[0], edges[0], edges[-1])
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    n = len (edges) - 1
+    # bin of each endpoint; an end on the last edge gets index n
+    i1 = np.searchsorted (edges, starts, side='right') - 1
+    i2 = np.searchsorted (edges, ends, side='right') - 1
+    # number of intervals covering each whole bin, via a difference array
+    multi = i2 > i1
+    cover = np.cumsum (
+            np.bincount (i1[multi] + 1, minlength=n + 2)
+            - np.bincount (i2[multi], minlength=n + 2))[:n]
+    overlap = cover * np.diff (edges)
+    # partial first and last bins
+    single = ~multi
+    partial = (
+            np.bincount (i1[single], ends[single] - starts[single],
+                minlength=n + 1)
+            + np.bincount (i1[multi], edges[i1[multi] + 1] - starts[multi],
+                minlength=n + 1)
+            + np.bincount (i2[multi], ends[multi] - edges[i2[multi]],
+                minlength=n + 1))
+    overlap = overlap + partial[:n]
+    if is_time:
+        overlap /= np.timedelta64 (1, unit).astype ('m8[us]').astype (np.int64)
+    return overlap
+
+
+def hour_weekday_hist (start_times, end_times):
+    """Get the hours spent in each hour of the day on each day of the week.
+
+    :type   start_times: numpy.ndarray
+    :param  start_times: The interval start times.
+
+    :type   end_times: numpy.ndarray
+    :param  end_times: The interval end times.
+
+    :return: A :class:`Hist2D` with hour of day (0 to 24) along x and
+        weekday (0 = Monday to 7) along y.
+
+    """
+    starts = np.asarray (start_times, dtype='M8[h]')
+    ends = np.asarray (end_times, dtype='M8[us]')
+    binner = Binner2D (Binner (24, (0, 24)), Binner (7, (0, 7)))
+    if not len (starts):
+        return binner.hist ([], [])
+    # hours overlapped with each absolute hour
+    h0 = starts.min ()
+    h1 = ends.max ().astype ('M8[h]') + np.timedelta64 (1, 'h')
+    hours = np.arange (h0, h1 + np.timedelta64 (1, 'h'))
+    overlap = interval_overlap (start_times, end_times, hours)
+    abs_hours = hours[:-1].astype (np.int64)
+    # the epoch, 1970-01-01, was a Thursday
+    return binner.hist (
+            abs_hours % 24, (abs_hours // 24 + 3) % 7, weights=overlap)
+
+
+def week_weekday_hist (dates, values, errors=None):
+    """Get the total value on each day of each week.
+
+    :type   dates: numpy.ndarray
+    :param  dates: The dates (or times) of the values.
+
+    :type   values: numpy.ndarray
+    :param  values: The values, such as counting entry amounts.
+
+    :type   errors: numpy.ndarray
+    :param  errors: The value errors, added in quadrature (default: 0).
+
+    :return: A :class:`Hist2D` with weeks (as datetime64 edges starting on
+        Mondays) along x and weekday (0 = Monday to 7) along y.  With no
+        dates, there are no weeks: xbins is empty and the values have shape
+        (0, 7).
+
+    """
+    days = np.asarray (dates, dtype='M8[us]').astype ('M8[D]')
+    weekdays = (days.astype (np.int64) + 3) % 7
+    binner = Binner2D (CalendarBinner ('week'), Binner (7, (0, 7)))
+    if not len (days):
+        yedges = binner.ybinner.edges ()
+        return Hist2D._new (np.array ([], dtype='M8[D]'), yedges,
+                np.zeros ((0, 7)), np.zeros ((0, 7)))
+    xedges, yedges, sum_w, sum_w2 = binner.sums (days, weekdays, values)
+    if errors is None:
+        errors = np.zeros (sum_w.shape)
+    else:
+        errors = np.sqrt (binner.sums (days, weekdays, errors)[3])
+    return Hist2D._new (xedges, yedges, sum_w, errors)
+
+
 class Style (object):
 
     """Simple style object for Lines."""
@@ -382,6 +1490,70 @@ class Style (object):
         return copy.deepcopy (self._kwargs)
 
 
+def minmax_decimate (bins, x, y, yerr, n_buckets, xlim=None):
+    """Reduce a binned line to a min/max envelope.
+
+    :type   bins: numpy.ndarray
+    :param  bins: The (numeric) bin edges.
+
+    :type   x: numpy.ndarray
+    :param  x: The (numeric) bin centers.
+
+    :type   y: numpy.ndarray
+    :param  y: The bin values.
+
+    :type   yerr: numpy.ndarray
+    :param  yerr: The bin errors, or None.
+
+    :type   n_buckets: int
+    :param  n_buckets: The number of buckets, typically the axes width in
+        pixels.
+
+    :type   xlim: tuple
+    :param  xlim: The visible x range (default: everything).
+
+    :return: (step, bars): the (N,2) step line vertices, and the (M,2,2)
+        error bar segments or None.  If the visible part of the line has at
+        most n_buckets bins, it is returned unchanged; otherwise each bucket
+        contributes its min and max, between the outer edges of the first and
+        last visible bins at their own values.
+
+    """
+    i1, i2 = 0, len (y)
+    if xlim is not None:
+        i1 = max (0, np.searchsorted (bins, min (xlim), side='right') - 2)
+        i2 = min (len (y), np.searchsorted (bins, max (xlim)) + 1)
+    if i2 - i1 <= n_buckets:
+        bins, x, y = bins[i1:i2+1], x[i1:i2], y[i1:i2]
+        step = np.column_stack ([np.repeat (bins, 2)[1:-1], np.repeat (y, 2)])
+        bars = None
+        if yerr is not None:
+            yerr = yerr[i1:i2]
+            bars = np.empty ((len (y), 2, 2))
+            bars[:,:,0] = x[:,np.newaxis]
+            bars[:,0,1] = y - yerr
+            bars[:,1,1] = y + yerr
+        return step, bars
+    starts = np.unique (np.linspace (i1, i2, n_buckets + 1).astype (int)[:-1])
+    ends = np.r_[starts[1:], i2]
+    xm = (bins[starts] + bins[ends]) / 2
+    y = y[:i2]
+    step = np.empty ((2 * len (starts) + 2, 2))
+    step[0] = bins[i1], y[i1]
+    step[-1] = bins[i2], y[i2-1]
+    step[1:-1,0] = np.repeat (xm, 2)
+    step[1:-1:2,1] = np.minimum.reduceat (y, starts)
+    step[2:-1:2,1] = np.maximum.reduceat (y, starts)
+    bars = None
+    if yerr is not None:
+        yerr = yerr[:i2]
+        bars = np.empty ((len (starts), 2, 2))
+        bars[:,:,0] = xm[:,np.newaxis]
+        bars[:,0,1] = np.minimum.reduceat (y - yerr, starts)
+        bars[:,1,1] = np.maximum.reduceat (y + yerr, starts)
+    return step, bars
+
+
 class Plotter (object):
 
     """Tool for plotting :class:`Line` objects."""
@@ -390,7 +1562,9 @@ class Plotter (object):
             twin_axes=None,
             log=False,
             twin_log=None,
-            expx=False):
+            expx=False,
+            collections=False,
+            decimate=False):
         """Initialize a Plotter.
 
         :type   axes: matplotlib Axes
@@ -410,6 +1584,17 @@ class Plotter (object):
         :type   expx: bool
         :param  expx: If true, convert :math:`x` -> :math:`10^x`
 
+        :type   collections: bool
+        :param  collections: If true, draw all step lines on each axes as one
+            LineCollection and all error bars as another, rather than creating
+            several artists per line.  Error bar caps are not drawn in this
+            mode.
+
+        :type   decimate: bool
+        :param  decimate: If true, draw lines with more bins than the axes
+            has pixels as a min/max envelope of about two points per pixel,
+            redone when the x limits change.  Requires collections.
+
         """
         self._axes = axes
         self._twin_axes = twin_axes
@@ -418,10 +1603,15 @@ class Plotter (object):
             self._twin_log = self.log
         else:
             self._twin_log = twin_log
-        self._lines = np.empty (0, dtype=Line)
-        self._line_styles = np.empty (0, dtype=dict)
-        self._line_axes = np.empty (0, dtype=str)
+        self._lines = []
+        self._line_styles = []
+        self._line_axes = []
+        if decimate and not collections:
+            raise ValueError ('decimate requires collections mode')
         self._expx = bool (expx)
+        self._collections = bool (collections)
+        self._decimate = bool (decimate)
+        self._parts = {}
 
     @property
     def axes (self):
@@ -443,6 +1633,16 @@ class Plotter (object):
         """If true, convert :math:`x` -> :math:`10^x`"""
         return self._expx
 
+    @property
+    def collections (self):
+        """If true, draw lines and error bars as collections."""
+        return self._collections
+
+    @property
+    def decimate (self):
+        """If true, draw long lines as a min/max envelope."""
+        return self._decimate
+
     @property
     def twin_axes (self):
         """The matplotlib twinx Axes."""
@@ -488,16 +1688,16 @@ class Plotter (object):
         with a Style containing these extra keyword arguments.
 
         """
-        self._lines = np.append (self.lines, line_to_add)
+        self._lines.append (line_to_add)
         if twin:
-            self._line_axes = np.append (self.line_axes, 'twin')
+            self._line_axes.append ('twin')
         else:
-            self._line_axes = np.append (self.line_axes, 'main')
+            self._line_axes.append ('main')
         if style:
             style = style.copy (**kwargs)
         else:
             style = Style (**kwargs)
-        self._line_styles = np.append (self.line_styles, style)
+        self._line_styles.append (style)
 
 
     def finish (self, legend=None):
@@ -511,26 +1711,52 @@ class Plotter (object):
         and self.mpl_labels will be the corresponding labels.
         
         """
-        self.mpl_lines = np.empty (0, dtype=object)
-        self.labels = np.empty (0, dtype=str)
+        self.mpl_lines = []
+        self.labels = []
+        if self.collections:
+            self._draw_collections ()
+        else:
+            self._draw_lines ()
+
+        if self.expx:
+            self.axes.set_xscale ('log')
+
+        if legend:
+            if legend is True:
+                legend = {}
+            axes = self.twin_axes or self.axes
+            self.legend = axes.legend (self.mpl_lines, self.labels, **legend)
+
+    def _get_axes (self, axes_name):
+        """Get the axes and log setting for 'main' or 'twin'."""
+        if axes_name == 'main':
+            return self.axes, self.log
+        else:
+            if self.twin_axes is None:
+                self._twin_axes = self.axes.twinx ()
+            return self.twin_axes, self.twin_log
+
+    def _limit_log_ymin (self, axes, prev_ymin, y):
+        axes.set_yscale ('log')
+        if np.sum (y>0) > 0:
+            # don't let errorbars make the scale crazy
+            min_accepted_ymin = min (prev_ymin, .1 * np.min (y[y>0]))
+            new_ymin, new_ymax = axes.get_ylim ()
+            final_ymin = max (new_ymin, min_accepted_ymin)
+            axes.set_ylim (ymin=final_ymin)
+
+    def _draw_lines (self):
+        """Draw each line with errorbar() and plot()."""
         for line, style, axes_name \
                 in izip (self.lines, self.line_styles, self.line_axes):
-            if axes_name == 'main':
-                axes = self.axes
-                log = self.log
-            else:
-                if self.twin_axes is None:
-                    self._twin_axes = self.axes.twinx ()
-                axes = self.twin_axes
-                log = self.twin_log
-            axes = self.axes if axes_name == 'main' else self.twin_axes
+            axes, log = self._get_axes (axes_name)
             prev_ymin, prev_ymax = axes.get_ylim ()
             x = line.bin_centers
             if self.expx:
                 x = 10**x
             y = line.values
             yerr = line.errors
-            kwargs = copy.deepcopy (style.kwargs)
+            kwargs = style.kwargs
             label = kwargs.get ('label', '')
             if style.line:
                 kwargs['drawstyle'] = 'steps-mid'
@@ -561,28 +1787,165 @@ class Plotter (object):
                         line_kwargs[key] = kwargs[key]
                 keep ('lw'), keep ('linewidth'), keep ('alpha')
                 keep ('ls'), keep ('linestyle')
-                axes.plot (x1, y1, **line_kwargs)
-                axes.plot (x2, y2, **line_kwargs)
+                axes.plot (x1, y1, x2, y2, **line_kwargs)
             if log:
-                axes.set_yscale ('log')
-                if np.sum (y>0) > 0:
-                    # don't let errorbars make the scale crazy
-                    min_accepted_ymin = min (prev_ymin, .1 * np.min (y[y>0]))
-                    new_ymin, new_ymax = axes.get_ylim ()
-                    final_ymin = max (new_ymin, min_accepted_ymin)
-                    axes.set_ylim (ymin=final_ymin)
+                self._limit_log_ymin (axes, prev_ymin, y)
 
-            self.mpl_lines = np.append (self.mpl_lines, mpl_line)
-            self.labels = np.append (self.labels, label)
+            self.mpl_lines.append (mpl_line)
+            self.labels.append (label)
 
-        if self.expx:
-            self.axes.set_xscale ('log')
+    def _numeric_x (self, x):
+        """Get x as floats, converting datetimes with date2num.
 
-        if legend:
-            if legend is True:
-                legend = {}
-            axes = self.twin_axes or self.axes
-            self.legend = axes.legend (self.mpl_lines, self.labels, **legend)
+        :return: (x, is_date)
+        """
+        from matplotlib.dates import date2num
+        x = np.asarray (x)
+        if x.dtype.kind == 'M':
+            x = x.astype ('M8[us]').astype (object)
+        if x.dtype.kind == 'O':
+            return date2num (x), True
+        if self.expx:
+            x = 10**x
+        return x, False
+
+    def _draw_collections (self):
+        """Draw all lines on each axes as one LineCollection, and all error
+        bars as another."""
+        import matplotlib as mpl
+        from matplotlib.collections import LineCollection
+        from matplotlib.colors import to_rgba
+        from matplotlib.lines import Line2D
+
+        color_cycle = mpl.rcParams['axes.prop_cycle'].by_key ()['color']
+        default_lw = mpl.rcParams['lines.linewidth']
+        parts = {}
+        for n, (line, style, axes_name) in enumerate (
+                izip (self.lines, self.line_styles, self.line_axes)):
+            axes, log = self._get_axes (axes_name)
+            if axes not in parts:
+                parts[axes] = dict (entries=[], ys=[], log=log,
+                        is_date=False, prev_ymin=axes.get_ylim ()[0])
+            part = parts[axes]
+            kwargs = style.kwargs
+            label = kwargs.get ('label', '')
+            color = kwargs.get ('color', kwargs.get ('c',
+                color_cycle[n % len (color_cycle)]))
+            color = to_rgba (color, kwargs.get ('alpha'))
+            lw = kwargs.get ('lw', kwargs.get ('linewidth', default_lw))
+            ls = kwargs.get ('ls', kwargs.get ('linestyle', 'solid'))
+            x, part['is_date'] = self._numeric_x (line.bin_centers)
+            bins, part['is_date'] = self._numeric_x (line.bins)
+            y = np.asarray (line.values, dtype=float)
+            part['ys'].append (y)
+            part['entries'].append (dict (
+                index=n, bins=bins, x=x, y=y,
+                yerr=line.errors if style.errorbars else None,
+                line=style.line, color=color, lw=lw, ls=ls,
+                elw=kwargs.get ('elinewidth', lw)))
+            if style.markers:
+                axes.plot (x, y, ls='None', marker=kwargs['marker'],
+                        color=color)
+            marker = kwargs['marker'] if style.markers else 'None'
+            self.mpl_lines.append (Line2D ([], [],
+                color=color, lw=lw, ls=ls if style.line else 'None',
+                marker=marker, label=label))
+            self.labels.append (label)
+
+        self._parts = parts
+        for axes, part in parts.iteritems ():
+            steps, bars = self._collection_segments (axes, part['entries'])
+            part['steps'] = LineCollection (steps[0], colors=steps[1],
+                    linewidths=steps[2], linestyles=steps[3])
+            axes.add_collection (part['steps'])
+            part['bars'] = LineCollection (bars[0], colors=bars[1],
+                    linewidths=bars[2])
+            axes.add_collection (part['bars'])
+            if part['is_date']:
+                axes.xaxis_date ()
+            axes.autoscale_view ()
+            if part['log']:
+                self._limit_log_ymin (
+                        axes, part['prev_ymin'], np.concatenate (part['ys']))
+            if self.decimate:
+                axes.callbacks.connect ('xlim_changed',
+                        lambda axes, part=part: self._update_collections (
+                            axes, part))
+
+    def update (self, lines):
+        """Replace the data of the drawn lines.
+
+        :type   lines: list
+        :param  lines: The new :class:`Line` s, one for each Line added
+            before :meth:`finish`, in the same order.
+
+        The existing collections are updated in place, keeping their styles.
+        Only supported in collections mode; otherwise, or if the number of
+        lines differs, ValueError is raised.
+        """
+        if not self.collections:
+            raise ValueError ('update requires collections mode')
+        if len (lines) != len (self.lines):
+            raise ValueError ('expected {0} lines, got {1}'.format (
+                len (self.lines), len (lines)))
+        self._lines = list (lines)
+        for axes, part in self._parts.iteritems ():
+            part['ys'] = []
+            for e in part['entries']:
+                line = lines[e['index']]
+                e['x'] = self._numeric_x (line.bin_centers)[0]
+                e['bins'] = self._numeric_x (line.bins)[0]
+                e['y'] = np.asarray (line.values, dtype=float)
+                if e['yerr'] is not None:
+                    e['yerr'] = line.errors
+                part['ys'].append (e['y'])
+            self._update_collections (axes, part)
+            points = [np.reshape (segments, (-1, 2))
+                    for segments in part['steps'].get_segments ()
+                    + part['bars'].get_segments ()]
+            if points:
+                axes.ignore_existing_data_limits = True
+                axes.update_datalim (np.concatenate (points))
+                axes.autoscale_view ()
+
+    def _collection_segments (self, axes, entries, xlim=None):
+        """Get the LineCollection data for step lines and error bars.
+
+        :return: ((segments, colors, linewidths, linestyles),
+            (segments, colors, linewidths))
+        """
+        n_buckets = None
+        if self.decimate:
+            n_buckets = max (1, int (axes.get_window_extent ().width))
+        steps, step_colors, step_widths, step_styles = [], [], [], []
+        bars, bar_colors, bar_widths = [], [], []
+        for e in entries:
+            step, bar = minmax_decimate (e['bins'], e['x'], e['y'], e['yerr'],
+                    n_buckets or len (e['y']), xlim)
+            if e['line']:
+                steps.append (step)
+                step_colors.append (e['color'])
+                step_widths.append (e['lw'])
+                step_styles.append (e['ls'])
+            if e['yerr'] is not None:
+                bars.extend (bar)
+                bar_colors.extend ([e['color']] * len (bar))
+                bar_widths.extend ([e['elw']] * len (bar))
+        return ((steps, step_colors, step_widths, step_styles),
+                (bars, bar_colors, bar_widths))
+
+    def _update_collections (self, axes, part):
+        """Recompute one axes' collection segments, decimated for its x
+        limits if decimate is set."""
+        xlim = axes.get_xlim () if self.decimate else None
+        steps, bars = self._collection_segments (
+                axes, part['entries'], xlim=xlim)
+        for coll, (segments, colors, widths) in (
+                (part['steps'], steps[:3]), (part['bars'], bars)):
+            coll.set_segments (segments)
+            coll.set_color (colors)
+            coll.set_linewidths (widths)
+        part['steps'].set_linestyles (steps[3])
 
     def old__finish (self, legend=None):
         """Draw the lines.
@@ -6,6 +6,7 @@ import datetime
 from itertools import izip
 import os
 import sys
+import threading
 
 import pygtk
 pygtk.require ('2.0')
@@ -22,7 +23,7 @@ import numpy as np
 
 import manateelog
 from manateelog import Log, CountingActivity, TimingActivity
-from manateelog import timedelta_to_seconds
+from manateelog import timedelta_to_seconds, activity_event_kinds
 import manateeimport
 
 from treemodels import CountingActivitiesModel, TimingActivitiesModel
@@ -30,6 +31,8 @@ from treemodels import CountingEntriesModel, TimingEntriesModel
 from treemodels import ActivityDrawModel
 
 import histlite
+from analysis import activity_data, activity_hist
+from analysis import counting_block_data, timing_block_data
 from vars_class import Vars
 from debug import LOGGER, LOG_F
 
@@ -62,12 +65,56 @@ def add_filt (dialog, description, pattern):
     filt.add_pattern (pattern)
     dialog.add_filter (filt)
 
-def cell_renderer_wrapped_note ():
+def cell_renderer_note ():
     cell = gtk.CellRendererText ()
-    cell.set_property ('wrap-width', 600)
-    cell.set_property ('wrap-mode', pango.WRAP_WORD)
+    cell.set_property ('ellipsize', pango.ELLIPSIZE_END)
     return cell
 
+def fixed_height_column (name, cell, idx, width):
+    """Make a resizable TreeViewColumn for a fixed-height-mode TreeView."""
+    col = gtk.TreeViewColumn (name, cell, text=idx)
+    col.set_sizing (gtk.TREE_VIEW_COLUMN_FIXED)
+    col.set_fixed_width (width)
+    col.set_resizable (True)
+    return col
+
+# milliseconds to wait for further changes before redrawing the plot
+plot_delay = 150
+
+class PlotWorker (object):
+
+    """A worker thread computing one analysis plot at a time.
+
+    A request submitted while another is waiting replaces it, so a burst of
+    changes leads to at most one computation besides any already running.
+    """
+
+    def __init__ (self):
+        self.condition = threading.Condition ()
+        self.request = None
+        self.thread = None
+
+    def submit (self, func):
+        """Call func () in the worker thread, instead of any waiting
+        request."""
+        with self.condition:
+            self.request = func
+            if self.thread is None:
+                self.thread = threading.Thread (target=self.run)
+                self.thread.daemon = True
+                self.thread.start ()
+            self.condition.notify ()
+
+    def run (self):
+        while True:
+            with self.condition:
+                while self.request is None:
+                    self.condition.wait ()
+                func, self.request = self.request, None
+            func ()
+
+plot_worker = PlotWorker ()
+
 class MainWindow (object):
 
     def __init__ (self, app, log=None):
@@ -76,6 +123,10 @@ class MainWindow (object):
         self.pad = 10
         self.status_keys = []
         self.was_modified = False
+        self.plot_dirty = False
+        self.plot_source = None
+        self.plot_generation = 0
+        self.attached = False
         if log:
             self.set_log (log)
         else:
@@ -83,6 +134,7 @@ class MainWindow (object):
 
     def main (self):
         LOG_F ()
+        gobject.threads_init ()
         gtk.main ()
 
     def set_log (self, log):
@@ -90,16 +142,33 @@ class MainWindow (object):
         if self.window is None:
             self.window = gtk.Window (gtk.WINDOW_TOPLEVEL)
             self.window.connect ('delete_event', self.cb_delete_event)
+            self.window.connect ('destroy', self.cb_destroy)
         else:
             remove_first_child (self.window)
         self.menu = Vars ()
         self.events = Vars ()
+        self.detach ()
         self.log = log
+        self.log.add_listener (self.cb_log_changed)
+        self.attached = True
         self.build_log_window ()
         self.set_title ()
         if self.app.filename:
             self.set_status ('load', 'Loaded {0}.'.format (self.app.filename))
 
+    def detach (self):
+        """Stop this window and its models listening to the Log."""
+        LOG_F ()
+        if not self.attached:
+            return
+        self.attached = False
+        models = [self.setup.cam, self.setup.tam,
+                self.counting.cem, self.timing.tem]
+        for model in models:
+            if model is not None:
+                model.detach ()
+        self.log.remove_listener (self.cb_log_changed)
+
 
     # building the GUI -------------------------------------------------------
 
@@ -129,8 +198,8 @@ class MainWindow (object):
             ('Quit', gtk.STOCK_QUIT, None, '<control>q', None, self.cb_quit),
 
             ('Import', None, '_Import', None, None, None),
-            ('TimeRecording', None, 'from _TimeRecording export...',
-                None, None, self.cb_import_timerecording),
+            ('Import file', None, 'from _file...',
+                None, None, self.cb_import),
             ]
         )
         self.menu.ui = """
@@ -146,7 +215,7 @@ class MainWindow (object):
                     <menuitem action='Quit' />
                 </menu>
                 <menu action='Import'>
-                    <menuitem action='TimeRecording' />
+                    <menuitem action='Import file' />
                 </menu>
             </menubar>
         </ui>
@@ -178,8 +247,9 @@ class MainWindow (object):
                 self.counting.box_main, gtk.Label ('Counting Entries'))
         self.notebook.append_page (
                 self.timing.box_main, gtk.Label ('Timing Entries'))
-        self.notebook.append_page (
+        self.ana.page_num = self.notebook.append_page (
                 self.ana.box_main, gtk.Label ('Analysis'))
+        self.notebook.connect ('switch-page', self.cb_notebook_switch_page)
 
         self.build_pane_setup ()
         self.build_pane_counting_entries ()
@@ -272,7 +342,15 @@ class MainWindow (object):
         self.setup.cam_sw = gtk.ScrolledWindow ()
         box_counting_left.pack_start (self.setup.cam_sw, True)
         self.setup.cam_sw.add_with_viewport (self.setup.cam_tv)
-        self.sync_counting_activities ()
+        self.setup.cam_tv.connect (
+                'row-activated', self.cb_setup_counting_select)
+        cell = gtk.CellRendererText ()
+        namecol = gtk.TreeViewColumn ('name', cell, text=0)
+        namecol.set_resizable (True)
+        self.setup.cam_tv.insert_column (namecol, 0)
+        unitcol = gtk.TreeViewColumn ('unit', cell, text=1)
+        unitcol.set_resizable (True)
+        self.setup.cam_tv.insert_column (unitcol, 1)
 
         ## adding
         box_counting_add = gtk.HBox (False)
@@ -319,7 +397,12 @@ class MainWindow (object):
         self.setup.tam_sw = gtk.ScrolledWindow ()
         box_timing_left.pack_start (self.setup.tam_sw, True)
         self.setup.tam_sw.add_with_viewport (self.setup.tam_tv)
-        self.sync_timing_activities ()
+        self.setup.tam_tv.connect (
+                'row-activated', self.cb_setup_timing_select)
+        cell = gtk.CellRendererText ()
+        namecol = gtk.TreeViewColumn ('name', cell, text=0)
+        namecol.set_resizable (True)
+        self.setup.tam_tv.insert_column (namecol, 0)
 
         ## adding
         box_timing_add = gtk.HBox (False)
@@ -362,11 +445,9 @@ class MainWindow (object):
                 make_label ('Activity:'), expand=False, padding=pad)
         combo = self.counting.combo = gtk.combo_box_new_text ()
         box_combo.pack_start (combo, expand=True, padding=pad)
-        for activity in sorted (self.log.counting_activities):
-            combo.append_text ('{0} [{1}]'.format (
-                activity.name, activity.unit))
-        combo.set_active (0)
-        combo.connect ('changed', self.cb_counting_choose)
+        self.counting.activities = []
+        self.counting.combo_handler = combo.connect (
+                'changed', self.cb_counting_choose)
 
         ## entries label
         box_label = gtk.HBox (False, pad)
@@ -377,7 +458,27 @@ class MainWindow (object):
         ## the viewer
         self.counting.cem_sw = gtk.ScrolledWindow ()
         box_main.pack_start (self.counting.cem_sw, expand=True)
-        self.sync_counting_entries ()
+        self.counting.cem = None
+        # fixed-height rows, scrolled natively, so that only the visible
+        # rows are ever measured and formatted
+        self.counting.cem_tv = gtk.TreeView ()
+        self.counting.cem_sw.add (self.counting.cem_tv)
+        self.counting.cem_tv.connect (
+                'row-activated', self.cb_counting_select_entry)
+
+        def add_col (name, idx, width):
+            cell = gtk.CellRendererText ()
+            if name == 'note':
+                cell = cell_renderer_note ()
+            col = fixed_height_column (name, cell, idx, width)
+            self.counting.cem_tv.insert_column (col, idx)
+
+        add_col ('date', 0, 100)
+        add_col ('n', 1, 80)
+        add_col ('+/-', 2, 80)
+        add_col ('note', 3, 400)
+        self.counting.cem_tv.set_fixed_height_mode (True)
+        self.sync_counting_activities ()
 
         ## add
         table_add = gtk.Table (2, 3)
@@ -455,10 +556,9 @@ class MainWindow (object):
                 make_label ('Activity:'), expand=False, padding=pad)
         combo = self.timing.combo = gtk.combo_box_new_text ()
         box_combo.pack_start (combo, expand=True, padding=pad)
-        for activity in sorted (self.log.timing_activities):
-            combo.append_text ('{0}'.format (activity.name))
-        combo.set_active (0)
-        combo.connect ('changed', self.cb_timing_choose)
+        self.timing.activities = []
+        self.timing.combo_handler = combo.connect (
+                'changed', self.cb_timing_choose)
 
         ## entries label
         box_label = gtk.HBox (False, 10)
@@ -469,8 +569,24 @@ class MainWindow (object):
         ## the viewer
         self.timing.tem_sw = gtk.ScrolledWindow ()
         box_main.pack_start (self.timing.tem_sw, expand=True)
-        self.timing.tem_columns = {}
-        self.sync_timing_entries ()
+        self.timing.tem = None
+        self.timing.tem_tv = gtk.TreeView ()
+        self.timing.tem_sw.add (self.timing.tem_tv)
+        self.timing.tem_tv.connect (
+                'row-activated', self.cb_timing_select_entry)
+
+        def add_col (name, idx, width):
+            cell = gtk.CellRendererText ()
+            if name == 'note':
+                cell = cell_renderer_note ()
+            col = fixed_height_column (name, cell, idx, width)
+            self.timing.tem_tv.insert_column (col, idx)
+
+        add_col ('start time', 0, 140)
+        add_col ('end time', 1, 140)
+        add_col ('note', 2, 400)
+        self.timing.tem_tv.set_fixed_height_mode (True)
+        self.sync_timing_activities ()
 
         ## add - start
         today = datetime.datetime.today ()
@@ -574,6 +690,8 @@ class MainWindow (object):
         LOG_F ()
         pad = self.pad
         self.ana.plot_type = None
+        self.ana.plot_state = None
+        self.ana.canvas = None
 
         box_main = self.ana.box_main
         box_main.foreach (box_main.remove)
@@ -746,119 +864,96 @@ class MainWindow (object):
         self.window.show_all ()
 
     def sync_counting_activities (self):
-        """Sync counting activities view."""
+        """Sync views listing the counting activities."""
         LOG_F ()
-
-        remove_first_child (self.setup.cam_sw)
-        self.setup.cam = CountingActivitiesModel (self.log)
-        self.setup.cam_tv = gtk.TreeView (self.setup.cam)
-        self.setup.cam_sw.add_with_viewport (self.setup.cam_tv)
-        self.setup.cam_tv.connect (
-                'row-activated', self.cb_setup_counting_select)
-
-        cell = gtk.CellRendererText ()
-        namecol = gtk.TreeViewColumn ('name', cell, text=0)
-        namecol.set_resizable (True)
-        self.setup.cam_tv.insert_column (namecol, 0)
-        unitcol = gtk.TreeViewColumn ('unit', cell, text=1)
-        unitcol.set_resizable (True)
-        self.setup.cam_tv.insert_column (unitcol, 1)
-        self.build_pane_counting_entries ()
-        self.build_pane_analysis ()
-        self.window.show_all ()
+        self.sync_activity_combo (
+                self.counting, self.log.counting_activities,
+                lambda activity: '{0} [{1}]'.format (
+                    activity.name, activity.unit))
 
     def sync_timing_activities (self):
-        """Sync timing activities view."""
+        """Sync views listing the timing activities."""
         LOG_F ()
+        self.sync_activity_combo (
+                self.timing, self.log.timing_activities,
+                lambda activity: '{0}'.format (activity.name))
 
-        remove_first_child (self.setup.tam_sw)
-        self.setup.tam = TimingActivitiesModel (self.log)
-        self.setup.tam_tv = gtk.TreeView (self.setup.tam)
-        self.setup.tam_sw.add_with_viewport (self.setup.tam_tv)
-        self.setup.tam_tv.connect (
-                'row-activated', self.cb_setup_timing_select)
+    def sync_activity_combo (self, pane, activities, fmt):
+        """Refill pane.combo with activities, keeping the active one.
 
-        cell = gtk.CellRendererText ()
-        namecol = gtk.TreeViewColumn ('name', cell, text=0)
-        namecol.set_resizable (True)
-        self.setup.tam_tv.insert_column (namecol, 0)
-        self.build_pane_timing_entries ()
-        self.build_pane_analysis ()
-        self.window.show_all ()
+        :type   pane: :class:`Vars`
+        :param  pane: The counting or timing pane.
+
+        :type   fmt: function
+        :param  fmt: Function giving the combo text for an activity.
+
+        If the active activity is gone, the first activity becomes active.
+        The combo's 'changed' handler only runs in that case.
+        """
+        combo = pane.combo
+        active = combo.get_active ()
+        old = pane.activities[active] if active >= 0 else None
+        pane.activities = sorted (activities)
+        idx = -1
+        for (i, activity) in enumerate (pane.activities):
+            if activity is old:
+                idx = i
+        combo.handler_block (pane.combo_handler)
+        combo.get_model ().clear ()
+        for activity in pane.activities:
+            combo.append_text (fmt (activity))
+        combo.set_active (idx)
+        combo.handler_unblock (pane.combo_handler)
+        if idx == -1:
+            combo.set_active (0 if pane.activities else -1)
+            if not pane.activities:
+                combo.emit ('changed')
 
     def sync_counting_entries (self):
-        """Sync counting entries view."""
+        """Show the chosen counting activity's entries."""
         LOG_F ()
 
-        if len (self.log.counting_activities) == 0:
-            return
-
+        if self.counting.cem is not None:
+            self.counting.cem.detach ()
+            self.counting.cem = None
         activity_idx = self.counting.combo.get_active ()
-        activity = sorted (self.log.counting_activities)[activity_idx]
-
-        remove_first_child (self.counting.cem_sw)
-        self.counting.cem = CountingEntriesModel (self.log, activity.name)
-        self.counting.cem_tv = gtk.TreeView (self.counting.cem)
-        self.counting.cem_sw.add_with_viewport (self.counting.cem_tv)
-        self.counting.cem_tv.connect (
-                'row-activated', self.cb_counting_select_entry)
-
-        def add_col (name, idx):
-            cell = gtk.CellRendererText ()
-            if name == 'note':
-                cell = cell_renderer_wrapped_note ()
-            col = gtk.TreeViewColumn (name, cell, text=idx)
-            col.set_resizable (True)
-            self.counting.cem_tv.insert_column (col, idx)
-
-        add_col ('date', 0)
-        add_col ('n', 1)
-        add_col ('+/-', 2)
-        add_col ('note', 3)
+        if activity_idx >= 0:
+            activity = self.counting.activities[activity_idx]
+            self.counting.cem = CountingEntriesModel (self.log, activity.name)
+        self.counting.cem_tv.set_model (self.counting.cem)
         adj = self.counting.cem_sw.get_vadjustment ()
-        adj.set_value (1)
-        self.counting.cem_sw.set_vadjustment (adj)
-        self.sync_ana_plot_update ()
-        self.window.show_all ()
+        adj.set_value (0)
 
     def sync_timing_entries (self):
-        """Sync timing entries view."""
+        """Show the chosen timing activity's entries."""
         LOG_F ()
 
-        if len (self.log.timing_activities) == 0:
-            return
-
+        if self.timing.tem is not None:
+            self.timing.tem.detach ()
+            self.timing.tem = None
         activity_idx = self.timing.combo.get_active ()
-        activity = sorted (self.log.timing_activities)[activity_idx]
-
-        remove_first_child (self.timing.tem_sw)
-        self.timing.tem = TimingEntriesModel (self.log, activity.name)
-        self.timing.tem_tv = gtk.TreeView (self.timing.tem)
-        self.timing.tem_sw.add_with_viewport (self.timing.tem_tv)
-        self.timing.tem_tv.connect (
-                'row-activated', self.cb_timing_select_entry)
-
-        def add_col (name, idx):
-            cell = gtk.CellRendererText ()
-            if name == 'note':
-                cell = cell_renderer_wrapped_note ()
-            col = self.timing.tem_columns[name] = gtk.TreeViewColumn (
-                    name, cell, text=idx)
-            col.set_resizable (True)
-            self.timing.tem_tv.insert_column (col, idx)
-
-        add_col ('start time', 0)
-        add_col ('end time', 1)
-        add_col ('note', 2)
+        if activity_idx >= 0:
+            activity = self.timing.activities[activity_idx]
+            self.timing.tem = TimingEntriesModel (self.log, activity.name)
+        self.timing.tem_tv.set_model (self.timing.tem)
         adj = self.timing.tem_sw.get_vadjustment ()
-        adj.set_value (1)
-        self.timing.tem_sw.set_vadjustment (adj)
-        self.sync_ana_plot_update ()
-        self.window.show_all ()
+        adj.set_value (0)
+
+    def sync_ana_activities (self, events=None):
+        """Sync activities in Analysis pane.
 
-    def sync_ana_activities (self):
-        """Sync activities in Analysis pane."""
+        :type   events: list
+        :param  events: The log events that prompted this sync.  If given,
+            only the lists that gained or lost activities are rebuilt; renamed
+            activities are re-sorted in place, keeping their checks and
+            colors.
+        """
         LOG_F ()
+        def changed (kind, event_kinds):
+            return events is None or any (
+                    event.activity.kind == kind and event.kind in event_kinds
+                    for event in events)
+
         def do_sync (sw, activities):
             remove_first_child (sw)
             model = ActivityDrawModel (activities)
@@ -888,30 +983,107 @@ class MainWindow (object):
                 'row-activated', self.cb_ana_activity_choose_color, model)
             return model
 
-        self.ana.cadm = do_sync (self.ana.cadm_sw, self.log.counting_activities)
-        self.ana.tadm = do_sync (self.ana.tadm_sw, self.log.timing_activities)
+        rebuild = ('activity-added', 'activity-removed')
+        if changed ('counting', rebuild):
+            self.ana.cadm = do_sync (
+                    self.ana.cadm_sw, self.log.counting_activities)
+        elif changed ('counting', ('activity-renamed',)):
+            self.ana.cadm.resort ()
+        if changed ('timing', rebuild):
+            self.ana.tadm = do_sync (
+                    self.ana.tadm_sw, self.log.timing_activities)
+        elif changed ('timing', ('activity-renamed',)):
+            self.ana.tadm.resort ()
 
         self.window.show_all ()
 
     def sync_ana_plot_update (self, *args):
-        """Update the analysis plot."""
+        """Schedule an update of the analysis plot.
+
+        The plot is marked dirty, and redrawn once no further updates have
+        been requested for plot_delay milliseconds.  While the Analysis page
+        is hidden, it is left dirty until the page is shown.
+        """
         LOG_F ()
+        self.plot_dirty = True
+        if self.plot_source is not None:
+            gobject.source_remove (self.plot_source)
+        self.plot_source = gobject.timeout_add (
+                plot_delay, self.cb_ana_plot_refresh)
+
+    def ana_plot_visible (self):
+        """Whether the Analysis page is showing."""
         try:
-            self.ana.combo
+            page_num = self.ana.page_num
         except:
-            return
-        self.ana_plot_clear ()
+            return False
+        return self.notebook.get_current_page () == page_num
+
+    def ana_plot_prepare (self):
+        """Build the options for the selected plot type if needed.
+
+        :return: The (compute, draw) methods for the plot type.
+        """
         if self.ana.combo.get_active () == 0:
             if self.ana.plot_type != 1:
                 self.build_plot_options_block ()
                 self.ana.plot_type = 1
-            self.ana_plot_block ()
-        if self.ana.combo.get_active () == 1:
+            return self.ana_compute_block, self.ana_draw_block
+        else:
             if self.ana.plot_type != 0:
                 self.build_plot_options_line ()
                 self.ana.plot_type = 0
-            self.ana_plot_line ()
+            return self.ana_compute_line, self.ana_draw_line
+
+    def ana_plot_render (self):
+        """Start recomputing the analysis plot.
+
+        The plot is computed from a snapshot by the plot worker, and drawn
+        from the main loop once done.  Starting a new computation cancels
+        any that is waiting or still running.
+        """
+        LOG_F ()
+        try:
+            self.ana.combo
+        except:
+            return
+        self.plot_dirty = False
+        compute, draw = self.ana_plot_prepare ()
         self.window.show_all ()
+        snap = self.ana_plot_snapshot ()
+        self.plot_generation += 1
+        generation = self.plot_generation
+
+        def cancelled ():
+            return generation != self.plot_generation
+
+        def work ():
+            if cancelled ():
+                return
+            try:
+                data = compute (snap, cancelled)
+            except:
+                LOGGER.exception ('plot computation failed')
+                data = None
+            if not cancelled ():
+                gobject.idle_add (
+                        self.cb_ana_plot_draw, generation, draw, snap, data)
+
+        plot_worker.submit (work)
+
+    def ana_plot_wait (self):
+        """Compute and draw the analysis plot in the main thread."""
+        LOG_F ()
+        try:
+            self.ana.combo
+        except:
+            return
+        self.plot_dirty = False
+        compute, draw = self.ana_plot_prepare ()
+        snap = self.ana_plot_snapshot ()
+        self.plot_generation += 1
+        data = compute (snap, lambda: False)
+        self.cb_ana_plot_draw (self.plot_generation, draw, snap, data)
 
     def set_title (self, title=None):
         LOG_F ()
@@ -1030,8 +1202,12 @@ class MainWindow (object):
     # plotting ---------------------------------------------------------------
 
     def ana_plot_clear (self, *args):
-        """Create the figure."""
+        """Clear the figure, first creating it and its canvas if needed."""
         LOG_F ()
+        self.ana.plot_state = None
+        if self.ana.canvas is not None:
+            self.ana.figure.clear ()
+            return
         self.ana.frame_plot.foreach (self.ana.frame_plot.remove)
         box_pad = gtk.HBox (False, 0)
         box_pad.set_border_width (self.pad)
@@ -1041,6 +1217,7 @@ class MainWindow (object):
                 figsize=(6, 4), dpi=50)
         self.ana.canvas = mplgtkagg.FigureCanvasGTKAgg (self.ana.figure)
         box_pad.pack_start (self.ana.canvas)
+        self.window.show_all ()
 
     def ana_get_range (self):
         sY = self.ana.spin_sY.get_value_as_int ()
@@ -1053,255 +1230,252 @@ class MainWindow (object):
 
         return datetime.datetime (sY,sM,sD), datetime.datetime (eY,eM,eD)
 
-    def ana_plot_line (self):
-        """Make a line plot."""
-        LOG_F ()
-        labels, xs, ys, errs, colors, alphas = [], [], [], [], [], []
-
-        cadm = self.ana.cadm
-        tadm = self.ana.tadm
+    def ana_plot_snapshot (self):
+        """Collect what the plot computation needs from the GUI and log.
 
-        if np.sum (np.r_[cadm.checks, tadm.checks]) == 1:
-            one_unit = True
+        Each activity's entries are copied into arrays by
+        :func:`analysis.activity_data`, once per log version, so that the
+        snapshot may be used from a worker thread.
+        """
+        snap = Vars ()
+        snap.spec_ti, snap.spec_tf = self.ana_get_range ()
+        colormax = 65535
+        def get_activities (model):
+            out = []
+            for i, activity in enumerate (model.activities):
+                if not model.checks[i]:
+                    continue
+                color = model.colors[i]
+                out.append (Vars (dict (
+                    index=i,
+                    data=activity_data (activity,
+                        self.log.version (activity),
+                        self.log.entries[activity]),
+                    color=(color.red / colormax,
+                        color.green / colormax,
+                        color.blue / colormax),
+                    alpha=model.alphas[i] / colormax)))
+            return out
+        snap.counting = get_activities (self.ana.cadm)
+        snap.timing = get_activities (self.ana.tadm)
+        snap.counting_names = [
+                activity.name for activity in self.ana.cadm.activities]
+        if self.ana.opts.check_ticks.get_active ():
+            snap.max_xticks = self.ana.opts.spin_ticks.get_value_as_int ()
+        else:
+            snap.max_xticks = 20
+        if self.ana.plot_type == 0:
+            snap.kind = 'line'
+            if self.ana.opts.radio_bins.get_active ():
+                snap.bin_unit = 'day'
+                snap.bin_n = self.ana.opts.spin_bin.get_value_as_int ()
+            elif self.ana.opts.radio_weekly.get_active ():
+                snap.bin_unit, snap.bin_n = 'week', 1
+            elif self.ana.opts.radio_monthly.get_active ():
+                snap.bin_unit, snap.bin_n = 'month', 1
+            snap.errorbars = self.ana.opts.check_errors.get_active ()
+            snap.zero = self.ana.opts.check_zero.get_active ()
         else:
-            one_unit = False
-        if np.sum (cadm.checks) == 0:
-            one_unit = True
+            snap.kind = 'block'
+        return snap
+
+    def ana_set_xticks (self, ax, snap, xmin, xmax):
+        """Set daily x ticks, thinned to at most snap.max_xticks."""
+        n_days = int (timedelta_to_seconds (xmax - xmin) / 86400)
+        all_xticks = [xmin + datetime.timedelta (days=n)
+                for n in xrange (n_days + 2)]
+        xticks = list (all_xticks)
+        skip = 1
+        while len (xticks) > snap.max_xticks:
+            skip += 1
+            xticks = all_xticks[::skip]
+        ax.set_xticks (xticks)
+        ax.xaxis.set_major_formatter (mpl.dates.DateFormatter ('%Y.%m.%d'))
+        return xticks
+
+    def ana_compute_line (self, snap, cancelled):
+        """Compute the line plot series; safe to call from a worker
+        thread."""
+        LOG_F ()
+        labels, xs, ys, errs, colors = [], [], [], [], []
+        out = Vars ()
+
+        n_checked = len (snap.counting) + len (snap.timing)
+        out.one_unit = one_unit = n_checked == 1 or not snap.counting
+        out.unit = None
 
         def get_scale (y, err=0):
             return np.ceil (.1 * np.max (y + err))
 
-        bin_width = self.ana.opts.spin_bin.get_value_as_int ()
-
         def get_label (name, unit, scale):
             if one_unit or scale == 1:
                 return '{0} ({1})'.format (name, unit)
             else:
                 return '{0} (1 / {1:.0f} {2})'.format (name, scale, unit)
 
-        spec_ti, spec_tf = self.ana_get_range ()
+        spec_ti, spec_tf = snap.spec_ti, snap.spec_tf
         if spec_ti >= spec_tf:
-            return
+            return None
         sel_ti = None
         sel_tf = None
 
-        def get_x (ti, tf):
-            xf = datetime.datetime (tf.year, tf.month, tf.day)
-            one_day = datetime.timedelta (days=1)
-            if self.ana.opts.radio_bins.get_active ():
-                x = [datetime.datetime (ti.year, ti.month, ti.day)]
-                while x[-1] <= xf:
-                    x.append (x[-1] + bin_width * one_day)
-            elif self.ana.opts.radio_weekly.get_active ():
-                while ti.weekday () != 0:
-                    ti -= one_day
-                x = [datetime.datetime (ti.year, ti.month, ti.day)]
-                while x[-1] <= xf:
-                    x.append (x[-1] + 7 * one_day)
-            elif self.ana.opts.radio_monthly.get_active ():
-                while ti.day != 1:
-                    ti -= one_day
-                x = [datetime.datetime (ti.year, ti.month, ti.day)]
-                while x[-1] <= xf:
-                    next_x = x[-1] + one_day
-                    while next_x.day != 1:
-                        next_x += one_day
-                    x.append (next_x)
-            return x
-
-        for i, activity in enumerate (cadm.activities):
-            if not cadm.checks[i]:
+        for item in snap.counting:
+            if cancelled ():
+                return None
+            data = item.data
+            if not data.n_entries:
                 continue
-            entries = self.log.entries[activity]
-            if not len (entries):
-                continue
-            ti = entries[0].date
-            tf = entries[-1].date
-            act_ti = datetime.datetime (
-                    ti.year, ti.month, ti.day)
-            act_tf = datetime.datetime (
-                    tf.year, tf.month, tf.day, 23, 59, 59)
+            act_ti, act_tf = data.ti, data.tf
             if act_ti > spec_tf or act_tf < spec_ti:
                 continue
             if sel_ti == None or act_ti < sel_ti:
                 sel_ti = act_ti
             if sel_tf == None or act_tf > sel_tf:
                 sel_tf = act_tf
-            x = get_x (act_ti, act_tf)
-            y = []
-            err = []
-            entry_time = lambda entry: datetime.datetime (
-                    entry.date.year, entry.date.month, entry.date.day, 12)
-            for x1, x2 in izip (x[:-1], x[1:]):
-                n_days = int (timedelta_to_seconds (x2 - x1) / 86400)
-                y.append (np.sum ([
-                    entry.n / n_days for entry in entries
-                    if x1 <= entry_time (entry) < x2]))
-                err.append (np.sqrt (np.sum ([
-                    entry.error**2 / n_days for entry in entries
-                    if x1 <= entry_time (entry) < x2])))
-            x = np.array (x)
-            y = np.array (y)
-            err = np.array (err)
+            h = activity_hist (
+                    data, snap.bin_unit, snap.bin_n, act_ti, act_tf)
+            x, y, err = h.bins, h.values, h.errors
             xs.append (x)
             # TODO: decide how exactly to choose a scale
             scale = get_scale (y, err)
-            labels.append (get_label (
-                activity.name, activity.unit, scale))
+            labels.append (get_label (data.name, data.unit, scale))
             if one_unit:
-                unit = activity.unit
+                out.unit = data.unit
                 ys.append (y)
                 errs.append (err)
             else:
                 ys.append (y / scale)
                 errs.append (err / scale)
-            color = cadm.colors[i]
-            colormax = 65535
-            colors.append ((
-                color.red / colormax,
-                color.green / colormax,
-                color.blue / colormax))
-            alphas.append (cadm.alphas[i] / colormax)
-
-        for i, activity in enumerate (tadm.activities):
-            if not tadm.checks[i]:
-                continue
-            entries = sorted (self.log.entries[activity])
-            if not len (entries):
+            colors.append (item.color)
+
+        for item in snap.timing:
+            if cancelled ():
+                return None
+            data = item.data
+            if not data.n_entries:
                 continue
-            ti = entries[0].start_time
-            tf = entries[-1].end_time
+            ti, tf = data.ti, data.tf
             if ti > spec_tf or tf < spec_ti:
                 continue
             if sel_ti == None or ti < sel_ti:
                 sel_ti = ti
             if sel_tf == None or tf > sel_tf:
                 sel_tf = tf
-            x = get_x (ti, tf)
-            y = []
-            for x1, x2 in izip (x[:-1], x[1:]):
-                n_days = int (timedelta_to_seconds (x2 - x1) / 86400)
-                y.append (np.sum ([
-                    entry.overlap_in_hours (x1, x2) / n_days
-                    for entry in entries]))
-            x = np.array (x)
-            y = np.array (y)
+            h = activity_hist (data, snap.bin_unit, snap.bin_n, ti, tf)
+            x, y = h.bins, h.values
             xs.append (x)
             scale = get_scale (y)
-            labels.append (get_label (activity.name, 'hours', scale))
+            labels.append (get_label (data.name, 'hours', scale))
             if one_unit:
-                unit = 'hours'
+                out.unit = 'hours'
                 ys.append (y)
             else:
                 ys.append (y / scale)
             errs.append (None)
-            color = tadm.colors[i]
-            colormax = 65535
-            colors.append ((
-                color.red / colormax,
-                color.green / colormax,
-                color.blue / colormax))
-            alphas.append (tadm.alphas[i] / colormax)
+            colors.append (item.color)
 
         if not labels:
-            return
+            return None
+        out.labels, out.xs, out.ys, out.errs, out.colors = \
+                labels, xs, ys, errs, colors
+        out.sel_ti, out.sel_tf = sel_ti, sel_tf
+        return out
 
-        errorbars = self.ana.opts.check_errors.get_active ()
-        ax = self.ana.figure.add_subplot (111)
-        ax.patch.set_facecolor ('white')
-        plotter = histlite.Plotter (ax)
+    def ana_draw_line (self, snap, data):
+        """Draw a line plot computed by ana_compute_line.
+
+        If the previous plot was a line plot of the same series, its
+        collections and legend are updated in place.
+        """
+        LOG_F ()
+        structure = ('line', snap.errorbars, data.one_unit, tuple (
+            (color, err is None) for color, err in izip (
+                data.colors, data.errs)))
+        lines = []
         ymax = -np.inf
-        for label, x, y, err, color, alpha in izip (
-                labels, xs, ys, errs, colors, alphas):
-            kwargs = dict (label=label, color=color, lw=1.4)
-            if err is None or not errorbars:
-                plotter.add (histlite.Line (x, y), **kwargs)
+        for x, y, err in izip (data.xs, data.ys, data.errs):
+            if err is None or not snap.errorbars:
+                lines.append (histlite.Line (x, y))
                 ymax = max (ymax, np.max (y))
             else:
-                plotter.add (histlite.Line (x, y, err),
-                        errorbars=True, **kwargs)
+                lines.append (histlite.Line (x, y, err))
                 ymax = max (ymax, np.max (y + err))
-        plotter.finish ()
-        if self.ana.opts.check_zero.get_active ():
+
+        state = self.ana.plot_state
+        if state is not None and state.structure == structure:
+            ax = state.ax
+            state.plotter.update (lines)
+            for text, label in izip (state.legend.get_texts (), data.labels):
+                text.set_text (label)
+        else:
+            self.ana_plot_clear ()
+            ax = self.ana.figure.add_subplot (111)
+            ax.patch.set_facecolor ('white')
+            plotter = histlite.Plotter (ax, collections=True, decimate=True)
+            for label, line, err, color in izip (
+                    data.labels, lines, data.errs, data.colors):
+                kwargs = dict (label=label, color=color, lw=1.4)
+                if err is None or not snap.errorbars:
+                    plotter.add (line, **kwargs)
+                else:
+                    plotter.add (line, errorbars=True, **kwargs)
+            plotter.finish ()
+            legend = ax.legend (plotter.mpl_lines, plotter.labels,
+                    loc='lower left',
+                    bbox_to_anchor=(0,1),
+                    borderaxespad=0,
+                    prop=mpl.font_manager.FontProperties (size='small'),
+                    ncol=int (np.ceil (len (data.labels) / 2)))
+            ax.figure.subplots_adjust (left=.08, right=.97, top=.87)
+            ax.figure.suptitle ('Amounts Summary',
+                    horizontalalignment='right', x=.97, y=.93, weight='bold')
+            self.ana.plot_state = Vars (dict (structure=structure, ax=ax,
+                plotter=plotter, legend=legend))
+
+        if snap.zero:
             ax.set_ylim (ymin=0)
         ax.set_ylim (ymin=max (ax.get_ylim ()[0], 0), ymax=1.1 * ymax)
-        xmin = max (spec_ti, sel_ti)
+        xmin = max (snap.spec_ti, data.sel_ti)
         xmin = datetime.datetime (xmin.year, xmin.month, xmin.day)
-        xmax = min (spec_tf, sel_tf)
+        xmax = min (snap.spec_tf, data.sel_tf)
         xmax = datetime.datetime (xmax.year, xmax.month, xmax.day,
                 23, 59, 59)
         second = datetime.timedelta (seconds=1)
         ax.set_xlim (xmin - second, xmax + second)
-        n_days = int (timedelta_to_seconds (xmax - xmin) / 86400)
-
-        all_xticks = [xmin + datetime.timedelta (days=n)
-                for n in xrange (n_days + 2)]
-        xticks = list (all_xticks)
-        skip = 1
-        if self.ana.opts.check_ticks.get_active ():
-            max_xticks = self.ana.opts.spin_ticks.get_value_as_int ()
-        else:
-            max_xticks = 20
-        while len (xticks) > max_xticks:
-            skip += 1
-            xticks = all_xticks[::skip]
-        ax.set_xticks (xticks)
-        ax.xaxis.set_major_formatter (mpl.dates.DateFormatter ('%Y.%m.%d'))
+        self.ana_set_xticks (ax, snap, xmin, xmax)
 
-        if one_unit:
-            ax.set_ylabel ('amount per day ({0})'.format (unit))
+        if data.one_unit:
+            ax.set_ylabel ('amount per day ({0})'.format (data.unit))
         else:
             ax.set_ylabel ('amount per day')
 
         ax.figure.autofmt_xdate (rotation=45)
 
-        legend = ax.legend (loc='lower left',
-                bbox_to_anchor=(0,1),
-                borderaxespad=0,
-                prop=mpl.font_manager.FontProperties (size='small'),
-                ncol=int (np.ceil (len (labels) / 2)))
-
-        ax.figure.subplots_adjust (left=.08, right=.97, top=.87)
-        ax.figure.suptitle ('Amounts Summary',
-                horizontalalignment='right', x=.97, y=.93, weight='bold')
-
-    def ana_plot_block (self):
-        """Make a line plot."""
+    def ana_compute_block (self, snap, cancelled):
+        """Compute the block plot shapes; safe to call from a worker
+        thread."""
         LOG_F ()
-
-        cadm = self.ana.cadm
-        tadm = self.ana.tadm
-        if np.sum (cadm.checks) + np.sum (tadm.checks) == 0:
-            return
-
-        spec_ti, spec_tf = self.ana_get_range ()
+        if not snap.counting and not snap.timing:
+            return None
+        spec_ti, spec_tf = snap.spec_ti, snap.spec_tf
         if spec_ti >= spec_tf:
-            return
+            return None
         sel_ti = None
         sel_tf = None
 
-        ax = self.ana.figure.add_subplot (111)
-        ax.patch.set_facecolor ('white')
-
-        counting_activities = []
-        n_counting_activities = np.sum (cadm.checks)
-        n_timing_activities = np.sum (tadm.checks)
+        out = Vars ()
+        out.counting_blocks = []
+        out.timing_blocks = []
+        n_counting_activities = len (snap.counting)
 
-        one_day = datetime.timedelta (days=1)
-
-        for i, activity in enumerate (cadm.activities):
-            counting_activities.append (activity.name)
-            n_activity = len (counting_activities) - 1
-            if not cadm.checks[i]:
-                continue
-            entries = sorted (self.log.entries[activity])
-            if not len (entries):
+        for item in snap.counting:
+            if cancelled ():
+                return None
+            n_activity = item.index
+            if not item.data.n_entries:
                 continue
-            activity_max = np.max ([entry.n for entry in entries])
-            di = entries[0].date
-            ti = datetime.datetime (di.year, di.month, di.day)
-            df = entries[-1].date
-            tf = datetime.datetime (df.year, df.month, df.day, 23, 59, 59)
+            blocks = counting_block_data (item.data)
+            ti, tf = blocks.ti, blocks.tf
             if ti > spec_tf or tf < spec_ti:
                 continue
             if sel_ti == None or ti < sel_ti:
@@ -1309,178 +1483,158 @@ class MainWindow (object):
             if sel_tf == None or tf > sel_tf:
                 sel_tf = tf
 
-            block_xs = []
-            block_ys = []
-            alphas = []
-
-            last_date = di - datetime.timedelta (days=1)
             hours1 = - 2 * (n_counting_activities - n_activity - 1) - 3
             hours2 = - 2 * (n_counting_activities - n_activity - 1) - 1
-            for entry in entries:
-                date = entry.date
-                #if date == last_date:
-                #    continue
-                last_date = date
-                prev_day = datetime.datetime (
-                        date.year, date.month, date.day, 0, 0)
-                next_day = prev_day + one_day
-                block_x = [prev_day, prev_day, next_day, next_day]
-                block_y = [hours1, hours2, hours2, hours1]
-                block_xs.append (block_x)
-                block_ys.append (block_y)
-                alphas.append (entry.n / activity_max)
-
-            block_xs = np.array (block_xs)
-            block_ys = np.array (block_ys)
-            alphas = np.array (alphas)
-
-            alpha_range = np.arange (0, 1.0001 + 1/20., 1/20.)
-            for a1, a2 in izip (alpha_range[:-1], alpha_range[1:]):
-
-                call_list = []
-                idx = (a1 <= alphas) * (alphas < a2)
-                for xtips, ytips in izip (block_xs[idx], block_ys[idx]):
-                    call_list.append (xtips)
-                    call_list.append (ytips)
-
-                color = cadm.colors[i]
-                colormax = 65535
-                mpl_color = (
-                    color.red / colormax,
-                    color.green / colormax,
-                    color.blue / colormax,
-                    a1)
-
-                ax.fill (*call_list,
-                         edgecolor='none', facecolor=mpl_color)
-
-        n_timing_activities = 0
-        for i, activity in enumerate (tadm.activities):
-            if not tadm.checks[i]:
+            days = blocks.days
+            verts = np.empty ((len (days), 4, 2))
+            verts[:,:,0] = days[:,np.newaxis] + [0, 0, 1, 1]
+            verts[:,:,1] = [hours1, hours2, hours2, hours1]
+            facecolors = np.empty ((len (days), 4))
+            facecolors[:,:3] = item.color
+            facecolors[:,3] = blocks.alphas
+            out.counting_blocks.append ((verts, facecolors))
+
+        for item in snap.timing:
+            if cancelled ():
+                return None
+            if not item.data.n_entries:
                 continue
-            entries = sorted (self.log.entries[activity])
-            if not len (entries):
-                continue
-            ti = entries[0].start_time
-            tf = entries[-1].end_time
+            blocks = timing_block_data (item.data)
+            ti, tf = blocks.ti, blocks.tf
             if ti > spec_tf or tf < spec_ti:
                 continue
             if sel_ti == None or ti < sel_ti:
                 sel_ti = ti
             if sel_tf == None or tf > sel_tf:
                 sel_tf = tf
-
-            block_xs = []
-            block_ys = []
-            for entry in entries:
-                t1 = entry.start_time
-                t2 = entry.end_time
-                if t2.day != t1.day:
-                    first_t1 = t1
-                    first_t2 = datetime.datetime (
-                            t1.year, t1.month, t1.day, 23, 59, 59)
-                    second_t1 = datetime.datetime (
-                            t2.year, t2.month, t2.day, 0, 0, 0)
-                    second_t2 = t2
-                    ts = [(first_t1, first_t2), (second_t1, second_t2)]
+            block = Vars ()
+            block.name = item.data.name
+            block.rgba = item.color + (0.6,)
+            block.data = blocks
+            out.timing_blocks.append (block)
+
+        if sel_ti is None:
+            return None
+        out.sel_ti, out.sel_tf = sel_ti, sel_tf
+        return out
+
+    def ana_draw_block (self, snap, data):
+        """Draw a block plot computed by ana_compute_block.
+
+        If the previous plot was a block plot of the same activities, its
+        collections and images are updated in place.
+        """
+        LOG_F ()
+        counting_activities = snap.counting_names
+        n_counting_activities = len (snap.counting)
+        n_timing_activities = len (data.timing_blocks)
+        structure = ('block', tuple (counting_activities),
+                n_counting_activities, len (data.counting_blocks),
+                tuple ((block.name, block.rgba, 'image' in block.data)
+                    for block in data.timing_blocks))
+
+        state = self.ana.plot_state
+        if state is not None and state.structure == structure:
+            ax = state.ax
+            for coll, (verts, facecolors) in izip (
+                    state.counting_artists, data.counting_blocks):
+                coll.set_verts (verts)
+                coll.set_facecolors (facecolors)
+            for artist, block in izip (
+                    state.timing_artists, data.timing_blocks):
+                if 'image' in block.data:
+                    artist.set_data (block.data.image)
+                    artist.set_extent (block.data.extent)
                 else:
-                    ts = [(t1, t2)]
-                for ta, tb in ts:
-                    prev_day = datetime.datetime (
-                            ta.year, ta.month, ta.day, 0, 0)
-                    next_day = prev_day + datetime.timedelta (days=1.)
-                    hours1 = ta.hour + ta.minute / 60.
-                    hours2 = tb.hour + tb.minute / 60.
-                    block_x = [prev_day, prev_day, next_day, next_day]
-                    block_y = [hours1, hours2, hours2, hours1]
-                    block_xs.append (block_x)
-                    block_ys.append (block_y)
-
-            call_list = []
-            for xtips, ytips in izip (block_xs, block_ys):
-                call_list.append (xtips)
-                call_list.append (ytips)
-
-            color = tadm.colors[i]
-            colormax = 65535
-            mpl_color = (
-                color.red / colormax,
-                color.green / colormax,
-                color.blue / colormax,
-                0.6
-            )
-
-            n_timing_activities += 1
-            ax.fill (*call_list[:2],
-                    edgecolor='none', facecolor=mpl_color,
-                    label=activity.name)
-            if len (call_list) > 2:
-                ax.fill (*call_list[2:],
-                         edgecolor='none', facecolor=mpl_color)
-
-        hour_tick_locs = np.arange (0, 24.1, 4)
-        counting_tick_locs = np.arange (
-                -2 * len (counting_activities), 0, 2)
-        ax.yaxis.set_major_locator (mpl.ticker.FixedLocator (
-            np.r_[counting_tick_locs, hour_tick_locs]))
-
-        def ff (val, i):
-            if val >= 0:
-                return '{0}:00'.format (int (val))
+                    artist.set_verts (block.data.verts)
+            for line in state.xtick_lines:
+                line.remove ()
+        else:
+            self.ana_plot_clear ()
+            ax = self.ana.figure.add_subplot (111)
+            ax.patch.set_facecolor ('white')
+            state = self.ana.plot_state = Vars (dict (
+                structure=structure, ax=ax,
+                counting_artists=[], timing_artists=[]))
+            legend_handles = []
+
+            for verts, facecolors in data.counting_blocks:
+                coll = mpl.collections.PolyCollection (
+                    verts, facecolors=facecolors, edgecolors='none')
+                ax.add_collection (coll)
+                state.counting_artists.append (coll)
+
+            for block in data.timing_blocks:
+                if 'image' in block.data:
+                    image = ax.imshow (block.data.image,
+                            cmap=mpl.colors.ListedColormap (
+                                [(0, 0, 0, 0), block.rgba]),
+                            vmin=0, vmax=1, origin='lower', aspect='auto',
+                            interpolation='nearest',
+                            extent=block.data.extent)
+                    state.timing_artists.append (image)
+                    legend_handles.append (mpl.patches.Patch (
+                        facecolor=block.rgba, edgecolor='none',
+                        label=block.name))
+                else:
+                    collection = mpl.collections.PolyCollection (
+                            block.data.verts, facecolors=[block.rgba],
+                            edgecolors='none', label=block.name)
+                    ax.add_collection (collection)
+                    state.timing_artists.append (collection)
+                    legend_handles.append (collection)
+
+            ax.xaxis_date ()
+            hour_tick_locs = np.arange (0, 24.1, 4)
+            counting_tick_locs = np.arange (
+                    -2 * len (counting_activities), 0, 2)
+            ax.yaxis.set_major_locator (mpl.ticker.FixedLocator (
+                np.r_[counting_tick_locs, hour_tick_locs]))
+
+            def ff (val, i):
+                if val >= 0:
+                    return '{0}:00'.format (int (val))
+                else:
+                    return counting_activities[i]
+
+            ax.yaxis.set_major_formatter (mpl.ticker.FuncFormatter (ff))
+
+            if n_timing_activities:
+                for ytick in (0, 4, 8, 12, 16, 20, 24):
+                    ax.axhline (ytick, color='.8', ls=':', zorder=-10)
+                ymin = 24
+                ax.set_ylabel ('hour')
             else:
-                return counting_activities[i]
+                ymin = -.5
+            if n_counting_activities:
+                ymax = -(2 * len (counting_activities) + 1.5)
+            else:
+                ymax = 0
+            ax.set_ylim (ymin, ymax)
+
+            if n_timing_activities:
+                ax.legend (handles=legend_handles, ncol=n_timing_activities,
+                        loc='lower left', bbox_to_anchor=(0,1),
+                        borderaxespad=0)
+            #ax.axhline (-0.5, color='.8', ls='--')
 
-        ax.yaxis.set_major_formatter (mpl.ticker.FuncFormatter (ff))
+            ax.figure.subplots_adjust (left=.08, right=.97)
+            ax.figure.suptitle ('Timing Summary',
+                    horizontalalignment='right', x=.97, y=.96, weight='bold')
 
-        xmin = max (spec_ti, sel_ti)
+        xmin = max (snap.spec_ti, data.sel_ti)
         xmin = datetime.datetime (xmin.year, xmin.month, xmin.day)
-        xmax = min (spec_tf, sel_tf)
+        xmax = min (snap.spec_tf, data.sel_tf)
         xmax = datetime.datetime (xmax.year, xmax.month, xmax.day,
                 23, 59, 59)
         second = datetime.timedelta (seconds=1)
         ax.set_xlim (xmin - second, xmax + second)
+        xticks = self.ana_set_xticks (ax, snap, xmin, xmax)
 
-        n_days = int (timedelta_to_seconds (xmax - xmin) / 86400)
-        all_xticks = [xmin + datetime.timedelta (days=n)
-                for n in xrange (n_days + 2)]
-        xticks = list (all_xticks)
-        skip = 1
-        if self.ana.opts.check_ticks.get_active ():
-            max_xticks = self.ana.opts.spin_ticks.get_value_as_int ()
-        else:
-            max_xticks = 20
-        while len (xticks) > max_xticks:
-            skip += 1
-            xticks = all_xticks[::skip]
-        ax.set_xticks (xticks)
-        ax.xaxis.set_major_formatter (mpl.dates.DateFormatter ('%Y.%m.%d'))
-
-        for xtick in xticks:
-            ax.axvline (xtick, color='.8', ls=':', zorder=-10)
-
-        if n_timing_activities:
-            for ytick in (0, 4, 8, 12, 16, 20, 24):
-                ax.axhline (ytick, color='.8', ls=':', zorder=-10)
-            ymin = 24
-            ax.set_ylabel ('hour')
-        else:
-            ymin = -.5
-        if n_counting_activities:
-            ymax = -(2 * len (counting_activities) + 1.5)
-        else:
-            ymax = 0
-        ax.set_ylim (ymin, ymax)
-
-        if n_timing_activities:
-            ax.legend (ncol=n_timing_activities,
-                    loc='lower left', bbox_to_anchor=(0,1), borderaxespad=0)
-        #ax.axhline (-0.5, color='.8', ls='--')
+        state.xtick_lines = [ax.axvline (xtick, color='.8', ls=':', zorder=-10)
+                for xtick in xticks]
 
         ax.figure.autofmt_xdate (rotation=45)
-        ax.figure.subplots_adjust (left=.08, right=.97)
-        ax.figure.suptitle ('Timing Summary',
-                horizontalalignment='right', x=.97, y=.96, weight='bold')
-
 
 
     # callbacks --------------------------------------------------------------
@@ -1488,8 +1642,14 @@ class MainWindow (object):
     def cb_delete_event (self, widget, event, *args):
         """Handle the X11 delete event."""
         LOG_F ()
+        # cb_quit destroys the window unless the user cancels
         self.cb_quit (widget)
-        return False
+        return True
+
+    def cb_destroy (self, widget, *args):
+        """Handle the window's destroy signal."""
+        LOG_F ()
+        self.detach ()
 
     def cb_new (self, whence, *args):
         """Create a new Log."""
@@ -1563,65 +1723,141 @@ class MainWindow (object):
         LOG_F ()
         response = self.save_first ()
         if response != gtk.RESPONSE_CANCEL:
+            self.window.destroy ()
             gtk.main_quit ()
 
-    def cb_import_timerecording (self, whence, *args):
-        """Import from a TimeRecording export."""
+    def cb_import (self, whence, *args):
+        """Import entries from a file, in the format chosen in the dialog."""
         LOG_F ()
-        dialog = gtk.FileChooserDialog ('Import from TimeRecording...',
+        pad = self.pad
+        dialog = gtk.FileChooserDialog ('Import...',
                 None, gtk.FILE_CHOOSER_ACTION_OPEN,
                 (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL,
                     gtk.STOCK_OPEN, gtk.RESPONSE_OK)
                 )
         dialog.set_default_response (gtk.RESPONSE_OK)
 
-        add_filt (dialog, 'TimeRecording CSV files', '*.csv')
+        names = sorted (manateeimport.importers)
+        hbox = gtk.HBox (False, pad)
+        hbox.pack_start (make_label ('Format: '), False)
+        format_combo = gtk.combo_box_new_text ()
+        hbox.pack_start (format_combo, False)
+        for name in names:
+            importer_class = manateeimport.get_importer (name)
+            format_combo.append_text (importer_class.description)
+            add_filt (dialog,
+                    importer_class.description, importer_class.pattern)
+        format_combo.set_active (names.index ('timerecording'))
         add_filt (dialog, 'All files', '*')
+        hbox.show_all ()
+        dialog.set_extra_widget (hbox)
 
         response = dialog.run ()
         if response == gtk.RESPONSE_OK:
             filename = dialog.get_filename ()
         else:
             filename = None
+        name = names[format_combo.get_active ()]
         dialog.destroy ()
-        if filename:
-            pad = self.pad
-            conv_dialog = gtk.Dialog ('Default task',
-                    self.window,
-                    gtk.DIALOG_MODAL | gtk.DIALOG_DESTROY_WITH_PARENT,
-                    (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL,
-                        gtk.STOCK_OK, gtk.RESPONSE_OK))
-            hbox = gtk.HBox (False, pad)
-            conv_dialog.vbox.pack_start (hbox)
+        if not filename:
+            return
 
-            hbox.pack_start (make_label ('When not indicated, task is: '),
-                    False, padding=pad)
-            combo = gtk.combo_box_new_text ()
-            hbox.pack_start (combo, True, padding=pad)
-            combo.append_text ('(none)')
-            combo.set_active (0)
+        if name == 'timerecording':
             activities = sorted (self.log.timing_activities)
-            for activity in sorted (self.log.timing_activities):
-                combo.append_text (activity.name)
+            option, prompt = 'default', 'When not indicated, task is: '
+        else:
+            activities = sorted (
+                    self.log.counting_activities | self.log.timing_activities)
+            option, prompt = 'activity_name', \
+                    'When not indicated, activity is: '
+        conv_dialog = gtk.Dialog ('Default activity',
+                self.window,
+                gtk.DIALOG_MODAL | gtk.DIALOG_DESTROY_WITH_PARENT,
+                (gtk.STOCK_CANCEL, gtk.RESPONSE_CANCEL,
+                    gtk.STOCK_OK, gtk.RESPONSE_OK))
+        hbox = gtk.HBox (False, pad)
+        conv_dialog.vbox.pack_start (hbox)
+
+        hbox.pack_start (make_label (prompt), False, padding=pad)
+        combo = gtk.combo_box_new_text ()
+        hbox.pack_start (combo, True, padding=pad)
+        combo.append_text ('(none)')
+        combo.set_active (0)
+        for activity in activities:
+            combo.append_text (activity.name)
 
-            conv_dialog.show_all ()
-            response = conv_dialog.run ()
-            i_activity = combo.get_active () - 1
-            conv_dialog.destroy ()
-            if response == gtk.RESPONSE_CANCEL:
-                return
-            default = activities[i_activity].name if i_activity >= 0 else None
-            importer = manateeimport.TimeRecordingImporter (
-                    filename, self.log, default=default)
+        conv_dialog.show_all ()
+        response = conv_dialog.run ()
+        i_activity = combo.get_active () - 1
+        conv_dialog.destroy ()
+        if response == gtk.RESPONSE_CANCEL:
+            return
+        kwargs = {}
+        if i_activity >= 0:
+            kwargs[option] = activities[i_activity].name
+        importer = None
+        try:
+            importer = manateeimport.get_importer (name) (
+                    filename, self.log, **kwargs)
             n_imported = importer.do_import ()
+        except (IOError, ValueError) as e:
+            if importer is not None and importer.n_imported:
+                self.modify ('import', 'Imported {0} entries.'.format (
+                    importer.n_imported))
+            self.error ('Could not import {0}:\n{1}'.format (filename, e),
+                    'Import failed')
+            return
+        self.modify ('import', 'Imported {0} entries.'.format (n_imported))
+
+    def cb_log_changed (self, events):
+        """Respond to changes in the log.
+
+        The entry views update themselves; here the activity combos, the
+        analysis activity lists and the plot are brought up to date.
+        """
+        LOG_F ()
+        kinds = set (
+                event.activity.kind for event in events
+                if event.kind in activity_event_kinds)
+        if 'counting' in kinds:
+            self.sync_counting_activities ()
+        if 'timing' in kinds:
             self.sync_timing_activities ()
-            self.modify ('import', 'Imported {0} entries.'.format (n_imported))
+        if kinds:
+            self.sync_ana_activities (events)
+        self.sync_ana_plot_update ()
 
     def cb_notebook_page_switch (self, whence, page_num, *args):
         """Switch notebook page."""
         LOG_F ()
         self.notebook.set_current_page (page_num)
 
+    def cb_notebook_switch_page (self, notebook, page, page_num):
+        """Draw a plot that went stale while the Analysis page was hidden."""
+        LOG_F ()
+        if page_num == self.ana.page_num and self.plot_dirty:
+            self.sync_ana_plot_update ()
+
+    def cb_ana_plot_draw (self, generation, draw, snap, data):
+        """Draw a finished plot computation, unless it is stale."""
+        LOG_F ()
+        if generation != self.plot_generation:
+            return False
+        if data is None:
+            self.ana_plot_clear ()
+        else:
+            draw (snap, data)
+        self.ana.canvas.draw_idle ()
+        return False
+
+    def cb_ana_plot_refresh (self):
+        """Redraw the analysis plot if it is dirty and showing."""
+        LOG_F ()
+        self.plot_source = None
+        if self.plot_dirty and self.ana_plot_visible ():
+            self.ana_plot_render ()
+        return False
+
     def cb_setup_meta_update (self, whence, *args):
         """Update meta data."""
         LOG_F ()
@@ -1638,15 +1874,12 @@ class MainWindow (object):
         if not rows:
             self.set_status ('counting', 'No activity selected.')
             return
-        activity = sorted (self.log.counting_activities)[rows[0][0]]
+        activity = self.setup.cam.rows[rows[0][0]]
         response = self.confirm (
                 'Remove activity "{0}"?'.format (activity.name),
                 'Confirm remove')
         if response == gtk.RESPONSE_OK:
-            remove_first_child (self.setup.cam_sw)
-            self.log.counting_activities.remove (activity)
-            del self.log.entries[activity]
-            self.sync_counting_activities ()
+            self.log.remove_activity (activity)
             self.modify (
                     'counting', 'Removed activity "{0}"'.format (activity.name))
 
@@ -1656,7 +1889,7 @@ class MainWindow (object):
         cam, rows = whence.get_selection ().get_selected_rows ()
         if not rows:
             return
-        activity = sorted (self.log.counting_activities)[rows[0][0]]
+        activity = self.setup.cam.rows[rows[0][0]]
         self.setup.entry_counting_add_name.set_text (activity.name)
         self.setup.entry_counting_add_unit.set_text (activity.unit)
 
@@ -1667,7 +1900,7 @@ class MainWindow (object):
         if not rows:
             self.set_status ('counting', 'No activity selected.')
             return
-        activity = sorted (self.log.counting_activities)[rows[0][0]]
+        activity = self.setup.cam.rows[rows[0][0]]
         old_name, old_unit = activity.name, activity.unit
         new_name = self.setup.entry_counting_add_name.get_text ()
         new_unit = self.setup.entry_counting_add_unit.get_text ()
@@ -1698,9 +1931,10 @@ class MainWindow (object):
                 return
             if response == gtk.RESPONSE_CANCEL:
                 return
-            self.log.change_units (activity.name, new_unit, factor)
-        activity.name = new_name
-        self.sync_counting_activities ()
+        with self.log.batch ():
+            if new_unit != old_unit:
+                self.log.change_units (activity.name, new_unit, factor)
+            self.log.rename_activity (activity, new_name)
         self.modify ('counting', 'Edited activity "{0}".'.format (
             activity.name))
 
@@ -1709,9 +1943,7 @@ class MainWindow (object):
         LOG_F ()
         name = self.setup.entry_counting_add_name.get_text ()
         unit = self.setup.entry_counting_add_unit.get_text ()
-        remove_first_child (self.setup.cam_sw)
         self.log.add_activity (CountingActivity (name, unit=unit))
-        self.sync_counting_activities ()
         self.modify ('counting', 'Added activity "{0}".'.format (name))
 
     def cb_setup_timing_remove (self, whence, *args):
@@ -1722,15 +1954,12 @@ class MainWindow (object):
         if not rows:
             self.set_status ('timing', 'No activity selected.')
             return
-        activity = sorted (self.log.timing_activities)[rows[0][0]]
+        activity = self.setup.tam.rows[rows[0][0]]
         response = self.confirm (
                 'Remove activity "{0}"?'.format (activity.name),
                 'Confirm remove')
         if response == gtk.RESPONSE_OK:
-            remove_first_child (self.setup.tam_sw)
-            self.log.timing_activities.remove (activity)
-            del self.log.entries[activity]
-            self.sync_timing_activities ()
+            self.log.remove_activity (activity)
             self.modify (
                 'timing', 'Removed activity "{0}"'.format (activity.name))
 
@@ -1740,7 +1969,7 @@ class MainWindow (object):
         cam, rows = whence.get_selection ().get_selected_rows ()
         if not rows:
             return
-        activity = sorted (self.log.timing_activities)[rows[0][0]]
+        activity = self.setup.tam.rows[rows[0][0]]
         self.setup.entry_timing_add_name.set_text (activity.name)
 
     def cb_setup_timing_edit (self, whence, *args):
@@ -1750,18 +1979,16 @@ class MainWindow (object):
         if not rows:
             self.set_status ('timing', 'No activity selected.')
             return
-        activity = sorted (self.log.timing_activities)[rows[0][0]]
-        activity.name = self.setup.entry_timing_add_name.get_text ()
-        self.sync_timing_activities ()
+        activity = self.setup.tam.rows[rows[0][0]]
+        self.log.rename_activity (
+                activity, self.setup.entry_timing_add_name.get_text ())
         self.modify ('timing', 'Edited activity "{0}"'.format (activity.name))
 
     def cb_setup_timing_add (self, whence, *args):
         """Add a timing activity."""
         LOG_F ()
         name = self.setup.entry_timing_add_name.get_text ()
-        remove_first_child (self.setup.tam_sw)
         self.log.add_activity (TimingActivity (name))
-        self.sync_timing_activities ()
         self.modify ('timing', 'Added activity "{0}"'.format (name))
 
     def cb_counting_choose (self, whence, *args):
@@ -1776,7 +2003,7 @@ class MainWindow (object):
         if not rows:
             return
         activity_idx = self.counting.combo.get_active ()
-        activity = sorted (self.log.counting_activities)[activity_idx]
+        activity = self.counting.activities[activity_idx]
         entry = self.log.entries[activity][rows[0][0]]
         self.counting.spin_Y.set_value (entry.date.year)
         self.counting.spin_M.set_value (entry.date.month)
@@ -1799,9 +2026,7 @@ class MainWindow (object):
         entry = entries[idx]
         response = self.confirm ('Remove entry?', 'Confirm remove')
         if response == gtk.RESPONSE_OK:
-            remove_first_child (self.counting.cem_sw)
-            entries.pop (idx)
-            self.sync_counting_entries ()
+            self.log.remove_entry (entry)
             self.modify (
                     'counting', 'Removed entry from {0}.'.format (entry.date))
 
@@ -1813,7 +2038,7 @@ class MainWindow (object):
             self.set_status ('counting', 'No entry selected.')
             return
         activity_idx = self.counting.combo.get_active ()
-        activity = sorted (self.log.counting_activities)[activity_idx]
+        activity = self.counting.activities[activity_idx]
         entry = self.log.entries[activity][rows[0][0]]
         Y = self.counting.spin_Y.get_value_as_int ()
         M = self.counting.spin_M.get_value_as_int ()
@@ -1834,11 +2059,8 @@ class MainWindow (object):
         note = note_buffer.get_text (
                 note_buffer.get_start_iter (),
                 note_buffer.get_end_iter ())
-        entry.date = datetime.date (Y, M, D)
-        entry.n = n
-        entry.error = error
-        entry.note = note
-        self.sync_counting_entries ()
+        self.log.update_entry (entry, date=datetime.date (Y, M, D),
+                n=n, error=error, note=note)
         self.modify ('counting', 'Edited entry on {0}.'.format (entry.date))
 
     def cb_counting_add_entry (self, whence, *args):
@@ -1853,14 +2075,11 @@ class MainWindow (object):
         note = note_buffer.get_text (
                 note_buffer.get_start_iter (),
                 note_buffer.get_end_iter ())
-        entries = self.counting.cem.entries
-        remove_first_child (self.counting.cem_sw)
         activity_idx = self.counting.combo.get_active ()
-        activity = sorted (self.log.counting_activities)[activity_idx]
+        activity = self.counting.activities[activity_idx]
         date = datetime.date (Y, M, D)
         entry = self.log.create_entry (
                 activity.name, date, n, error=error, note=note)
-        self.sync_counting_entries ()
         self.counting.entry_n.set_text ('')
         self.counting.entry_error.set_text ('')
         self.modify ('counting', 'Added entry on {0}.'.format (entry.date))
@@ -1892,7 +2111,7 @@ class MainWindow (object):
         if not rows:
             return
         activity_idx = self.timing.combo.get_active ()
-        activity = sorted (self.log.timing_activities)[activity_idx]
+        activity = self.timing.activities[activity_idx]
         entry = self.log.entries[activity][rows[0][0]]
         self.timing.spin_sY.set_value (entry.start_time.year)
         self.timing.spin_sM.set_value (entry.start_time.month)
@@ -1929,9 +2148,7 @@ class MainWindow (object):
         entry = entries[idx]
         response = self.confirm ('Remove entry?', 'Confirm remove')
         if response == gtk.RESPONSE_OK:
-            remove_first_child (self.timing.tem_sw)
-            entries.pop (idx)
-            self.sync_timing_entries ()
+            self.log.remove_entry (entry)
             self.modify ('timing', 'Removed entry starting at {0}'.format (
                 entry.start_time))
 
@@ -1960,10 +2177,10 @@ class MainWindow (object):
         note = note_buffer.get_text (
                 note_buffer.get_start_iter (),
                 note_buffer.get_end_iter ())
-        entry.start_time = datetime.datetime (sY, sM, sD, sh, sm)
-        entry.end_time = datetime.datetime (eY, eM, eD, eh, em)
-        entry.note = note
-        self.sync_timing_entries ()
+        self.log.update_entry (entry,
+                start_time=datetime.datetime (sY, sM, sD, sh, sm),
+                end_time=datetime.datetime (eY, eM, eD, eh, em),
+                note=note)
         self.modify ('timing', 'Edited entry starting at {0}'.format (
             entry.start_time))
 
@@ -1987,15 +2204,12 @@ class MainWindow (object):
                 note_buffer.get_start_iter (),
                 note_buffer.get_end_iter ())
 
-        entries = self.timing.tem.entries
-        remove_first_child (self.timing.tem_sw)
         activity_idx = self.timing.combo.get_active ()
-        activity = sorted (self.log.timing_activities)[activity_idx]
+        activity = self.timing.activities[activity_idx]
         start_time = datetime.datetime (sY, sM, sD, sh, sm)
         end_time = datetime.datetime (eY, eM, eD, eh, em)
         entry = self.log.create_entry (
                 activity.name, start_time, end_time, note=note)
-        self.sync_timing_entries ()
         # self.setup_timing_entries_add_start ()
         # self.setup_timing_entries_add_end ()
         self.modify ('timing', 'Added entry starting at {0}'.format (
@@ -2062,8 +2276,7 @@ class MainWindow (object):
         if response == gtk.RESPONSE_OK:
             new_color = dialog.colorsel.get_current_color ()
             new_alpha = dialog.colorsel.get_current_alpha ()
-            model.colors[row] = new_color
-            model.alphas[row] = new_alpha
+            model.set_color (row, new_color, new_alpha)
         self.set_status (
                 'ana', 'Updated color for "{0}".'.format (activity.name))
         self.sync_ana_plot_update ()
@@ -2087,6 +2300,7 @@ class MainWindow (object):
         else:
             filename = None
         if filename:
+            self.ana_plot_wait ()
             self.ana.figure.savefig (filename)
             self.set_status ('load', 'Saved {0}.'.format (filename))
         dialog.destroy ()
@@ -2105,6 +2319,16 @@ class MainWindow (object):
         dialog.destroy ()
         return response
 
+    def error (self, msg, title):
+        LOG_F ()
+        dialog = gtk.MessageDialog (
+                self.window, gtk.DIALOG_MODAL,
+                gtk.MESSAGE_ERROR, gtk.BUTTONS_OK,
+                msg)
+        dialog.set_title (title)
+        dialog.run ()
+        dialog.destroy ()
+
     def yes_no_cancel (self, msg, title):
         LOG_F ()
         dialog = gtk.MessageDialog (
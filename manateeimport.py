@@ -3,53 +3,156 @@
 
 from __future__ import division, print_function
 
-__doc__ = """Import entries."""
+__doc__ = """Import entries.
 
+Importers are registered by name in :data:`importers`.  Each importer yields
+its entries in batches, which :meth:`Importer.do_import` hands to
+:meth:`manateelog.Log.bulk_add`.  Log listeners are notified once, when the
+import is done.
 
+"""
+
+
+import bisect
 import datetime
 import csv
+import json
 import re
 
+from manateelog import CountingEntry, TimingEntry
 
-class TimeRecordingImporter (object):
 
-    """Import from TimeRecording (Andriod App)."""
+importers = {}
 
-    def __init__ (self, filename, log, default=None):
+def register (name):
+    """Class decorator registering an :class:`Importer` under name."""
+    def wrap (cls):
+        importers[name] = cls
+        return cls
+    return wrap
+
+def get_importer (name):
+    """Get the :class:`Importer` class registered under name."""
+    try:
+        return importers[name]
+    except KeyError:
+        raise ValueError ('no importer found with name "{0}"'.format (name))
+
+
+class Importer (object):
+
+    """Base class for importers.
+
+    Subclasses implement :meth:`get_entries`, a generator of new entries,
+    and set description and pattern for file choosers.
+    """
+
+    batch_size = 1000
+    description = 'All files'
+    pattern = '*'
+
+    def __init__ (self, filename, log):
         self.filename = filename
         self.log = log
+        self.n_imported = 0
+
+    def get_entries (self):
+        """Yield the entries to import."""
+        raise NotImplementedError ()
+
+    def batches (self):
+        """Yield lists of at most batch_size entries."""
+        batch = []
+        for entry in self.get_entries ():
+            batch.append (entry)
+            if len (batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def do_import (self):
+        """Add all entries to the log; return the number imported.
+
+        If reading the file fails partway, the batches already added stay in
+        the log, and n_imported counts them.
+        """
+        self.n_imported = 0
+        with self.log.batch ():
+            for batch in self.batches ():
+                self.n_imported += self.log.bulk_add (batch)
+        return self.n_imported
+
+
+class OverlapChecker (object):
+
+    """Check new time ranges against an activity's existing entries."""
+
+    def __init__ (self, entries):
+        self.starts = []
+        self.ends = []
+        self.max_duration = datetime.timedelta (0)
+        for entry in entries:
+            self.add (entry.start_time, entry.end_time)
+
+    def overlaps (self, start_time, end_time):
+        """Whether (start_time, end_time) overlaps any range seen so far."""
+        i1 = bisect.bisect_left (self.starts, start_time - self.max_duration)
+        i2 = bisect.bisect_left (self.starts, end_time)
+        for i in xrange (i1, i2):
+            if self.ends[i] > start_time and self.starts[i] < end_time:
+                return True
+        return False
+
+    def add (self, start_time, end_time):
+        i = bisect.bisect_right (self.starts, start_time)
+        self.starts.insert (i, start_time)
+        self.ends.insert (i, end_time)
+        self.max_duration = max (self.max_duration, end_time - start_time)
+
+
+@register ('timerecording')
+class TimeRecordingImporter (Importer):
+
+    """Import from TimeRecording (Andriod App)."""
+
+    description = 'TimeRecording CSV files'
+    pattern = '*.csv'
+
+    def __init__ (self, filename, log, default=None):
+        Importer.__init__ (self, filename, log)
         self.default = default
         with open (self.filename, 'rt') as f:
             self.lines = f.readlines ()
 
-    def do_import (self):
-        n_imported = 0
+    def get_entries (self):
+        records = list (self.get_records ())
         for activity in sorted (self.log.timing_activities):
-            n_imported += self.put_entries (activity.name)
-        return n_imported
-
-    def put_entries (self, activity_name):
+            checker = OverlapChecker (self.log.entries[activity])
+            for task, start_time, end_time in records:
+                task_match = re.match (activity.name, task)
+                if not task_match:
+                    if not (activity.name == self.default and task == ''):
+                        continue
+                if checker.overlaps (start_time, end_time):
+                    continue
+                checker.add (start_time, end_time)
+                yield TimingEntry (activity, start_time, end_time)
 
-        def get_line_info (line):
-            return month, day, year, \
-                    start_hour, start_minute, end_hour, end_minute, task
+    def get_records (self):
+        """Yield (task, start_time, end_time) for each line."""
 
-        n_imported = 0
+        regex = re.compile ('(\d\d)/(\d\d)/(\d\d\d\d),\w\w\w,'\
+                '(\d\d):(\d\d)( am| pm)?,(\d\d):(\d\d)( am| pm)?,' \
+                '\d\d:\d\d,([^,]*),(([^,]*),)?.*')
 
         for line in self.lines:
-            regex = '(\d\d)/(\d\d)/(\d\d\d\d),\w\w\w,'\
-                    '(\d\d):(\d\d)( am| pm)?,(\d\d):(\d\d)( am| pm)?,' \
-                    '\d\d:\d\d,([^,]*),(([^,]*),)?.*'
-            m = re.match (regex, line)
+            m = regex.match (line)
             if not m:
                 continue
             task = m.group (10)
             if re.match ('\d\d\.\d\d', task):
                 task = m.group (12)
-            task_match = re.match (activity_name, task)
-            if not task_match:
-                if not (activity_name == self.default and task == ''):
-                    continue
             month = int (m.group (1))
             day = int (m.group (2))
             year = int (m.group (3))
@@ -71,15 +174,109 @@ class TimeRecordingImporter (object):
                     year, month, day, end_hour, end_minute)
             if start_time > end_time:
                 end_time += datetime.timedelta (days=1)
+            yield task, start_time, end_time
 
-            existing = self.log.get_entries (activity_name)
-            try:
-                for entry in existing:
-                    overlap = entry.overlap_in_hours (start_time, end_time)
-                    assert overlap == 0
-            except:
-                continue
-            self.log.create_entry (activity_name, start_time, end_time)
-            n_imported += 1
 
-        return n_imported
+class RecordImporter (Importer):
+
+    """Base class for importers that read one dict per entry.
+
+    Recognized fields are 'activity', 'date', 'n', 'error' and 'note' for
+    counting activities, and 'activity', 'start_time', 'end_time' and 'note'
+    for timing activities.
+    """
+
+    def __init__ (self, filename, log, activity_name=None,
+            date_format='%Y-%m-%d', time_format='%Y-%m-%d %H:%M:%S'):
+        """Construct a RecordImporter.
+
+        :type   activity_name: str
+        :param  activity_name: The activity for records without an 'activity'
+            field.
+
+        :type   date_format: str
+        :param  date_format: The strptime format for 'date'.
+
+        :type   time_format: str
+        :param  time_format: The strptime format for 'start_time' and
+            'end_time'.
+        """
+        Importer.__init__ (self, filename, log)
+        self.activity_name = activity_name
+        self.date_format = date_format
+        self.time_format = time_format
+
+    def get_records (self):
+        """Yield a dict for each record."""
+        raise NotImplementedError ()
+
+    def get_entries (self):
+        activities = {}
+        for i_record, record in enumerate (self.get_records (), 1):
+            name = record.get ('activity') or self.activity_name
+            if name not in activities:
+                activities[name] = self.log.get_activity (name)
+            activity = activities[name]
+            note = record.get ('note') or ''
+            if activity.kind == 'counting':
+                n = record.get ('n')
+                if n is None or n == '':
+                    raise ValueError (
+                            'record {0} ({1}) has no "n" for "{2}"'.format (
+                                i_record, record.get ('date'), name))
+                date = datetime.datetime.strptime (
+                        record['date'], self.date_format).date ()
+                yield CountingEntry (activity, date, n,
+                        error=record.get ('error') or 0, note=note)
+            else:
+                start_time = datetime.datetime.strptime (
+                        record['start_time'], self.time_format)
+                end_time = datetime.datetime.strptime (
+                        record['end_time'], self.time_format)
+                yield TimingEntry (activity, start_time, end_time, note=note)
+
+
+@register ('csv')
+class CsvImporter (RecordImporter):
+
+    """Import from a generic CSV file with a header row."""
+
+    description = 'CSV files'
+    pattern = '*.csv'
+
+    def __init__ (self, filename, log, columns=None, **kwargs):
+        """Construct a CsvImporter.
+
+        :type   columns: dict
+        :param  columns: Map from record field (e.g. 'date') to CSV column
+            heading.  Fields not given are read from the column of the same
+            name.
+
+        Other keyword arguments are passed to :class:`RecordImporter`.
+        """
+        RecordImporter.__init__ (self, filename, log, **kwargs)
+        self.columns = dict (columns or {})
+
+    def get_records (self):
+        fields = ('activity', 'date', 'n', 'error', 'note',
+                'start_time', 'end_time')
+        with open (self.filename, 'rb') as f:
+            for row in csv.DictReader (f):
+                yield dict (
+                        (field, row.get (self.columns.get (field, field)))
+                        for field in fields)
+
+
+@register ('jsonl')
+class JsonLinesImporter (RecordImporter):
+
+    """Import from a file with one JSON object per line."""
+
+    description = 'JSON lines files'
+    pattern = '*.jsonl'
+
+    def get_records (self):
+        with open (self.filename, 'rt') as f:
+            for line in f:
+                if line.strip ():
+                    yield json.loads (line)
@@ -5,14 +5,52 @@ from __future__ import division, print_function
 
 __doc__ = """Log daily activities."""
 
+import contextlib
 import datetime
-from itertools import izip
+import hashlib
+from itertools import count, izip
 import re
 
 def timedelta_to_seconds (dt):
     """Return the number of seconds a timedelta lasts as a float."""
     return dt.seconds + dt.microseconds / 1E6 + dt.days * 86400
 
+def merge_sorted (a, b, key):
+    """Merge two lists that are each already sorted by key.
+
+    On ties, elements of a come before elements of b.
+    """
+    out = []
+    i, j = 0, 0
+    n_a, n_b = len (a), len (b)
+    while i < n_a and j < n_b:
+        if key (b[j]) < key (a[i]):
+            out.append (b[j])
+            j += 1
+        else:
+            out.append (a[i])
+            i += 1
+    out.extend (a[i:])
+    out.extend (b[j:])
+    return out
+
+def fingerprint (activity, entries):
+    """Get a hash of an activity's data.
+
+    The hash covers the unit and the dates, times and amounts of the
+    entries (but not their notes), so it changes exactly when a
+    histogram of the activity could.
+    """
+    h = hashlib.sha1 (activity.kind)
+    if activity.kind == 'counting':
+        h.update (activity.unit.encode ('utf-8'))
+        for entry in entries:
+            h.update (repr ((entry.date, entry.n, entry.error)))
+    else:
+        for entry in entries:
+            h.update (repr ((entry.start_time, entry.end_time)))
+    return h.hexdigest ()
+
 class CountingActivity (object):
 
     """Something someone might do any given day."""
@@ -109,6 +147,9 @@ class CountingEntry (object):
     def cmp (self):
         return lambda a, b: cmp (a.date, b.date)
 
+    def key (self):
+        return lambda entry: entry.date
+
     def __cmp__ (a, b):
         cmp_date = cmp (a.date, b.date)
         if cmp_date:
@@ -149,6 +190,9 @@ class TimingEntry (object):
     def cmp (self):
         return lambda a, b: cmp (a.start_time, b.start_time)
 
+    def key (self):
+        return lambda entry: entry.start_time
+
     def __cmp__ (a, b):
         cmp_start = cmp (a.start_time, b.start_time)
         if cmp_start:
@@ -172,6 +216,83 @@ class TimingEntry (object):
         else:
             return timedelta_to_seconds (dt) / 3600.
 
+def date_range (entries):
+    """Get the (first, last) date or time covered by entries, or None.
+
+    Counting entries cover their date, and timing entries cover their start
+    to end time.
+    """
+    if not entries:
+        return None
+    if entries[0].activity.kind == 'counting':
+        return (min (entry.date for entry in entries),
+                max (entry.date for entry in entries))
+    else:
+        return (min (entry.start_time for entry in entries),
+                max (entry.end_time for entry in entries))
+
+def union_range (a, b):
+    """Get the smallest range containing ranges a and b (either may be
+    None)."""
+    if a is None:
+        return b
+    if b is None:
+        return a
+    return (min (a[0], b[0]), max (a[1], b[1]))
+
+# source of activity versions, shared by all Logs so that a version is never
+# reused, even for an activity that is removed and added again
+version_counter = count (1)
+
+# LogEvent kinds that change the activities themselves, rather than only
+# their entries
+activity_event_kinds = ('activity-added', 'activity-removed',
+        'activity-renamed', 'units-changed')
+
+class LogEvent (object):
+
+    """A change to a :class:`Log`, as delivered to its listeners."""
+
+    kinds = ('activity-added', 'activity-removed', 'activity-renamed',
+            'units-changed',
+            'entries-added', 'entries-updated', 'entries-removed')
+
+    def __init__ (self, kind, activity, entries=None, date_range=None):
+        """Construct a LogEvent.
+
+        :type   kind: str
+        :param  kind: One of :data:`LogEvent.kinds`.
+
+        :type   activity: :class:`CountingActivity` or :class:`TimingActivity`
+        :param  activity: The activity changed, or whose entries changed.
+
+        :type   entries: list
+        :param  entries: The entries added, updated or removed, or None if
+            any of the activity's entries may have changed.
+
+        :type   date_range: tuple
+        :param  date_range: The (first, last) date or time affected, or None
+            if unknown.  For updates this covers both the old and new values.
+        """
+        if kind not in self.kinds:
+            raise ValueError ('unknown event kind "{0}"'.format (kind))
+        self.kind = kind
+        self.activity = activity
+        self.entries = entries
+        self.date_range = date_range
+
+    def __repr__ (self):
+        return 'LogEvent(kind="{0}", activity="{1}", n_entries={2})'.format (
+                self.kind, self.activity.name,
+                None if self.entries is None else len (self.entries))
+
+    @property
+    def entry_ids (self):
+        """The ids of the affected entries, or None."""
+        if self.entries is None:
+            return None
+        return [id (entry) for entry in self.entries]
+
 class Log (object):
 
     """A Log of daily activity."""
@@ -190,6 +311,10 @@ class Log (object):
         self.counting_activities = set ()
         self.timing_activities = set ()
         self.entries = {}
+        self.versions = {}
+        self.listeners = []
+        self.batch_depth = 0
+        self.pending_events = []
 
     def __repr__ (self):
         return 'Log(title="{0}", user="{1}")'.format (
@@ -206,6 +331,90 @@ class Log (object):
                     'CountingActivity or TimingActivity')
         if activity not in self.entries:
             self.entries[activity] = []
+            self.emit (LogEvent ('activity-added', activity, []))
+
+    def remove_activity (self, activity):
+        """Remove an activity and its entries."""
+        if activity.kind == 'counting':
+            self.counting_activities.remove (activity)
+        else:
+            self.timing_activities.remove (activity)
+        entries = self.entries.pop (activity)
+        self.emit (LogEvent ('activity-removed', activity, entries,
+            date_range (entries)))
+        self.versions.pop (activity)
+
+    def rename_activity (self, activity, name):
+        """Rename activity."""
+        activity.name = name
+        self.emit (LogEvent ('activity-renamed', activity, []))
+
+    def version (self, activity):
+        """Get the version of activity's entries.
+
+        The version increases with each change the Log makes to the
+        activity or its entries, and is never reused, so (activity, version)
+        identifies the entries' state.  Code that modifies them directly
+        should call :meth:`changed`.
+        """
+        return self.versions.get (activity, 0)
+
+    def add_listener (self, listener):
+        """Call listener (events) after each change.
+
+        events is a list of :class:`LogEvent`.  It holds a single event,
+        except at the end of a :meth:`batch`.
+        """
+        self.listeners.append (listener)
+
+    def remove_listener (self, listener):
+        """Stop calling listener."""
+        self.listeners.remove (listener)
+
+    @contextlib.contextmanager
+    def batch (self):
+        """Deliver the events of a block of changes together.
+
+        For example::
+
+            with log.batch ():
+                log.remove_entry (a)
+                log.remove_entry (b)
+
+        Listeners are called once, after the outermost batch ends.  Versions
+        are still updated by each change.
+        """
+        self.batch_depth += 1
+        try:
+            yield self
+        finally:
+            self.batch_depth -= 1
+            if self.batch_depth == 0:
+                self.flush_events ()
+
+    def emit (self, event):
+        """Record event, and deliver it unless inside a :meth:`batch`."""
+        self.versions[event.activity] = next (version_counter)
+        self.pending_events.append (event)
+        if self.batch_depth == 0:
+            self.flush_events ()
+
+    def flush_events (self):
+        """Deliver the pending events to the listeners."""
+        events, self.pending_events = self.pending_events, []
+        if not events:
+            return
+        for listener in list (self.listeners):
+            listener (events)
+
+    def changed (self, activity, entries=None):
+        """Mark activity's entries as updated.
+
+        :type   entries: list
+        :param  entries: The entries that were modified, if known.
+        """
+        self.emit (LogEvent ('entries-updated', activity, entries,
+            date_range (entries)))
 
     def add_entry (self, entry):
         """Add entry to the log."""
@@ -214,6 +423,62 @@ class Log (object):
         self.entries[activity].append (entry)
         self.entries[activity] = sorted (self.entries[activity],
                 cmp=entry.cmp ())
+        self.emit (LogEvent ('entries-added', activity, [entry],
+            date_range ([entry])))
+
+    def update_entry (self, entry, **fields):
+        """Set the given attributes of entry, keeping the entries sorted.
+
+        For example, ``log.update_entry (entry, n=2, note='')``.
+        """
+        old_range = date_range ([entry])
+        for name, value in fields.iteritems ():
+            setattr (entry, name, value)
+        self.entries[entry.activity].sort (key=entry.key ())
+        self.emit (LogEvent ('entries-updated', entry.activity, [entry],
+            union_range (old_range, date_range ([entry]))))
+
+    def remove_entry (self, entry):
+        """Remove entry from the log."""
+        entries = self.entries[entry.activity]
+        for i, other in enumerate (entries):
+            if other is entry:
+                del entries[i]
+                break
+        else:
+            raise ValueError ('entry not found in log')
+        self.emit (LogEvent ('entries-removed', entry.activity, [entry],
+            date_range ([entry])))
+
+    def bulk_add (self, entries):
+        """Add many entries to the log at once.
+
+        :type   entries: iterable
+        :param  entries: The :class:`CountingEntry` and/or
+            :class:`TimingEntry` instances to add.
+
+        The new entries for each activity are sorted once and then merged
+        into the existing sorted list in linear time.  The result is the same
+        as calling :meth:`add_entry` for each entry in turn, except that the
+        listeners are called once, as in a :meth:`batch`.
+
+        :return: The number of entries added (int).
+        """
+        by_activity = {}
+        n_added = 0
+        for entry in entries:
+            by_activity.setdefault (entry.activity, []).append (entry)
+            n_added += 1
+        with self.batch ():
+            for activity, new_entries in by_activity.iteritems ():
+                self.add_activity (activity)
+                key = new_entries[0].key ()
+                new_entries.sort (key=key)
+                self.entries[activity] = merge_sorted (
+                        self.entries[activity], new_entries, key)
+                self.emit (LogEvent ('entries-added', activity, new_entries,
+                    date_range (new_entries)))
+        return n_added
 
     def create_entry (self, activity_name, *args, **kwargs):
         """Create a new :class:`Entry` and add it to the Log."""
@@ -228,7 +493,10 @@ class Log (object):
     def change_units (self, activity_name, new_unit, factor):
         """Change units of activity with CountingActivity.change_units."""
         activity = self.get_activity (activity_name)
-        activity.change_units (self.entries[activity], new_unit, factor)
+        entries = self.entries[activity]
+        activity.change_units (entries, new_unit, factor)
+        self.emit (LogEvent ('units-changed', activity, None,
+            date_range (entries)))
 
     def get_activity (self, activity_name):
         """Get an :class:`Activity` instance."""
@@ -336,6 +604,17 @@ def get_log_from_file (filename):
         name = activity_line.strip ()
         log.add_activity (TimingActivity (name))
 
+    activities = dict (
+            (activity.name, activity)
+            for activity in log.counting_activities | log.timing_activities)
+    entries = []
+
+    def activity_named (name):
+        try:
+            return activities[name]
+        except KeyError:
+            return log.get_activity (name)
+
     num_counting_lines = len (counting_lines)
     i = 0
 
@@ -363,7 +642,8 @@ def get_log_from_file (filename):
             note += new_note_line + '\n'
         note = note.strip ()
         date = datetime.date (*map (int, date_str.split ('-')))
-        log.create_entry (activity_name, date, n, error=error, note=note)
+        entries.append (CountingEntry (
+            activity_named (activity_name), date, n, error=error, note=note))
         i += 1
 
     def datetime_from_str (s):
@@ -394,7 +674,9 @@ def get_log_from_file (filename):
         note = note.strip ()
         start_time = datetime_from_str (start_time_str)
         end_time = datetime_from_str (end_time_str)
-        entry = log.create_entry (activity_name, start_time, end_time, note=note)
+        entries.append (TimingEntry (
+            activity_named (activity_name), start_time, end_time, note=note))
         i += 1
 
+    log.bulk_add (entries)
     return log
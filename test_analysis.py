@@ -0,0 +1,255 @@
+# test_analysis.py
+
+from __future__ import division
+
+import datetime
+import shutil
+import tempfile
+import unittest
+
+import matplotlib as mpl
+import matplotlib.dates
+import numpy as np
+
+import analysis
+import histlite
+import manateelog
+
+
+class AnalysisTestCase (unittest.TestCase):
+
+    def setUp (self):
+        # keep the results out of the user's cache
+        self.directory = tempfile.mkdtemp ()
+        self.old_directory = analysis.hist_cache._directory
+        analysis.hist_cache._directory = self.directory
+        self.log = manateelog.Log ()
+
+    def tearDown (self):
+        analysis.hist_cache._directory = self.old_directory
+        shutil.rmtree (self.directory)
+
+    def data (self, activity):
+        return analysis.activity_data (activity,
+                self.log.version (activity), self.log.entries[activity])
+
+    def bin_edges (self, unit, n, ti, tf):
+        binner = histlite.CalendarBinner (unit, n, range=(ti, tf))
+        return list (binner.edges ().astype (object))
+
+
+class TestCountingHist (AnalysisTestCase):
+
+    def setUp (self):
+        AnalysisTestCase.setUp (self)
+        self.activity = manateelog.CountingActivity ('pushups', 'reps')
+        rng = np.random.RandomState (3)
+        day = datetime.date (2019, 12, 20)
+        entries = []
+        for i in range (200):
+            day += datetime.timedelta (days=int (rng.randint (0, 3)))
+            entries.append (manateelog.CountingEntry (self.activity, day,
+                int (rng.randint (0, 50)), float (rng.randint (0, 5))))
+        self.log.bulk_add (entries)
+
+    def loop_hist (self, unit, n, ti, tf):
+        # the per-bin loop that counting_hist replaced
+        entries = self.log.entries[self.activity]
+        x = self.bin_edges (unit, n, ti, tf)
+        y, err = [], []
+        entry_time = lambda entry: datetime.datetime (
+                entry.date.year, entry.date.month, entry.date.day, 12)
+        for x1, x2 in zip (x[:-1], x[1:]):
+            n_days = (x2 - x1).days
+            y.append (np.sum ([
+                entry.n / n_days for entry in entries
+                if x1 <= entry_time (entry) < x2]))
+            err.append (np.sqrt (np.sum ([
+                entry.error**2 / n_days for entry in entries
+                if x1 <= entry_time (entry) < x2])))
+        return x, y, err
+
+    def check (self, unit, n, ti=None, tf=None):
+        data = self.data (self.activity)
+        ti = data.ti if ti is None else ti
+        tf = data.tf if tf is None else tf
+        h = analysis.counting_hist (data, unit, n, ti, tf)
+        x, y, err = self.loop_hist (unit, n, ti, tf)
+        self.assertEqual (list (h.bins), x)
+        np.testing.assert_allclose (h.values, y)
+        np.testing.assert_allclose (h.errors, err)
+
+    def test_days (self):
+        self.check ('day', 1)
+        self.check ('day', 3)
+
+    def test_weeks (self):
+        self.check ('week', 1)
+
+    def test_months (self):
+        self.check ('month', 1)
+        self.check ('quarter', 1)
+
+    def test_partial_range (self):
+        self.check ('week', 2, datetime.datetime (2020, 2, 1),
+                datetime.datetime (2020, 3, 15))
+
+    def test_data_tracks_log_version (self):
+        before = self.data (self.activity)
+        self.log.remove_entry (self.log.entries[self.activity][-1])
+        after = self.data (self.activity)
+        self.assertEqual (after.n_entries, before.n_entries - 1)
+        self.assertNotEqual (after.fingerprint, before.fingerprint)
+        self.check ('week', 1)
+
+    def test_fingerprint (self):
+        entries = self.log.entries[self.activity]
+        before = self.data (self.activity)
+        self.assertEqual (before.fingerprint,
+                manateelog.fingerprint (self.activity, entries))
+        # notes don't change the histograms, so they don't change the key
+        self.log.update_entry (entries[0], note='easy')
+        self.assertEqual (self.data (self.activity).fingerprint,
+                before.fingerprint)
+
+
+class TestTimingHist (AnalysisTestCase):
+
+    def setUp (self):
+        AnalysisTestCase.setUp (self)
+        self.activity = manateelog.TimingActivity ('sleep')
+        rng = np.random.RandomState (4)
+        t = datetime.datetime (2019, 12, 20, 21)
+        entries = []
+        for i in range (200):
+            t += datetime.timedelta (minutes=int (rng.randint (60, 2000)))
+            end = t + datetime.timedelta (minutes=int (rng.randint (1, 900)))
+            entries.append (manateelog.TimingEntry (self.activity, t, end))
+            t = end
+        self.log.bulk_add (entries)
+
+    def loop_hist (self, unit, n, ti, tf):
+        # the per-bin loop that timing_hist replaced
+        entries = self.log.entries[self.activity]
+        x = self.bin_edges (unit, n, ti, tf)
+        y = []
+        for x1, x2 in zip (x[:-1], x[1:]):
+            n_days = (x2 - x1).days
+            y.append (np.sum ([
+                entry.overlap_in_hours (x1, x2) / n_days
+                for entry in entries]))
+        return x, y
+
+    def check (self, unit, n, ti=None, tf=None):
+        data = self.data (self.activity)
+        ti = data.ti if ti is None else ti
+        tf = data.tf if tf is None else tf
+        h = analysis.timing_hist (data, unit, n, ti, tf)
+        x, y = self.loop_hist (unit, n, ti, tf)
+        self.assertEqual (list (h.bins), x)
+        np.testing.assert_allclose (h.values, y)
+
+    def test_days (self):
+        self.check ('day', 1)
+        self.check ('day', 5)
+
+    def test_weeks (self):
+        self.check ('week', 1)
+
+    def test_months (self):
+        self.check ('month', 1)
+
+    def test_partial_range (self):
+        self.check ('day', 2, datetime.datetime (2020, 1, 10, 6),
+                datetime.datetime (2020, 2, 3))
+
+
+class TestBlockData (AnalysisTestCase):
+
+    def setUp (self):
+        AnalysisTestCase.setUp (self)
+        self.old_threshold = analysis.block_raster_threshold
+
+    def tearDown (self):
+        analysis.block_raster_threshold = self.old_threshold
+        AnalysisTestCase.tearDown (self)
+
+    def timing_data (self, times):
+        activity = manateelog.TimingActivity ('sleep')
+        self.log.add_activity (activity)
+        self.log.bulk_add ([manateelog.TimingEntry (activity,
+            datetime.datetime (*start), datetime.datetime (*end))
+            for (start, end) in times])
+        return self.data (activity)
+
+    def test_counting (self):
+        activity = manateelog.CountingActivity ('pushups', 'reps')
+        self.log.bulk_add ([
+            manateelog.CountingEntry (activity, datetime.date (2020, 1, i), n)
+            for (i, n) in [(1, 1), (2, 10), (4, 5), (5, 0.99)]])
+        blocks = analysis.counting_block_data (self.data (activity))
+        day1 = mpl.dates.date2num (datetime.datetime (2020, 1, 1))
+        np.testing.assert_allclose (blocks.days, day1 + np.r_[0, 1, 3, 4])
+        np.testing.assert_allclose (blocks.alphas, [.1, 1, .5, .05])
+        self.assertEqual (blocks.ti, datetime.datetime (2020, 1, 1))
+        self.assertEqual (blocks.tf,
+                datetime.datetime (2020, 1, 5, 23, 59, 59))
+
+    def test_multi_day_entries_are_split (self):
+        blocks = analysis.timing_block_data (self.timing_data ([
+            ((2020, 1, 1, 22), (2020, 1, 3, 2, 30)),
+            ((2020, 1, 3, 9), (2020, 1, 3, 17)),
+            ((2020, 1, 4, 23), (2020, 1, 5, 0)),
+            ]))
+        self.assertNotIn ('image', blocks)
+        day1 = mpl.dates.date2num (datetime.datetime (2020, 1, 1))
+        verts = blocks.verts
+        np.testing.assert_allclose (verts[:,0,0],
+                day1 + np.r_[0, 1, 2, 2, 3, 4])
+        np.testing.assert_allclose (verts[:,2,0], verts[:,0,0] + 1)
+        np.testing.assert_allclose (verts[:,0,1], [22, 0, 0, 9, 23, 0])
+        np.testing.assert_allclose (verts[:,1,1], [24, 24, 2.5, 17, 24, 0])
+
+    def test_reversed_entries_are_skipped (self):
+        blocks = analysis.timing_block_data (self.timing_data ([
+            ((2020, 1, 1, 9), (2020, 1, 1, 10)),
+            ((2020, 1, 3, 9), (2020, 1, 1, 10)),
+            ((2020, 1, 5, 9), (2020, 1, 5, 8)),
+            ]))
+        self.assertEqual (len (blocks.verts), 1)
+        np.testing.assert_allclose (blocks.verts[0,:,1], [9, 10, 10, 9])
+
+    def test_raster (self):
+        analysis.block_raster_threshold = 2
+        blocks = analysis.timing_block_data (self.timing_data ([
+            ((2020, 1, 1, 22), (2020, 1, 3, 2, 30)),
+            ((2020, 1, 3, 1), (2020, 1, 3, 3)),
+            ((2020, 1, 3, 9), (2020, 1, 3, 9, 1)),
+            ]))
+        self.assertNotIn ('verts', blocks)
+        image = blocks.image
+        self.assertEqual (image.shape, (1440, 3))
+        # covered minutes, with the overlap counted once
+        self.assertEqual (image[:,0].sum (), 120)
+        self.assertEqual (image[:,1].sum (), 1440)
+        self.assertEqual (image[:,2].sum (), 180 + 1)
+        self.assertEqual (image[22 * 60 - 1, 0], 0)
+        self.assertEqual (image[22 * 60, 0], 1)
+        self.assertEqual (image[9 * 60, 2], 1)
+        day1 = mpl.dates.date2num (datetime.datetime (2020, 1, 1))
+        np.testing.assert_allclose (blocks.extent, (day1, day1 + 3, 0, 24))
+
+    def test_empty (self):
+        counting = manateelog.CountingActivity ('pushups', 'reps')
+        self.log.add_activity (counting)
+        blocks = analysis.counting_block_data (self.data (counting))
+        self.assertEqual (len (blocks.days), 0)
+        self.assertEqual (len (blocks.alphas), 0)
+        self.assertIsNone (blocks.ti)
+        blocks = analysis.timing_block_data (self.timing_data ([]))
+        self.assertEqual (blocks.verts.shape, (0, 4, 2))
+        self.assertIsNone (blocks.tf)
+
+
+if __name__ == '__main__':
+    unittest.main ()
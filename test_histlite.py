@@ -0,0 +1,625 @@
+# test_histlite.py
+
+from __future__ import division
+
+import datetime
+import os
+import shutil
+import tempfile
+import unittest
+
+import matplotlib as mpl
+import matplotlib.dates
+import numpy as np
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection
+from matplotlib.figure import Figure
+
+import histlite
+
+
+class TestLineArithmetic (unittest.TestCase):
+
+    def setUp (self):
+        self.a = histlite.Hist ([0, 1, 2], [5., 1.], [3., 1.])
+        self.b = histlite.Hist ([0, 1, 2], [1., 2.], [4., 2.])
+
+    def test_sub_errors_add_in_quadrature (self):
+        h = self.a - self.b
+        np.testing.assert_allclose (h.values, [4., -1.])
+        np.testing.assert_allclose (h.errors, [5., np.sqrt (5.)])
+
+    def test_sub_self (self):
+        h = self.a - self.a
+        np.testing.assert_allclose (h.values, [0., 0.])
+        np.testing.assert_allclose (h.errors, np.sqrt (2) * self.a.errors)
+
+    def test_isub_errors_add_in_quadrature (self):
+        h = self.a.copy ()
+        h -= self.b
+        np.testing.assert_allclose (h.values, [4., -1.])
+        np.testing.assert_allclose (h.errors, [5., np.sqrt (5.)])
+        # the operands are unchanged
+        np.testing.assert_allclose (self.a.errors, [3., 1.])
+
+    def test_isub_self (self):
+        h = self.a.copy ()
+        h -= h
+        np.testing.assert_allclose (h.values, [0., 0.])
+        np.testing.assert_allclose (h.errors, np.sqrt (2) * self.a.errors)
+
+    def test_iadd_matches_add (self):
+        h = self.a.copy ()
+        h += self.b
+        expected = self.a + self.b
+        np.testing.assert_allclose (h.values, expected.values)
+        np.testing.assert_allclose (h.errors, expected.errors)
+
+    def test_iadd_self (self):
+        h = self.a.copy ()
+        h += h
+        np.testing.assert_allclose (h.values, 2 * self.a.values)
+        np.testing.assert_allclose (h.errors, np.sqrt (2) * self.a.errors)
+
+    def test_sum_hists (self):
+        h = histlite.sum_hists ([self.a, self.b, self.a])
+        np.testing.assert_allclose (h.values, [11., 4.])
+        np.testing.assert_allclose (h.errors, np.sqrt ([34., 6.]))
+
+
+class TestWeekdayHists (unittest.TestCase):
+
+    def test_hour_weekday_empty (self):
+        h = histlite.hour_weekday_hist ([], [])
+        self.assertEqual (h.values.shape, (24, 7))
+        self.assertEqual (h.sum, 0)
+
+    def test_week_weekday_empty (self):
+        h = histlite.week_weekday_hist ([], [])
+        self.assertEqual (len (h.xbins), 0)
+        self.assertEqual (h.values.shape, (0, 7))
+        self.assertEqual (h.errors.shape, (0, 7))
+        self.assertEqual (h.sum, 0)
+
+    def test_week_weekday (self):
+        # 2020-01-06 was a Monday
+        dates = np.array (['2020-01-06', '2020-01-08', '2020-01-14'],
+                dtype='M8[D]')
+        h = histlite.week_weekday_hist (dates, [1., 2., 4.], [1., 1., 2.])
+        np.testing.assert_array_equal (
+                h.xbins, np.array (['2020-01-06', '2020-01-13', '2020-01-20'],
+                    dtype='M8[D]'))
+        self.assertEqual (h.values[0, 0], 1.)
+        self.assertEqual (h.values[0, 2], 2.)
+        self.assertEqual (h.values[1, 1], 4.)
+        self.assertEqual (h.sum, 7.)
+        self.assertEqual (h.errors[1, 1], 2.)
+
+
+class TestCaches (unittest.TestCase):
+
+    def setUp (self):
+        self.tmp = tempfile.mkdtemp ()
+        self.calls = []
+
+    def tearDown (self):
+        shutil.rmtree (self.tmp)
+
+    def square_hist (self, cache):
+        @histlite.cached (cache, lambda n: (n,))
+        def square (n):
+            self.calls.append (n)
+            return histlite.Hist ([0, 1], [n**2])
+        return square
+
+    def test_hist_cache_roundtrip (self):
+        cache = histlite.HistCache (os.path.join (self.tmp, 'a', 'b'))
+        square = self.square_hist (cache)
+        self.assertEqual (square (3).values[0], 9)
+        self.assertEqual (square (3).values[0], 9)
+        self.assertEqual (self.calls, [3])
+        cache.clear ()
+        square (3)
+        self.assertEqual (self.calls, [3, 3])
+
+    def test_hist_cache_unwritable (self):
+        # a directory inside a regular file can never be created
+        filename = os.path.join (self.tmp, 'file')
+        open (filename, 'w').close ()
+        cache = histlite.HistCache (os.path.join (filename, 'cache'))
+        square = self.square_hist (cache)
+        self.assertEqual (square (2).values[0], 4)
+        self.assertEqual (square (2).values[0], 4)
+        self.assertEqual (self.calls, [2, 2])
+
+    def test_makedirs_exists (self):
+        directory = os.path.join (self.tmp, 'd')
+        histlite.makedirs (directory)
+        histlite.makedirs (directory)
+        self.assertTrue (os.path.isdir (directory))
+
+    def test_lru_cache (self):
+        cache = histlite.LRUCache (2)
+        cache.put ('a', 1)
+        cache.put ('b', 2)
+        self.assertEqual (cache.get ('a'), 1)
+        cache.put ('c', 3)
+        self.assertEqual (cache.get ('b'), None)
+        self.assertEqual (cache.get ('a'), 1)
+        self.assertEqual (len (cache), 2)
+
+
+class TestBinner (unittest.TestCase):
+
+    def setUp (self):
+        rng = np.random.RandomState (0)
+        self.x = np.r_[rng.normal (size=1000), 0., 1., -1., np.nan]
+        self.w = np.r_[rng.uniform (size=1000), 1., 2., 3., 4.]
+
+    def check (self, binner, x, w):
+        h = binner.hist (x, w)
+        keep = np.isfinite (x)
+        kwargs = binner.kwargs
+        values, edges = np.histogram (x[keep], weights=w[keep], **kwargs)
+        sum_w2 = np.histogram (x[keep], weights=w[keep]**2, **kwargs)[0]
+        np.testing.assert_allclose (h.bins, edges)
+        np.testing.assert_allclose (h.values, values)
+        np.testing.assert_allclose (h.errors, np.sqrt (sum_w2))
+
+    def test_uniform_matches_numpy (self):
+        self.check (histlite.Binner (20, (-1, 1)), self.x, self.w)
+
+    def test_uniform_data_range_matches_numpy (self):
+        x = self.x[np.isfinite (self.x)]
+        self.check (histlite.Binner (13), x, self.w[:len (x)])
+
+    def test_edges_match_numpy (self):
+        self.check (histlite.Binner ([-2, -.5, 0, .1, 1, 3]), self.x, self.w)
+
+    def test_unit_weights (self):
+        h = histlite.Binner (4, (0, 4)).hist ([0, .5, 1, 3.5, 4, 5])
+        np.testing.assert_allclose (h.values, [2, 1, 0, 2])
+        np.testing.assert_allclose (h.errors, np.sqrt ([2, 1, 0, 2]))
+
+    def test_workers_match_serial (self):
+        binner = histlite.Binner (20, (-1, 1))
+        binner.min_parallel_size = 10
+        serial = binner.hist (self.x, self.w)
+        parallel = binner.hist (self.x, self.w, workers=3)
+        np.testing.assert_allclose (parallel.values, serial.values)
+        np.testing.assert_allclose (parallel.errors, serial.errors)
+
+
+class TestBinner2D (unittest.TestCase):
+
+    def setUp (self):
+        rng = np.random.RandomState (7)
+        self.x = np.r_[rng.normal (size=1000), 5., -5., np.nan, 0.]
+        self.y = np.r_[rng.uniform (0, 4, size=1000), 1., 1., 1., 9.]
+        self.w = rng.uniform (size=1004)
+        self.binner = histlite.Binner2D (
+                histlite.Binner (10, (-2, 2)), histlite.Binner (4, (0, 4)))
+
+    def check (self, h, w):
+        keep = np.isfinite (self.x)
+        kwargs = dict (bins=(10, 4), range=((-2, 2), (0, 4)))
+        values, xedges, yedges = np.histogram2d (
+                self.x[keep], self.y[keep], weights=w[keep], **kwargs)
+        sum_w2 = np.histogram2d (self.x[keep], self.y[keep],
+                weights=w[keep]**2, **kwargs)[0]
+        np.testing.assert_allclose (h.xbins, xedges)
+        np.testing.assert_allclose (h.ybins, yedges)
+        np.testing.assert_allclose (h.values, values)
+        np.testing.assert_allclose (h.errors, np.sqrt (sum_w2))
+
+    def test_matches_numpy (self):
+        self.check (self.binner.hist (self.x, self.y), np.ones (1004))
+
+    def test_weights_match_numpy (self):
+        self.check (self.binner.hist (self.x, self.y, self.w), self.w)
+
+    def test_out_of_range_dropped (self):
+        h = self.binner.hist ([5., -5., 0., 0., 1.], [1., 1., 9., -1., 4.])
+        self.assertEqual (h.sum, 1)
+        self.assertEqual (h.values[7, 3], 1)
+
+
+class TestHist2D (unittest.TestCase):
+
+    def setUp (self):
+        rng = np.random.RandomState (8)
+        self.values = rng.uniform (size=(6, 4))
+        self.errors = rng.uniform (size=(6, 4))
+        self.h = histlite.Hist2D (np.arange (7.), np.arange (5.),
+                self.values, self.errors)
+
+    def test_add (self):
+        other = histlite.Hist2D (self.h.xbins, self.h.ybins,
+                np.ones ((6, 4)), np.ones ((6, 4)))
+        h = self.h + other
+        np.testing.assert_allclose (h.values, self.values + 1)
+        np.testing.assert_allclose (h.errors, np.sqrt (self.errors**2 + 1))
+        np.testing.assert_allclose (self.h.values, self.values)
+        with self.assertRaises (AssertionError):
+            self.h + histlite.Hist2D (np.arange (7.), np.arange (4.),
+                    np.ones ((6, 3)))
+
+    def test_project (self):
+        hx = self.h.project (1)
+        np.testing.assert_allclose (hx.bins, self.h.xbins)
+        np.testing.assert_allclose (hx.values, self.values.sum (axis=1))
+        np.testing.assert_allclose (hx.errors,
+                np.sqrt ((self.errors**2).sum (axis=1)))
+        hy = self.h.project (0)
+        np.testing.assert_allclose (hy.bins, self.h.ybins)
+        np.testing.assert_allclose (hy.values, self.values.sum (axis=0))
+        self.assertAlmostEqual (hx.sum, self.h.sum)
+        self.assertAlmostEqual (hy.sum, self.h.sum)
+
+    def test_rebin_x (self):
+        h = self.h.rebin (4)
+        np.testing.assert_allclose (h.xbins, [0, 4, 6])
+        np.testing.assert_allclose (h.ybins, self.h.ybins)
+        np.testing.assert_allclose (h.values,
+                [self.values[:4].sum (axis=0), self.values[4:].sum (axis=0)])
+        np.testing.assert_allclose (h.errors[1],
+                np.sqrt ((self.errors[4:]**2).sum (axis=0)))
+
+    def test_rebin_y (self):
+        h = self.h.rebin (ybins=[1, 3, 4])
+        np.testing.assert_allclose (h.xbins, self.h.xbins)
+        np.testing.assert_allclose (h.ybins, [1, 3, 4])
+        np.testing.assert_allclose (h.values[:,0],
+                self.values[:,1:3].sum (axis=1))
+        np.testing.assert_allclose (h.values[:,1], self.values[:,3])
+        with self.assertRaises (ValueError):
+            self.h.rebin (ybins=[0, 1.5])
+
+    def test_rebin_both (self):
+        h = self.h.rebin (2, 2)
+        self.assertEqual (h.values.shape, (3, 2))
+        self.assertAlmostEqual (h.sum, self.h.sum)
+        np.testing.assert_allclose (h.project (0).values,
+                self.h.project (0).rebin (2).values)
+
+
+class TestAccumulator (unittest.TestCase):
+
+    def setUp (self):
+        rng = np.random.RandomState (1)
+        self.x = rng.normal (size=500)
+        self.w = rng.uniform (size=500)
+        self.binner = histlite.Binner (10, (-2, 2))
+
+    def test_chunks_match_one_fill (self):
+        expected = self.binner.hist (self.x, self.w)
+        acc = self.binner.accumulator ()
+        for i in range (0, 500, 120):
+            acc.fill (self.x[i:i+120], self.w[i:i+120])
+        h = acc.hist ()
+        np.testing.assert_allclose (h.bins, expected.bins)
+        np.testing.assert_allclose (h.values, expected.values)
+        np.testing.assert_allclose (h.errors, expected.errors)
+
+    def test_merge (self):
+        expected = self.binner.hist (self.x, self.w)
+        a = self.binner.accumulator ().fill (self.x[:200], self.w[:200])
+        b = self.binner.accumulator ().fill (self.x[200:], self.w[200:])
+        h = a.merge (b).hist ()
+        np.testing.assert_allclose (h.values, expected.values)
+        np.testing.assert_allclose (h.errors, expected.errors)
+
+    def test_hist_is_a_copy (self):
+        acc = self.binner.accumulator ().fill (self.x)
+        h = acc.hist ()
+        acc.fill (self.x)
+        np.testing.assert_allclose (2 * h.values, acc.hist ().values)
+
+    def test_requires_fixed_bins (self):
+        with self.assertRaises (ValueError):
+            histlite.Binner (10).accumulator ()
+
+
+class TestCalendarBinner (unittest.TestCase):
+
+    def edges (self, unit, n, ti, tf):
+        binner = histlite.CalendarBinner (unit, n, range=(ti, tf))
+        return binner.edges ().astype ('M8[D]').astype (str).tolist ()
+
+    def test_days (self):
+        self.assertEqual (
+                self.edges ('day', 2, '2020-01-01T12', '2020-01-04T23:59'),
+                ['2020-01-01', '2020-01-03', '2020-01-05'])
+
+    def test_weeks_start_on_monday (self):
+        # 2020-01-01 was a Wednesday
+        self.assertEqual (
+                self.edges ('week', 1, '2020-01-01', '2020-01-06'),
+                ['2019-12-30', '2020-01-06', '2020-01-13'])
+
+    def test_months (self):
+        self.assertEqual (
+                self.edges ('month', 1, '2020-01-31', '2020-03-01'),
+                ['2020-01-01', '2020-02-01', '2020-03-01', '2020-04-01'])
+
+    def test_quarters_are_aligned (self):
+        self.assertEqual (
+                self.edges ('quarter', 1, '2020-05-15', '2020-07-01'),
+                ['2020-04-01', '2020-07-01', '2020-10-01'])
+
+    def test_years (self):
+        self.assertEqual (
+                self.edges ('year', 2, '2019-06-01', '2021-01-01'),
+                ['2019-01-01', '2021-01-01', '2023-01-01'])
+
+    def test_bins_exclude_right_edge (self):
+        binner = histlite.CalendarBinner ('day', range=(
+            datetime.datetime (2020, 1, 1), datetime.datetime (2020, 1, 2)))
+        h = binner.hist ([
+            datetime.datetime (2020, 1, 1),
+            datetime.datetime (2020, 1, 1, 23, 59, 59),
+            datetime.datetime (2020, 1, 2),
+            datetime.datetime (2020, 1, 3)])
+        np.testing.assert_allclose (h.values, [2, 1])
+
+    def test_range_from_data (self):
+        binner = histlite.CalendarBinner ('month')
+        h = binner.hist (np.array (['2020-01-15', '2020-03-02'], dtype='M8[D]'))
+        np.testing.assert_allclose (h.values, [1, 0, 1])
+
+    def test_invalid (self):
+        with self.assertRaises (ValueError):
+            histlite.CalendarBinner ('fortnight')
+        with self.assertRaises (ValueError):
+            histlite.CalendarBinner ('day', 0)
+        with self.assertRaises (ValueError):
+            histlite.CalendarBinner ('day').edges ()
+
+
+class TestRebin (unittest.TestCase):
+
+    def setUp (self):
+        self.h = histlite.Hist (
+                [0, 1, 2, 3, 4, 5], [1., 2., 3., 4., 5.], [1., 2., 2., 1., 3.])
+
+    def test_factor (self):
+        h = self.h.rebin (2)
+        np.testing.assert_allclose (h.bins, [0, 2, 4, 5])
+        np.testing.assert_allclose (h.values, [3., 7., 5.])
+        np.testing.assert_allclose (h.errors, np.sqrt ([5., 5., 9.]))
+
+    def test_factor_one_is_a_copy (self):
+        h = self.h.rebin (1)
+        np.testing.assert_allclose (h.values, self.h.values)
+        np.testing.assert_allclose (h.errors, self.h.errors)
+
+    def test_edges (self):
+        h = self.h.rebin ([1, 4, 5])
+        np.testing.assert_allclose (h.bins, [1, 4, 5])
+        np.testing.assert_allclose (h.values, [9., 5.])
+        np.testing.assert_allclose (h.errors, np.sqrt ([9., 9.]))
+
+    def test_preserves_sum (self):
+        self.assertAlmostEqual (self.h.rebin (3).sum, self.h.sum)
+
+    def test_invalid (self):
+        with self.assertRaises (ValueError):
+            self.h.rebin (0)
+        with self.assertRaises (ValueError):
+            self.h.rebin ([0, 2.5, 5])
+        with self.assertRaises (ValueError):
+            self.h.rebin ([3, 1])
+        with self.assertRaises (ValueError):
+            self.h.rebin ([0, 6])
+
+
+class TestIntervalOverlap (unittest.TestCase):
+
+    def loop_overlap (self, starts, ends, edges):
+        out = np.zeros (len (edges) - 1)
+        for s, e in zip (starts, ends):
+            for i in range (len (edges) - 1):
+                out[i] += max (0, min (e, edges[i+1]) - max (s, edges[i]))
+        return out
+
+    def test_matches_loop (self):
+        rng = np.random.RandomState (2)
+        starts = rng.uniform (-2, 12, size=300)
+        ends = starts + rng.exponential (2, size=300)
+        edges = np.r_[0, np.sort (rng.uniform (0, 10, size=15)), 10]
+        np.testing.assert_allclose (
+                histlite.interval_overlap (starts, ends, edges),
+                self.loop_overlap (starts, ends, edges))
+
+    def test_edge_cases (self):
+        edges = [0., 1., 2., 3.]
+        starts = [0., 1., 2.5, -1., 3., 1.5, .5]
+        ends = [1., 1., 3., 4., 5., 1.2, 2.5]
+        np.testing.assert_allclose (
+                histlite.interval_overlap (starts, ends, edges),
+                [1.5 + 1, 1 + 1, .5 + 1 + .5])
+
+    def test_empty (self):
+        np.testing.assert_allclose (
+                histlite.interval_overlap ([], [], [0, 1, 2]), [0, 0])
+
+    def test_times_in_hours (self):
+        edges = np.array (['2020-01-01', '2020-01-02', '2020-01-03'],
+                dtype='M8[D]')
+        starts = [datetime.datetime (2020, 1, 1, 22)]
+        ends = [datetime.datetime (2020, 1, 2, 1, 30)]
+        np.testing.assert_allclose (
+                histlite.interval_overlap (starts, ends, edges), [2, 1.5])
+        np.testing.assert_allclose (
+                histlite.interval_overlap (starts, ends, edges, unit='m'),
+                [120, 90])
+
+
+class TestPlotterCollections (unittest.TestCase):
+
+    def setUp (self):
+        figure = Figure ()
+        FigureCanvasAgg (figure)
+        self.axes = figure.add_subplot (111)
+        self.bins = np.arange ('2020-01-01', '2020-01-11', dtype='M8[D]')
+
+    def hist (self, values):
+        values = np.asarray (values, dtype=float)
+        return histlite.Hist (self.bins, values, np.ones_like (values))
+
+    def plot (self, *values):
+        plotter = histlite.Plotter (self.axes, collections=True)
+        plotter.add (self.hist (values[0]), errorbars=True)
+        plotter.add (self.hist (values[1]), ls='dashed')
+        plotter.add (self.hist (values[2]), twin=True, errorbars=True)
+        plotter.finish ()
+        return plotter
+
+    def test_one_collection_per_group (self):
+        y = np.arange (9.)
+        plotter = self.plot (y, 2 * y, 3 * y)
+        for axes, n_bars in ((self.axes, 9), (plotter.twin_axes, 9)):
+            self.assertEqual (axes.lines, [])
+            steps, bars = axes.collections
+            self.assertIsInstance (steps, LineCollection)
+            self.assertEqual (len (bars.get_segments ()), n_bars)
+        steps = self.axes.collections[0]
+        self.assertEqual (len (steps.get_segments ()), 2)
+        solid, dashed = [ls for (offset, ls) in steps.get_linestyles ()]
+        self.assertIsNone (solid)
+        self.assertTrue (dashed)
+        self.assertEqual (len (plotter.mpl_lines), 3)
+        # datetime bins are plotted as date numbers on a date axis
+        day1 = mpl.dates.date2num (datetime.datetime (2020, 1, 1))
+        segment = steps.get_segments ()[0]
+        np.testing.assert_allclose (segment[[0, -1],0], day1 + np.r_[0, 9])
+        np.testing.assert_allclose (segment[:,1], np.repeat (y, 2))
+        self.assertIsInstance (self.axes.xaxis.converter,
+                mpl.dates.DateConverter)
+        self.axes.figure.canvas.draw ()
+
+    def test_update_keeps_artists (self):
+        y = np.arange (9.)
+        plotter = self.plot (y, y, y)
+        collections = list (self.axes.collections)
+        twin_collections = list (plotter.twin_axes.collections)
+        plotter.update ([self.hist (y[::-1])] * 3)
+        self.assertEqual (self.axes.collections, collections)
+        self.assertEqual (plotter.twin_axes.collections, twin_collections)
+        self.assertEqual (self.axes.lines, [])
+        self.assertEqual (len (self.axes.figure.axes), 2)
+        for segment in self.axes.collections[0].get_segments ():
+            np.testing.assert_allclose (segment[:,1], np.repeat (y[::-1], 2))
+
+    def test_update_data (self):
+        y = np.arange (9.)
+        plotter = self.plot (y, y, y)
+        steps, bars = self.axes.collections
+        new = histlite.Hist (self.bins, 10 * y, 2 * np.ones (9))
+        plotter.update ([new, self.hist (y), self.hist (y)])
+        self.assertIs (self.axes.collections[0], steps)
+        self.assertIs (self.axes.collections[1], bars)
+        np.testing.assert_allclose (steps.get_segments ()[0][:,1],
+                np.repeat (10 * y, 2))
+        np.testing.assert_allclose (steps.get_segments ()[1][:,1],
+                np.repeat (y, 2))
+        np.testing.assert_allclose (
+                [segment[:,1] for segment in bars.get_segments ()],
+                np.c_[10 * y - 2, 10 * y + 2])
+        # the view follows the new data
+        self.assertTrue (self.axes.get_ylim ()[1] >= 82)
+
+    def test_update_requires_collections (self):
+        y = np.arange (9.)
+        line = histlite.Hist (np.arange (10.), y, np.ones (9))
+        plotter = histlite.Plotter (self.axes)
+        plotter.add (line)
+        plotter.finish ()
+        with self.assertRaises (ValueError):
+            plotter.update ([line])
+        plotter = self.plot (y, y, y)
+        with self.assertRaises (ValueError):
+            plotter.update ([self.hist (y)])
+
+
+class TestMinmaxDecimate (unittest.TestCase):
+
+    def setUp (self):
+        rng = np.random.RandomState (6)
+        self.bins = np.arange (1001.)
+        self.x = self.bins[:-1] + .5
+        self.y = rng.normal (size=1000)
+        self.yerr = rng.uniform (0, 1, size=1000)
+
+    def test_short_line_unchanged (self):
+        step, bars = histlite.minmax_decimate (
+                self.bins[:4], self.x[:3], self.y[:3], None, 10)
+        np.testing.assert_allclose (step[:,0], [0, 1, 1, 2, 2, 3])
+        np.testing.assert_allclose (step[:,1], np.repeat (self.y[:3], 2))
+        self.assertIsNone (bars)
+
+    def test_keeps_min_max_and_endpoints (self):
+        step, bars = histlite.minmax_decimate (
+                self.bins, self.x, self.y, self.yerr, 7)
+        self.assertEqual (len (step), 2 * 7 + 2)
+        np.testing.assert_allclose (step[0], [0, self.y[0]])
+        np.testing.assert_allclose (step[-1], [1000, self.y[-1]])
+        self.assertTrue (np.all (np.diff (step[:,0]) >= 0))
+        edges = np.linspace (0, 1000, 8).astype (int)
+        for i, (i1, i2) in enumerate (zip (edges[:-1], edges[1:])):
+            y, yerr = self.y[i1:i2], self.yerr[i1:i2]
+            self.assertEqual (step[1 + 2*i,1], y.min ())
+            self.assertEqual (step[2 + 2*i,1], y.max ())
+            np.testing.assert_allclose (bars[i,:,1],
+                    [(y - yerr).min (), (y + yerr).max ()])
+
+    def test_xlim (self):
+        step, bars = histlite.minmax_decimate (
+                self.bins, self.x, self.y, None, 5, xlim=(100.5, 300.2))
+        self.assertTrue (step[0,0] <= 100 and step[-1,0] >= 301)
+        self.assertTrue (step[-1,0] < 310)
+        visible = self.y[100:301]
+        self.assertTrue (step[1:-1,1].min () <= visible.min ())
+        self.assertTrue (step[1:-1,1].max () >= visible.max ())
+
+    def test_requires_collections (self):
+        with self.assertRaises (ValueError):
+            histlite.Plotter (None, decimate=True)
+
+
+class TestBinCenters (unittest.TestCase):
+
+    def test_floats (self):
+        h = histlite.Hist ([0., 1., 3., 7.], [1., 1., 1.])
+        np.testing.assert_allclose (h.bin_centers, [.5, 2, 5])
+
+    def test_datetime64 (self):
+        bins = np.array (['2020-01-01', '2020-01-02', '2020-01-04'],
+                dtype='M8[D]')
+        h = histlite.Hist (bins, [1., 1.])
+        self.assertEqual (h.bin_centers.dtype, np.dtype ('M8[us]'))
+        self.assertEqual (list (h.bin_centers.astype (object)), [
+            datetime.datetime (2020, 1, 1, 12), datetime.datetime (2020, 1, 3)])
+
+    def test_datetime_objects (self):
+        bins = [datetime.datetime (2020, 1, 1), datetime.datetime (2020, 1, 2),
+                datetime.datetime (2020, 1, 2, 1, 0, 1)]
+        h = histlite.Hist (bins, [1., 1.])
+        self.assertEqual (h.bin_centers.dtype, np.dtype (object))
+        self.assertEqual (list (h.bin_centers), [
+            datetime.datetime (2020, 1, 1, 12),
+            datetime.datetime (2020, 1, 2, 0, 30, 0, 500000)])
+
+    def test_cache (self):
+        h = histlite.Hist ([0., 1., 2.], [1., 1.])
+        centers = h.bin_centers
+        with self.assertRaises (ValueError):
+            centers[0] = 5
+        self.assertIs (h.bin_centers.base, centers.base)
+        h.bins = [0., 2., 4.]
+        np.testing.assert_allclose (h.bin_centers, [1, 3])
+        np.testing.assert_allclose (centers, [.5, 1.5])
+
+
+if __name__ == '__main__':
+    unittest.main ()
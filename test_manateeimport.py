@@ -0,0 +1,172 @@
+# test_manateeimport.py
+
+from __future__ import division
+
+import datetime
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+import manateeimport
+from manateelog import CountingActivity, TimingActivity, TimingEntry, Log
+
+
+class ImportTestCase (unittest.TestCase):
+
+    def setUp (self):
+        self.directory = tempfile.mkdtemp ()
+        self.log = Log ()
+        self.pushups = CountingActivity ('pushups', 'reps')
+        self.work = TimingActivity ('work')
+        self.log.add_activity (self.pushups)
+        self.log.add_activity (self.work)
+        self.calls = []
+        self.log.add_listener (self.calls.append)
+
+    def tearDown (self):
+        shutil.rmtree (self.directory)
+
+    def write (self, name, text):
+        filename = os.path.join (self.directory, name)
+        with open (filename, 'wt') as f:
+            f.write (text)
+        return filename
+
+
+class TestRegistry (unittest.TestCase):
+
+    def test_get_importer (self):
+        self.assertIs (manateeimport.get_importer ('timerecording'),
+                manateeimport.TimeRecordingImporter)
+        self.assertIs (manateeimport.get_importer ('csv'),
+                manateeimport.CsvImporter)
+        self.assertIs (manateeimport.get_importer ('jsonl'),
+                manateeimport.JsonLinesImporter)
+
+    def test_unknown (self):
+        with self.assertRaises (ValueError):
+            manateeimport.get_importer ('nope')
+
+
+class TestTimeRecordingImporter (ImportTestCase):
+
+    def test_import (self):
+        self.log.add_entry (TimingEntry (self.work,
+            datetime.datetime (2020, 1, 6, 9, 0),
+            datetime.datetime (2020, 1, 6, 10, 0)))
+        filename = self.write ('export.csv', '\n'.join ([
+            'Date,Day,Start,End,Duration,Task,Note',
+            # overlaps the existing entry
+            '01/06/2020,Mon,09:30,11:00,01:30,work,',
+            '01/06/2020,Mon,11:00,12:00,01:00,work,',
+            # overlaps the line before
+            '01/06/2020,Mon,11:30,11:45,00:15,work,',
+            '01/06/2020,Mon,11:00 pm,01:00 am,02:00,work,',
+            '01/07/2020,Tue,09:00,10:00,01:00,play,',
+            ]))
+        importer = manateeimport.TimeRecordingImporter (filename, self.log)
+        self.assertEqual (importer.do_import (), 2)
+        times = [(entry.start_time, entry.end_time)
+                for entry in self.log.entries[self.work]]
+        self.assertEqual (times, [
+            (datetime.datetime (2020, 1, 6, 9, 0),
+                datetime.datetime (2020, 1, 6, 10, 0)),
+            (datetime.datetime (2020, 1, 6, 11, 0),
+                datetime.datetime (2020, 1, 6, 12, 0)),
+            (datetime.datetime (2020, 1, 6, 23, 0),
+                datetime.datetime (2020, 1, 7, 1, 0)),
+            ])
+
+    def test_default_activity (self):
+        filename = self.write ('export.csv',
+                '01/06/2020,Mon,09:00,10:00,01:00,,\n')
+        importer = manateeimport.TimeRecordingImporter (
+                filename, self.log, default='work')
+        self.assertEqual (importer.do_import (), 1)
+
+
+class TestRecordImporters (ImportTestCase):
+
+    def check_log (self):
+        pushups = self.log.entries[self.pushups]
+        self.assertEqual ([(entry.date, entry.n, entry.error, entry.note)
+            for entry in pushups], [
+                (datetime.date (2020, 1, 1), 5., 1., ''),
+                (datetime.date (2020, 1, 2), 10., 0., 'easy'),
+                ])
+        work = self.log.entries[self.work]
+        self.assertEqual ([(entry.start_time, entry.end_time)
+            for entry in work], [
+                (datetime.datetime (2020, 1, 1, 9),
+                    datetime.datetime (2020, 1, 1, 17, 30)),
+                ])
+
+    def test_csv (self):
+        filename = self.write ('entries.csv', '\n'.join ([
+            'what,date,n,error,note,start_time,end_time',
+            'pushups,2020-01-02,10,,easy,,',
+            'work,,,,,2020-01-01 09:00:00,2020-01-01 17:30:00',
+            'pushups,2020-01-01,5,1,,,',
+            ]))
+        importer = manateeimport.CsvImporter (
+                filename, self.log, columns=dict (activity='what'))
+        self.assertEqual (importer.do_import (), 3)
+        self.check_log ()
+
+    def test_jsonl (self):
+        records = [
+                dict (activity='pushups', date='01/02/2020', n=10,
+                    note='easy'),
+                dict (activity='work', start_time='2020-01-01 09:00:00',
+                    end_time='2020-01-01 17:30:00'),
+                dict (activity='pushups', date='01/01/2020', n=5, error=1),
+                ]
+        filename = self.write ('entries.jsonl', '\n'.join (
+            json.dumps (record) for record in records))
+        importer = manateeimport.JsonLinesImporter (
+                filename, self.log, date_format='%m/%d/%Y')
+        self.assertEqual (importer.do_import (), 3)
+        self.check_log ()
+
+    def test_default_activity (self):
+        filename = self.write ('entries.jsonl',
+                '{"date": "2020-01-01", "n": 1}\n\n')
+        importer = manateeimport.JsonLinesImporter (
+                filename, self.log, activity_name='pushups')
+        self.assertEqual (importer.do_import (), 1)
+        self.assertEqual (len (self.log.entries[self.pushups]), 1)
+
+    def test_missing_n (self):
+        filename = self.write ('entries.csv', '\n'.join ([
+            'activity,date,n',
+            'pushups,2020-01-01,5',
+            'pushups,2020-01-02,',
+            ]))
+        importer = manateeimport.CsvImporter (filename, self.log)
+        with self.assertRaisesRegexp (ValueError, 'record 2 .*2020-01-02'):
+            importer.do_import ()
+        filename = self.write ('entries.jsonl',
+                '{"activity": "pushups", "date": "2020-01-01"}\n')
+        importer = manateeimport.JsonLinesImporter (filename, self.log)
+        with self.assertRaisesRegexp (ValueError, 'record 1 .*"pushups"'):
+            importer.do_import ()
+
+    def test_batches_notify_once (self):
+        filename = self.write ('entries.jsonl', '\n'.join (
+            json.dumps (dict (activity='pushups',
+                date='2020-01-{0:02d}'.format (i), n=i))
+            for i in range (1, 11)))
+        importer = manateeimport.JsonLinesImporter (filename, self.log)
+        importer.batch_size = 3
+        self.assertEqual ([len (batch) for batch in importer.batches ()],
+                [3, 3, 3, 1])
+        self.assertEqual (importer.do_import (), 10)
+        self.assertEqual (len (self.calls), 1)
+        dates = [entry.date for entry in self.log.entries[self.pushups]]
+        self.assertEqual (dates, sorted (dates))
+
+
+if __name__ == '__main__':
+    unittest.main ()
@@ -0,0 +1,170 @@
+# test_manateelog.py
+
+from __future__ import division
+
+import datetime
+import unittest
+
+import manateelog
+from manateelog import CountingActivity, CountingEntry, Log
+
+
+def day (i):
+    return datetime.date (2020, 1, 1) + datetime.timedelta (days=i)
+
+
+class TestBulkAdd (unittest.TestCase):
+
+    def setUp (self):
+        self.log = Log ()
+        self.pushups = CountingActivity ('pushups', 'reps')
+        self.situps = CountingActivity ('situps', 'reps')
+        self.log.add_activity (self.pushups)
+        self.log.add_activity (self.situps)
+
+    def test_merge_sorted (self):
+        key = lambda x: x[0]
+        a = [(1, 'a'), (3, 'a'), (3, 'a'), (7, 'a')]
+        b = [(0, 'b'), (3, 'b'), (8, 'b')]
+        self.assertEqual (manateelog.merge_sorted (a, b, key), [
+            (0, 'b'), (1, 'a'), (3, 'a'), (3, 'a'), (3, 'b'), (7, 'a'),
+            (8, 'b')])
+        self.assertEqual (manateelog.merge_sorted ([], b, key), b)
+        self.assertEqual (manateelog.merge_sorted (a, [], key), a)
+
+    def test_matches_add_entry (self):
+        old = [CountingEntry (self.pushups, day (i), i) for i in (0, 4, 8)]
+        new = [CountingEntry (self.pushups, day (i), 10 + i)
+                for i in (9, 4, 1, 5)]
+        new.append (CountingEntry (self.situps, day (2), 1))
+        for entry in old:
+            self.log.add_entry (entry)
+        expected = Log ()
+        for entry in old + new:
+            expected.add_entry (entry)
+        self.assertEqual (self.log.bulk_add (iter (new)), len (new))
+        for activity in (self.pushups, self.situps):
+            self.assertEqual (
+                    [id (entry) for entry in self.log.entries[activity]],
+                    [id (entry) for entry in expected.entries[activity]])
+
+    def test_adds_activities (self):
+        curls = CountingActivity ('curls', 'reps')
+        self.log.bulk_add ([CountingEntry (curls, day (0), 1)])
+        self.assertIn (curls, self.log.counting_activities)
+        self.assertEqual (len (self.log.entries[curls]), 1)
+
+    def test_one_listener_call (self):
+        calls = []
+        self.log.add_listener (calls.append)
+        self.log.bulk_add ([CountingEntry (self.pushups, day (i), i)
+            for i in range (5)])
+        self.assertEqual (len (calls), 1)
+        self.assertEqual ([event.kind for event in calls[0]],
+                ['entries-added'])
+        self.assertEqual (len (calls[0][0].entries), 5)
+        self.assertEqual (calls[0][0].date_range, (day (0), day (4)))
+
+
+class TestLogEvents (unittest.TestCase):
+
+    def setUp (self):
+        self.log = Log ()
+        self.pushups = CountingActivity ('pushups', 'reps')
+        self.log.add_activity (self.pushups)
+        self.calls = []
+        self.log.add_listener (self.calls.append)
+
+    def kinds (self):
+        return [[event.kind for event in events] for events in self.calls]
+
+    def test_entry_events (self):
+        entry = CountingEntry (self.pushups, day (3), 1)
+        self.log.add_entry (entry)
+        self.log.update_entry (entry, date=day (5), n=2)
+        self.log.remove_entry (entry)
+        self.assertEqual (self.kinds (), [['entries-added'],
+            ['entries-updated'], ['entries-removed']])
+        self.assertEqual ([events[0].entry_ids for events in self.calls],
+                [[id (entry)]] * 3)
+        # updates cover the old and new dates
+        self.assertEqual (self.calls[1][0].date_range, (day (3), day (5)))
+        self.assertEqual (self.calls[2][0].date_range, (day (5), day (5)))
+
+    def test_activity_events (self):
+        situps = CountingActivity ('situps', 'reps')
+        self.log.add_activity (situps)
+        # adding an activity twice is not a change
+        self.log.add_activity (situps)
+        self.log.rename_activity (situps, 'crunches')
+        self.log.change_units ('crunches', 'sets', .1)
+        self.log.remove_activity (situps)
+        self.assertEqual (self.kinds (), [['activity-added'],
+            ['activity-renamed'], ['units-changed'], ['activity-removed']])
+        self.assertTrue (all (events[0].activity is situps
+            for events in self.calls))
+        self.assertEqual (situps.name, 'crunches')
+
+    def test_batch (self):
+        entries = [CountingEntry (self.pushups, day (i), i)
+                for i in range (3)]
+        with self.log.batch ():
+            for entry in entries:
+                self.log.add_entry (entry)
+            with self.log.batch ():
+                self.log.remove_entry (entries[0])
+            self.assertEqual (self.calls, [])
+        self.assertEqual (self.kinds (), [['entries-added'] * 3
+            + ['entries-removed']])
+
+    def test_batch_delivers_on_error (self):
+        try:
+            with self.log.batch ():
+                self.log.add_entry (CountingEntry (self.pushups, day (0), 1))
+                raise RuntimeError ()
+        except RuntimeError:
+            pass
+        self.assertEqual (self.kinds (), [['entries-added']])
+        self.log.add_entry (CountingEntry (self.pushups, day (1), 1))
+        self.assertEqual (len (self.calls), 2)
+
+    def test_versions (self):
+        v0 = self.log.version (self.pushups)
+        with self.log.batch ():
+            entry = self.log.create_entry ('pushups', day (0), 1)
+            v1 = self.log.version (self.pushups)
+            self.log.changed (self.pushups, [entry])
+            v2 = self.log.version (self.pushups)
+        self.assertTrue (v0 < v1 < v2)
+        self.assertEqual (self.log.version (CountingActivity ('x')), 0)
+
+    def test_versions_not_reused (self):
+        self.log.create_entry ('pushups', day (0), 1)
+        before = self.log.version (self.pushups)
+        self.log.remove_activity (self.pushups)
+        self.assertNotIn (self.pushups, self.log.versions)
+        self.assertEqual (self.log.version (self.pushups), 0)
+        self.log.add_activity (self.pushups)
+        self.assertTrue (self.log.version (self.pushups) > before)
+        other = Log ()
+        other.add_activity (self.pushups)
+        self.assertNotEqual (other.version (self.pushups),
+                self.log.version (self.pushups))
+
+    def test_remove_listener (self):
+        self.log.remove_listener (self.calls.append)
+        self.log.add_entry (CountingEntry (self.pushups, day (0), 1))
+        self.assertEqual (self.calls, [])
+
+    def test_remove_missing_entry (self):
+        with self.assertRaises (ValueError):
+            self.log.remove_entry (CountingEntry (self.pushups, day (0), 1))
+        self.assertEqual (self.calls, [])
+
+    def test_unknown_kind (self):
+        with self.assertRaises (ValueError):
+            manateelog.LogEvent ('entries-moved', self.pushups)
+
+
+if __name__ == '__main__':
+    unittest.main ()
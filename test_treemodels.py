@@ -0,0 +1,160 @@
+# test_treemodels.py
+
+from __future__ import division
+
+import datetime
+import random
+import unittest
+
+from manateelog import CountingActivity, CountingEntry, Log
+
+try:
+    import treemodels
+except ImportError:
+    treemodels = None
+
+
+def day (i):
+    return datetime.date (2020, 1, 1) + datetime.timedelta (days=i)
+
+
+if treemodels is not None:
+
+    class RecordingModel (treemodels.CountingEntriesModel):
+
+        """A CountingEntriesModel that replays its row signals onto a copy
+        of its rows, as a view would."""
+
+        def __init__ (self, log, activity_name):
+            treemodels.CountingEntriesModel.__init__ (self, log, activity_name)
+            self.signals = []
+            self.view = [id (row) for row in self.rows]
+
+        def row_deleted (self, path):
+            self.signals.append (('deleted', path[0]))
+            del self.view[path[0]]
+            treemodels.CountingEntriesModel.row_deleted (self, path)
+
+        def rows_reordered (self, path, iter, new_order):
+            self.signals.append (('reordered', tuple (new_order)))
+            assert sorted (new_order) == range (len (self.view))
+            self.view = [self.view[i] for i in new_order]
+            treemodels.CountingEntriesModel.rows_reordered (
+                    self, path, iter, new_order)
+
+        def row_inserted (self, path, iter):
+            self.signals.append (('inserted', path[0]))
+            self.view.insert (path[0], id (self.rows[path[0]]))
+            treemodels.CountingEntriesModel.row_inserted (self, path, iter)
+
+        def row_changed (self, path, iter):
+            self.signals.append (('changed', path[0]))
+            assert path[0] < len (self.view)
+            treemodels.CountingEntriesModel.row_changed (self, path, iter)
+
+
+@unittest.skipIf (treemodels is None, 'requires pygtk')
+class TestLogListModelSync (unittest.TestCase):
+
+    def setUp (self):
+        self.log = Log ()
+        self.activity = CountingActivity ('pushups', 'reps')
+        self.entries = [CountingEntry (self.activity, day (2 * i), i)
+                for i in range (10)]
+        self.log.bulk_add (self.entries)
+        self.model = RecordingModel (self.log, 'pushups')
+
+    def check_view (self):
+        self.assertEqual (self.model.view,
+                [id (entry) for entry in self.log.entries[self.activity]])
+
+    def test_add (self):
+        self.log.add_entry (CountingEntry (self.activity, day (5), 0))
+        self.assertEqual (self.model.signals,
+                [('inserted', 3), ('changed', 3)])
+        self.check_view ()
+
+    def test_remove (self):
+        self.log.remove_entry (self.entries[4])
+        self.assertEqual (self.model.signals, [('deleted', 4)])
+        self.check_view ()
+
+    def test_update_in_place (self):
+        self.log.update_entry (self.entries[6], note='easy')
+        self.assertEqual (self.model.signals, [('changed', 6)])
+        self.check_view ()
+
+    def test_update_moves_row (self):
+        self.log.update_entry (self.entries[1], date=day (9))
+        self.assertEqual (self.model.signals, [
+            ('reordered', (0, 2, 3, 4, 1, 5, 6, 7, 8, 9)), ('changed', 4)])
+        self.check_view ()
+
+    def test_signal_order (self):
+        with self.log.batch ():
+            self.log.remove_entry (self.entries[2])
+            self.log.update_entry (self.entries[7], date=day (1))
+            self.log.add_entry (CountingEntry (self.activity, day (11), 0))
+        kinds = [kind for (kind, arg) in self.model.signals]
+        rank = dict (deleted=0, reordered=1, inserted=2, changed=3)
+        self.assertEqual (kinds, sorted (kinds, key=rank.get))
+        self.assertEqual (kinds.count ('reordered'), 1)
+        self.check_view ()
+
+    def test_random_changes (self):
+        rng = random.Random (5)
+        for i in range (200):
+            with self.log.batch ():
+                for j in range (rng.randint (1, 4)):
+                    entries = self.log.entries[self.activity]
+                    action = rng.random ()
+                    if action < .4 or len (entries) < 2:
+                        self.log.add_entry (CountingEntry (self.activity,
+                            day (rng.randint (0, 30)), i))
+                    elif action < .7:
+                        self.log.remove_entry (rng.choice (entries))
+                    else:
+                        self.log.update_entry (rng.choice (entries),
+                                date=day (rng.randint (0, 30)))
+            self.check_view ()
+
+    def test_values (self):
+        self.model.page_size, self.model.prefetch = 4, 1
+        self.model.max_pages = 2
+        for i in range (10):
+            self.assertEqual (self.model.on_get_value (i, 1),
+                    str (self.entries[i].n))
+            self.assertTrue (len (self.model.pages) <= 2)
+        self.log.update_entry (self.entries[9], n=99.5)
+        self.assertEqual (self.model.on_get_value (9, 1), '99.5')
+
+    def test_detach (self):
+        self.model.detach ()
+        self.log.remove_entry (self.entries[0])
+        self.assertEqual (self.model.signals, [])
+
+
+@unittest.skipIf (treemodels is None, 'requires pygtk')
+class TestActivityDrawModel (unittest.TestCase):
+
+    def test_resort_keeps_state (self):
+        log = Log ()
+        names = ['curls', 'pushups', 'situps']
+        for name in names:
+            log.add_activity (CountingActivity (name, 'reps'))
+        model = treemodels.ActivityDrawModel (log.counting_activities)
+        model.toggle ('1')
+        colors = list (model.colors)
+        log.rename_activity (model.activities[1], 'abs')
+        orders = []
+        model.rows_reordered = lambda path, iter, order: orders.append (order)
+        model.resort ()
+        self.assertEqual (orders, [[1, 0, 2]])
+        self.assertEqual ([a.name for a in model.activities],
+                ['abs', 'curls', 'situps'])
+        self.assertEqual (model.checks, [True, False, False])
+        self.assertEqual (model.colors, [colors[1], colors[0], colors[2]])
+
+
+if __name__ == '__main__':
+    unittest.main ()
@@ -2,6 +2,8 @@
 
 from __future__ import division
 
+import collections
+
 import gtk
 
 from debug import *
@@ -9,87 +11,148 @@ from debug import *
 import numpy as np
 import matplotlib.pyplot as plt
 
-class CountingActivitiesModel (gtk.GenericTreeModel):
+from manateelog import activity_event_kinds
 
-    """Gtk TreeModel for CountingActivity's in a Log."""
+class LogListModel (gtk.GenericTreeModel):
 
-    def __init__ (self, log):
-        gtk.GenericTreeModel.__init__ (self)
-        self.log = log
+    """Base class for list-only Gtk TreeModels of rows from a Log.
 
-    @property
-    def n_rows (self):
-        return len (self.log.counting_activities)
+    Subclasses implement :meth:`get_rows`, which returns the current rows in
+    display order, :meth:`format_row` and :meth:`log_changed`.  The model
+    listens to the Log, and on each change emits row-deleted, rows-reordered,
+    row-inserted and row-changed for the affected rows only, so that views
+    keep their scroll position and selection.
 
-    # Implementation of gtk.GenericTreeModel
-
-    def on_get_flags (self):
-        return gtk.TREE_MODEL_LIST_ONLY
+    Column values are formatted a page of rows at a time, when GTK first
+    asks for a row in the page.  A neighbouring page is prefetched when the
+    row is within prefetch rows of the page edge.  Only the max_pages most
+    recently formatted pages are kept, so that scrolling through a very
+    large activity holds just the rows around the visible window.  A row's
+    values are also dropped when the row changes.
+    """
 
-    def on_get_n_columns (self):
-        return 2
-
-    def on_get_column_type (self, index):
-        return str
-
-    def on_get_iter (self, path):
-        if len (self.log.counting_activities):
-            return path[0]
-
-    def on_get_path (self, rowref):
-        return (rowref,)
-
-    def on_get_value (self, row, col):
-        if len (self.log.counting_activities) == 0:
-            return None
-        activity = sorted (self.log.counting_activities)[row]
-        if col == 0:
-            return activity.name
-        elif col == 1:
-            return activity.unit
-        else:
-            return None
-
-    def on_iter_next (self, rowref):
-        if rowref == self.n_rows - 1 or self.n_rows == 0:
-            return None
-        else:
-            return rowref + 1
-
-    def on_iter_children (self, parent):
-        return 0                # TODO: is this right?
-
-    def on_iter_has_child (self, rowref):
-        return False
-
-    def on_iter_n_children (self, rowref):
-        if rowref:
-            return 0
-        else:
-            return self.n_rows
-
-    def on_iter_nth_child (self, parent, n):
-        if parent:
-            return None
-        elif n < self.n_rows:
-            return n
-        else:
-            return None
-
-    def on_iter_parent (self, child):
-        return None
-
-class TimingActivitiesModel (gtk.GenericTreeModel):
-
-    """Gtk TreeModel for TimingActivity's in a Log."""
+    n_columns = 1
+    page_size = 256
+    prefetch = 64
+    max_pages = 8
 
     def __init__ (self, log):
         gtk.GenericTreeModel.__init__ (self)
         self.log = log
+        self.rows = self.get_rows ()
+        self.formatted = {}
+        self.pages = collections.OrderedDict ()
+        self.log.add_listener (self.log_changed)
+
+    def detach (self):
+        """Stop listening to the Log."""
+        self.log.remove_listener (self.log_changed)
+
+    def get_rows (self):
+        """Get the list of rows in display order."""
+        raise NotImplementedError ()
+
+    def format_row (self, row):
+        """Get the tuple of column values for row."""
+        raise NotImplementedError ()
+
+    def materialize (self, rowref):
+        """Format the page of rows holding rowref, and its neighbour if
+        rowref is near the edge of the page."""
+        size = self.page_size
+        page = rowref // size
+        offset = rowref - page * size
+        self.load_page (page)
+        if offset < self.prefetch and page > 0:
+            self.load_page (page - 1)
+        elif (offset >= size - self.prefetch
+                and (page + 1) * size < self.n_rows):
+            self.load_page (page + 1)
+
+    def load_page (self, page):
+        """Format the rows of page, evicting the oldest pages as needed."""
+        formatted = self.formatted
+        size = self.page_size
+        keys = []
+        for row in self.rows[page * size:(page + 1) * size]:
+            key = id (row)
+            if key not in formatted:
+                formatted[key] = self.format_row (row)
+            keys.append (key)
+        self.pages.pop (page, None)
+        self.pages[page] = keys
+        if len (self.pages) > self.max_pages:
+            # rows may have shifted between pages since they were loaded
+            keep = set (keys)
+            while len (self.pages) > self.max_pages:
+                old_page, old_keys = self.pages.popitem (last=False)
+                for key in old_keys:
+                    if key not in keep:
+                        formatted.pop (key, None)
+
+    def log_changed (self, events):
+        """Respond to a list of :class:`LogEvent` (see
+        :meth:`Log.add_listener`)."""
+        raise NotImplementedError ()
+
+    def sync (self, changed=None):
+        """Bring the rows up to date with the Log, emitting row signals.
+
+        :type   changed: list
+        :param  changed: Rows that may have been modified in place, or None
+            if any row may have been.
+        """
+        rows = self.rows
+        formatted = self.formatted
+        new_rows = self.get_rows ()
+        # only rows between the common head and tail can have moved
+        n_old, n_new = len (rows), len (new_rows)
+        n_min = min (n_old, n_new)
+        lo = 0
+        while lo < n_min and rows[lo] is new_rows[lo]:
+            lo += 1
+        hi = 0
+        while (hi < n_min - lo
+                and rows[n_old - 1 - hi] is new_rows[n_new - 1 - hi]):
+            hi += 1
+        end = n_old - hi
+        new_mid = new_rows[lo:n_new - hi]
+        new_ids = set (id (row) for row in new_mid)
+        for i in xrange (end - 1, lo - 1, -1):
+            if id (rows[i]) not in new_ids:
+                formatted.pop (id (rows[i]), None)
+                del rows[i]
+                end -= 1
+                self.row_deleted ((i,))
+        old_index = dict ((id (rows[i]), i) for i in xrange (lo, end))
+        kept = [row for row in new_mid if id (row) in old_index]
+        new_order = [old_index[id (row)] for row in kept]
+        if new_order != range (lo, end):
+            rows[lo:end] = kept
+            self.rows_reordered (None, None,
+                    range (lo) + new_order + range (end, len (rows)))
+        for (i, row) in enumerate (new_mid, lo):
+            if i == len (rows) or rows[i] is not row:
+                rows.insert (i, row)
+                self.row_inserted ((i,), self.get_iter ((i,)))
+        if changed is None:
+            formatted.clear ()
+            self.pages.clear ()
+            indices = xrange (len (rows))
+        elif changed:
+            changed_ids = set (id (row) for row in changed)
+            for row in changed:
+                formatted.pop (id (row), None)
+            indices = [i for (i, row) in enumerate (rows)
+                    if id (row) in changed_ids]
+        else:
+            indices = []
+        for i in indices:
+            self.row_changed ((i,), self.get_iter ((i,)))
 
     @property
     def n_rows (self):
-        return len (self.log.timing_activities)
+        return len (self.rows)
 
     # Implementation of gtk.GenericTreeModel
 
@@ -97,24 +160,26 @@ class TimingActivitiesModel (gtk.GenericTreeModel):
         return gtk.TREE_MODEL_LIST_ONLY
 
     def on_get_n_columns (self):
-        return 1
+        return self.n_columns
 
     def on_get_column_type (self, index):
         return str
 
     def on_get_iter (self, path):
-        if len (self.log.timing_activities):
+        if path[0] < self.n_rows:
             return path[0]
 
     def on_get_path (self, rowref):
         return (rowref,)
 
-    def on_get_value (self, row, col):
-        if len (self.log.timing_activities) == 0:
-            return None
-        activity = sorted (self.log.timing_activities)[row]
-        if col == 0:
-            return activity.name
+    def on_get_value (self, rowref, col):
+        row = self.rows[rowref]
+        values = self.formatted.get (id (row))
+        if values is None:
+            self.materialize (rowref)
+            values = self.formatted.get (id (row)) or self.format_row (row)
+        if col < len (values):
+            return values[col]
         else:
             return None
 
@@ -147,164 +212,92 @@ class TimingActivitiesModel (gtk.GenericTreeModel):
     def on_iter_parent (self, child):
         return None
 
-class CountingEntriesModel (gtk.GenericTreeModel):
-
-    """Gtk TreeModel for CountingEntry's in a Log."""
-
-    def __init__ (self, log, activity_name):
-        gtk.GenericTreeModel.__init__ (self)
-        self.log = log
-        self.activity_name = activity_name
-
-    @property
-    def entries (self):
-        return self.log.get_entries (self.activity_name)
-
-    @property
-    def n_rows (self):
-        return len (self.entries)
-
-    # Implementation of gtk.GenericTreeModel
+class CountingActivitiesModel (LogListModel):
 
-    def on_get_flags (self):
-        return gtk.TREE_MODEL_LIST_ONLY
+    """Gtk TreeModel for CountingActivity's in a Log."""
 
-    def on_get_n_columns (self):
-        return 3
+    n_columns = 2
 
-    def on_get_column_type (self, index):
-        return str
+    def get_rows (self):
+        return sorted (self.log.counting_activities)
 
-    def on_get_iter (self, path):
-        if len (self.entries):
-            return path[0]
+    def log_changed (self, events):
+        changed = [event.activity for event in events
+                if event.activity.kind == 'counting'
+                and event.kind in activity_event_kinds]
+        if changed:
+            self.sync (changed)
 
-    def on_get_path (self, rowref):
-        return (rowref,)
+    def format_row (self, activity):
+        return (activity.name, activity.unit)
 
-    def on_get_value (self, row, col):
-        if self.n_rows == 0:
-            return None
-        entry = self.entries[row]
-        if col == 0:
-            return str (entry.date)
-        elif col == 1:
-            return str (entry.n)
-        elif col == 2:
-            return str (entry.error)
-        elif col == 3:
-            return str (entry.note)
-        else:
-            return None
+class TimingActivitiesModel (LogListModel):
 
-    def on_iter_next (self, rowref):
-        if rowref == self.n_rows - 1 or self.n_rows == 0:
-            return None
-        else:
-            return rowref + 1
-
-    def on_iter_children (self, parent):
-        return 0                # TODO: is this right?
-
-    def on_iter_has_child (self, rowref):
-        return False
+    """Gtk TreeModel for TimingActivity's in a Log."""
 
-    def on_iter_n_children (self, rowref):
-        if rowref:
-            return 0
-        else:
-            return self.n_rows
+    def get_rows (self):
+        return sorted (self.log.timing_activities)
 
-    def on_iter_nth_child (self, parent, n):
-        if parent:
-            return None
-        elif n < self.n_rows:
-            return n
-        else:
-            return None
+    def log_changed (self, events):
+        changed = [event.activity for event in events
+                if event.activity.kind == 'timing'
+                and event.kind in activity_event_kinds]
+        if changed:
+            self.sync (changed)
 
-    def on_iter_parent (self, child):
-        return None
+    def format_row (self, activity):
+        return (activity.name,)
 
-class TimingEntriesModel (gtk.GenericTreeModel):
+class EntriesModel (LogListModel):
 
-    """Gtk TreeModel for TimingEntry's in a Log."""
+    """Base class for Gtk TreeModels of one activity's entries in a Log."""
 
     def __init__ (self, log, activity_name):
-        gtk.GenericTreeModel.__init__ (self)
-        self.log = log
-        self.activity_name = activity_name
+        self.activity = log.get_activity (activity_name)
+        LogListModel.__init__ (self, log)
 
     @property
     def entries (self):
-        return self.log.get_entries (self.activity_name)
-
-    @property
-    def n_rows (self):
-        return len (self.entries)
+        return self.rows
+
+    def get_rows (self):
+        return list (self.log.entries.get (self.activity, []))
+
+    def log_changed (self, events):
+        events = [event for event in events if event.activity is self.activity]
+        if not events:
+            return
+        changed = []
+        for event in events:
+            if event.kind == 'units-changed' or event.entries is None:
+                changed = None
+                break
+            elif event.kind in ('entries-added', 'entries-updated'):
+                changed.extend (event.entries)
+        self.sync (changed)
+
+class CountingEntriesModel (EntriesModel):
 
-    # Implementation of gtk.GenericTreeModel
+    """Gtk TreeModel for CountingEntry's in a Log."""
 
-    def on_get_flags (self):
-        return gtk.TREE_MODEL_LIST_ONLY
+    n_columns = 4
 
-    def on_get_n_columns (self):
-        return 2
+    def format_row (self, entry):
+        return (str (entry.date), str (entry.n), str (entry.error),
+                str (entry.note))
 
-    def on_get_column_type (self, index):
-        return str
+class TimingEntriesModel (EntriesModel):
 
-    def on_get_iter (self, path):
-        if len (self.entries):
-            return path[0]
+    """Gtk TreeModel for TimingEntry's in a Log."""
 
-    def on_get_path (self, rowref):
-        return (rowref,)
+    n_columns = 3
 
-    def on_get_value (self, row, col):
+    def format_row (self, entry):
         def fmt (t):
             return '{0:04d}-{1:02d}-{2:02d} {3:02d}:{4:02d}'.format (
                     t.year, t.month, t.day, t.hour, t.minute)
-        if self.n_rows == 0:
-            return None
-        entry = self.entries[row]
-        if col == 0:
-            return fmt (entry.start_time)
-        elif col == 1:
-            return fmt (entry.end_time)
-        elif col == 2:
-            return str (entry.note)
-        else:
-            return None
-
-    def on_iter_next (self, rowref):
-        if rowref == self.n_rows - 1 or self.n_rows == 0:
-            return None
-        else:
-            return rowref + 1
-
-    def on_iter_children (self, parent):
-        return 0                # TODO: is this right?
-
-    def on_iter_has_child (self, rowref):
-        return False
-
-    def on_iter_n_children (self, rowref):
-        if rowref:
-            return 0
-        else:
-            return self.n_rows
-
-    def on_iter_nth_child (self, parent, n):
-        if parent:
-            return None
-        elif n < self.n_rows:
-            return n
-        else:
-            return None
-
-    def on_iter_parent (self, child):
-        return None
+        return (fmt (entry.start_time), fmt (entry.end_time),
+                str (entry.note))
 
 class ActivityDrawModel (gtk.GenericTreeModel):
 
@@ -337,15 +330,34 @@ class ActivityDrawModel (gtk.GenericTreeModel):
             for i in xrange (n)]
         self.alphas = [
                 int (.8 * 65535) for activity in self.activities]
+        self.pixbufs = [None for activity in self.activities]
 
     @property
     def n_rows (self):
         return len (self.activities)
 
+    def row_updated (self, row):
+        """Emit row-changed for row."""
+        self.row_changed ((row,), self.get_iter ((row,)))
+
+    def resort (self):
+        """Re-sort the rows by name after a rename, keeping each activity's
+        check and color."""
+        order = sorted (xrange (self.n_rows), key=self.activities.__getitem__)
+        for name in ('activities', 'checks', 'colors', 'color_tuples',
+                'alphas', 'pixbufs'):
+            values = getattr (self, name)
+            setattr (self, name, [values[i] for i in order])
+        if order != range (self.n_rows):
+            self.rows_reordered (None, None, order)
+        for row in xrange (self.n_rows):
+            self.row_updated (row)
+
     # toggle
     def toggle (self, path):
         row = int (path)
         self.checks[row] = not self.checks[row]
+        self.row_updated (row)
 
     def toggle_all (self):
         if np.sum (self.checks) == len (self.checks):
@@ -354,6 +366,29 @@ class ActivityDrawModel (gtk.GenericTreeModel):
             value = True
         for row in xrange (len (self.checks)):
             self.checks[row] = value
+            self.row_updated (row)
+
+    # color
+    def set_color (self, row, color, alpha):
+        """Set the gtk.gdk.Color and alpha (0-65535) for row."""
+        self.colors[row] = color
+        self.alphas[row] = alpha
+        self.pixbufs[row] = None
+        self.row_updated (row)
+
+    def get_pixbuf (self, row):
+        """Get the color swatch for row."""
+        if self.pixbufs[row] is None:
+            pb = gtk.gdk.Pixbuf (
+                    gtk.gdk.COLORSPACE_RGB, True, 8, 16, 16)
+            color = self.colors[row]
+            color_str = '{0:02x}{1:02x}{2:02x}{3:02x}'.format (
+                    *map (int,
+                         (color.red / 256, color.green / 256, color.blue / 256,
+                          self.alphas[row] / 256)))
+            pb.fill (int (color_str, 16))
+            self.pixbufs[row] = pb
+        return self.pixbufs[row]
 
     # Implementation of gtk.GenericTreeModel
 
@@ -381,21 +416,12 @@ class ActivityDrawModel (gtk.GenericTreeModel):
     def on_get_value (self, row, col):
         if self.n_rows == 0:
             return None
-        activity = sorted (self.activities)[row]
         if col == 0:
             return self.checks[row]
         elif col == 1:
-            return activity.name
+            return self.activities[row].name
         else:
-            pb = gtk.gdk.Pixbuf (
-                    gtk.gdk.COLORSPACE_RGB, True, 8, 16, 16)
-            color = self.colors[row]
-            color_str = '{0:02x}{1:02x}{2:02x}{3:02x}'.format (
-                    *map (int,
-                         (color.red / 256, color.green / 256, color.blue / 256,
-                          self.alphas[row] / 256)))
-            pb.fill (int (color_str, 16))
-            return pb
+            return self.get_pixbuf (row)
 
     def on_iter_next (self, rowref):
         if rowref == self.n_rows - 1 or self.n_rows == 0: